@@ -0,0 +1,182 @@
+import re
+from functools import lru_cache
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer
+
+try:  # Imported as part of the Codes package (app.py)
+    from .LemmaCache import MemoCache
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from LemmaCache import MemoCache
+
+CHUNK = re.compile(r"\S+")
+# What NLTK's word tokenizer always splits off: quotes, brackets, ;@#$%&*?!, dashes and ellipses,
+# plus commas and colons that are not followed by a digit
+PUNCTUATION = re.compile("[«»“”‘’„`\"\\[\\](){}<>;@#$%&*?!‒-―]|''|--|\\.{2,}|[:,](?!\\d)")
+# NLTK's Punkt word tokenizer, which it runs around every possible sentence end
+NON_WORD = "[)\";}\\]*:@'({\\[‘’“”«»!?]"
+MULTI_CHAR = r"(?:-{2,}|\.{2,}|(?:\.\s){2,}\.)"
+PUNKT_WORD = re.compile(r"%s|(?=[^(\"`{\[:;&#*@)}\]\-,])\S+?(?=\s|$|%s|%s|,(?=$|\s|%s|%s))|\S"
+                        % (MULTI_CHAR, NON_WORD, MULTI_CHAR, NON_WORD, MULTI_CHAR))
+# Possible sentence ends within a chunk: ., ? or ! before other punctuation or the chunk end
+SENTENCE_END = re.compile(r"[.?!](?=%s|$)" % NON_WORD)
+# Closing punctuation that Punkt moves back onto the sentence it ends, and the part of it NLTK
+# still splits a final period from
+REALIGNED = re.compile("[\"')\\]}‘’“”«»]+(?=$|--)")
+CLOSING = "\"')]}»”’"
+FINAL_PERIOD = re.compile("(?<=[^.])\\.(?=[\\])}>\"'»”’]*$)")
+NUMBER = re.compile(r"-?[.,]?\d[\d,.-]*\.?")
+INITIAL = re.compile(r"[^\W\d]\.")
+LEADING_QUOTE = re.compile(r"(?<!\w)'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)")
+CLITIC = re.compile(r"(?<=[^' ])(?:'s|'m|'d|')$")
+LONG_CLITIC = re.compile(r"(?<=[^' ])(?:'ll|'re|'ve|n't)$")
+CONTRACTION = re.compile(r"\b(can)(not)\b|\b(d)('ye)\b|\b(gim)(me)\b|\b(gon)(na)\b|\b(got)(ta)\b"
+                         r"|\b(lem)(me)\b|\b(more)('n)\b|\b(wan)(na)$")
+SPLIT_WORDS = {"cannot": ("can", "not"), "gimme": ("gim", "me"), "gonna": ("gon", "na"),
+               "gotta": ("got", "ta"), "lemme": ("lem", "me"), "wanna": ("wan", "na")}
+# Used when NLTK's Punkt model is not installed; it knows many more
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "inc", "ltd", "corp", "jan", "feb",
+                 "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "fig", "e.g", "i.e", "u.s"}
+
+
+@lru_cache(maxsize=None)
+def punkt_abbreviations():
+    """Returns the abbreviations of NLTK's English Punkt model, or a short built-in list without its data."""
+    try:
+        from nltk.tokenize.punkt import PunktTokenizer
+        return frozenset(PunktTokenizer("english")._params.abbrev_types)
+    except (ImportError, LookupError, OSError):
+        return frozenset(ABBREVIATIONS)
+
+
+class Analyzer:
+    """
+    Tokenizes, drops stop words and Porter-stems text like the BIM, NOL and PN pipeline
+    [stem(word) for word in word_tokenize(text.lower()) if word.isalnum() and word not in stop_words],
+    without running NLTK's tokenizer.
+
+    That pipeline only keeps alphanumeric tokens, so instead of NLTK's regex passes over the
+    whole text (and Punkt sentence splitting), each whitespace-separated chunk is handled on
+    its own: plain words are kept as they are, and only chunks with punctuation go through
+    the precompiled patterns that reproduce what NLTK splits off (punctuation, clitics such as
+    's and n't, and sentence-final periods, using Punkt's rules for abbreviations, initials
+    and numbers). Stems are memoized in a bounded least-recently-used cache.
+
+    Attributes:
+        stop_words (set): Lowercase words that are dropped.
+        abbreviations (set): Words that Punkt does not take as a sentence end before a period.
+        stems (MemoCache): Word -> Porter stem memo.
+    """
+
+    def __init__(self, stop_words=None, maxsize=100_000, abbreviations=None):
+        self.stop_words = set(stopwords.words('english')) if stop_words is None else stop_words
+        self.abbreviations = punkt_abbreviations() if abbreviations is None else abbreviations
+        self.stems = MemoCache(PorterStemmer().stem, maxsize)
+
+    def chunks(self, text):
+        """Yields (chunk, next chunk or None) for the lowercase whitespace-separated chunks of a string or an iterable of lines."""
+        previous = None
+        for line in (text,) if isinstance(text, str) else text:
+            for match in CHUNK.finditer(line.lower()):
+                if previous is not None:
+                    yield previous, match.group()
+                previous = match.group()
+        if previous is not None:
+            yield previous, None
+
+    def tokens(self, text):
+        """Yields the lowercase alphanumeric tokens NLTK's word_tokenize gives for the text, stop words included."""
+        split_words = SPLIT_WORDS
+        for chunk, following in self.chunks(text):
+            if chunk.isalnum():
+                if chunk in split_words:
+                    yield from split_words[chunk]
+                else:
+                    yield chunk
+            else:
+                yield from self.chunk_tokens(chunk, following)
+
+    def chunk_tokens(self, chunk, following):
+        """Tokens of a lowercase chunk with punctuation; following is the next chunk, None at the end of the text."""
+        periods = []
+        end = None
+        for match in SENTENCE_END.finditer(chunk):
+            if match.end() < len(chunk) or following is not None:
+                end = match.start()
+        # Punkt only considers the last possible end of a chunk, and NLTK splits its period off
+        # when Punkt breaks the sentence there
+        if end is not None and chunk[end] == "." and end and chunk[end - 1] != ".":
+            if end + 1 < len(chunk):
+                closing = REALIGNED.match(chunk, end + 1)
+                closing = closing.group() if closing else ""
+            else:  # Closing quotes and brackets of the next chunk, which NLTK may turn into an opening ``
+                closing = REALIGNED.match(following)
+                closing = "``" if closing and following.startswith(('"', "''")) else closing.group() if closing else ""
+            if not closing.strip(CLOSING) and self.is_sentence_end(chunk, end, following):
+                periods.append(end)
+        if following is None:  # The end of the last sentence
+            final = FINAL_PERIOD.search(chunk)
+            if final is not None and final.start() not in periods:
+                periods.append(final.start())
+        for period in periods:
+            chunk = chunk[:period] + " " + chunk[period + 1:]
+
+        for part in PUNCTUATION.sub(" ", chunk).split():
+            if part.isalnum():
+                if part in SPLIT_WORDS:
+                    yield from SPLIT_WORDS[part]
+                else:
+                    yield part
+                continue
+            part = LEADING_QUOTE.sub("' ", part)
+            part = CLITIC.sub(" ", part)
+            part = LONG_CLITIC.sub(" ", part.rstrip())
+            for piece in CONTRACTION.sub(lambda found: " ".join(group for group in found.groups() if group), part).split():
+                if piece.isalnum():
+                    yield piece
+
+    def is_sentence_end(self, chunk, end, following):
+        """
+        Whether Punkt breaks the sentence at position end of a chunk, i.e. whether a Punkt word of
+        the chunk up to there, or of the text right after it, ends a sentence.
+        """
+        word = chunk[:end + 1]
+        if word[:-1].isalnum() and word[:-1] not in self.abbreviations and not (INITIAL.fullmatch(word) or NUMBER.fullmatch(word)):
+            return True  # The usual case, a plain word before a period
+        context = word + (chunk[end + 1] if end + 1 < len(chunk) else " " + following)
+        words = PUNKT_WORD.findall(context)
+        return any(self.punkt_break(word, next_word) for word, next_word in zip(words, words[1:]))
+
+    def punkt_break(self, word, next_word):
+        """Whether Punkt (without learned parameters besides the abbreviations) ends a sentence after a word."""
+        if word in (".", "?", "!"):
+            return True
+        if not word.endswith(".") or word.endswith(".."):
+            return False
+        if word[:-1] in self.abbreviations or word[:-1].split("-")[-1] in self.abbreviations:
+            return False
+        if INITIAL.fullmatch(word) or NUMBER.fullmatch(word):
+            # Not a sentence end when the next word is punctuation or lowercase
+            if next_word in (";", ":", ",", ".", "!", "?") or next_word[0].islower():
+                return False
+            return not (INITIAL.fullmatch(word) and next_word[0].isupper())
+        return True
+
+    def stem(self, word):
+        """Returns the Porter stem of a lowercase word, stemming it only on a cache miss."""
+        return self.stems.lookup(word)
+
+    def terms(self, text):
+        """Yields the stems of the tokens that are not stop words, for a string or an iterable of lines."""
+        stop_words = self.stop_words
+        stem = self.stems.lookup
+        for token in self.tokens(text):
+            if token not in stop_words:
+                yield stem(token)
+
+    def analyze(self, text):
+        """Returns the list of terms of a text."""
+        return list(self.terms(text))
+
+    def stats(self):
+        """Returns hit/miss counters and the current fill of the stem cache."""
+        return self.stems.stats()
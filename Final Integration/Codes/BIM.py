@@ -1,31 +1,46 @@
 import os
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
+import math
+import heapq
+from collections import Counter
+from itertools import chain, islice
 
-# nltk.download('punkt')
-# nltk.download('stopwords')
+try:  # Imported as part of the Codes package (app.py)
+    from .Analyzer import Analyzer
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from Analyzer import Analyzer
+
+WEIGHTINGS = ("dice", "rsj")
 
 class BinaryIndependenceModel:
-    def __init__(self, docs_folder):
+    def __init__(self, docs_folder, corpus=None, analyzer=None):
         self.docs_folder = docs_folder
+        self.corpus = corpus  # Shared Corpus to take the documents and their stemmed tokens from
+        self.analyzer = analyzer or Analyzer()  # Tokenizer and stem cache, may be shared with NOL and PN
         self.documents = {}
         self.term_document_matrix = {}
         self.preprocessed_query = []
         self.term_list = []
+        self.term_index = {}
+        self.doc_sizes = {}
+        self.postings = {}
+        self.doc_order = {}
+        self.relevant_docs = set()           # Documents judged relevant (relevance feedback)
+        self.relevant_doc_freqs = Counter()  # term -> relevant documents containing it
+        self.feedback_version = 0            # Increased by every judgment that changes the relevant set
+        self.rsj_weights = {}                # term -> (feedback_version, RSJ weight)
         self.preprocessed_docs = {}
-        self.stop_words = set(stopwords.words('english'))
-        self.stemmer = PorterStemmer()
 
     def preprocess(self, text):
         """Preprocess text: tokenize, remove stop words, and stem."""
-        tokens = word_tokenize(text.lower())
-        filtered_tokens = [self.stemmer.stem(word) for word in tokens if word.isalnum() and word not in self.stop_words]
-        return filtered_tokens
+        return self.analyzer.analyze(text)
 
     def load_documents(self):
         """Load and preprocess documents from the specified folder."""
+        if self.corpus is not None:
+            self.documents.update(self.corpus.texts)
+            self.preprocessed_docs.update(self.corpus.analyze("porter", "text", self.preprocess))
+            self.build_term_document_matrix()
+            return
         for filename in os.listdir(self.docs_folder):
             if filename.endswith(".txt"):
                 file_path = os.path.join(self.docs_folder, filename)
@@ -36,39 +51,119 @@ class BinaryIndependenceModel:
         self.build_term_document_matrix()
 
     def build_term_document_matrix(self):
-        """Build a binary term-document matrix."""
+        """Build a binary term-document matrix, each document row packed into an int bitmap (bit i is term_list[i])."""
         # Collect all unique terms from preprocessed documents
         self.term_list = sorted(set(term for terms in self.preprocessed_docs.values() for term in terms))
-        # Initialize the term-document matrix
+        self.term_index = {term: index for index, term in enumerate(self.term_list)}
+        # Pack each document's row, and keep its number of distinct terms (the popcount of the row)
+        self.term_document_matrix = {}
+        self.doc_sizes = {}
+        self.postings = {}  # term -> documents containing it, in document order
+        self.doc_order = {doc: position for position, doc in enumerate(self.preprocessed_docs)}
         for doc, terms in self.preprocessed_docs.items():
-            self.term_document_matrix[doc] = [1 if term in terms else 0 for term in self.term_list]
+            row = bytearray((len(self.term_list) + 7) // 8)
+            for term in set(terms):
+                index = self.term_index[term]
+                row[index >> 3] |= 1 << (index & 7)
+                self.postings.setdefault(term, []).append(doc)
+            bits = int.from_bytes(row, "little")
+            self.term_document_matrix[doc] = bits
+            self.doc_sizes[doc] = bits.bit_count()
+        # Judgments refer to the previous documents; precompute the weights without feedback
+        self.relevant_docs = set()
+        self.relevant_doc_freqs = Counter()
+        self.feedback_version = 0
+        self.rsj_weights = {}
+        for term in self.postings:
+            self.rsj_weight(term)
 
     def preprocess_query(self, query):
-        """Preprocess the query and generate a binary vector."""
+        """Preprocess the query and generate its binary vector, packed like the document rows."""
         self.preprocessed_query = self.preprocess(query)
-        return [1 if term in self.preprocessed_query else 0 for term in self.term_list]
+        query_vector = 0
+        for term in set(self.preprocessed_query):
+            index = self.term_index.get(term)
+            if index is not None:
+                query_vector |= 1 << index
+        return query_vector
 
     def score_documents(self, query_vector):
-        """Score documents based on Dice similarity."""
+        """Score documents based on Dice similarity, counting shared terms with the popcount of AND."""
         scores = {}
+        query_sum = query_vector.bit_count()
         for doc, doc_vector in self.term_document_matrix.items():
-            intersection = sum(min(q, d) for q, d in zip(query_vector, doc_vector))
-            query_sum = sum(query_vector)
-            doc_sum = sum(doc_vector)
+            intersection = (query_vector & doc_vector).bit_count()
+            doc_sum = self.doc_sizes[doc]
             dice_score = (2 * intersection) / (query_sum + doc_sum) if (query_sum + doc_sum) != 0 else 0
             scores[doc] = dice_score
         return scores
 
+    def score_postings(self, query_terms):
+        """Score, by Dice similarity, only the documents sharing a term with the query, counted from its terms' postings."""
+        terms = {term for term in query_terms if term in self.postings}
+        intersections = {}
+        for term in terms:
+            for doc in self.postings[term]:
+                intersections[doc] = intersections.get(doc, 0) + 1
+        query_sum = len(terms)
+        return {doc: (2 * intersection) / (query_sum + self.doc_sizes[doc]) for doc, intersection in intersections.items()}
+
+    def rsj_weight(self, term):
+        """Robertson-Spärck Jones log-odds weight of a term, recomputed only when judgments arrived since it was cached."""
+        version, weight = self.rsj_weights.get(term, (None, 0.0))
+        if version != self.feedback_version:
+            num_docs, doc_freq = len(self.doc_sizes), len(self.postings[term])
+            relevant, relevant_freq = len(self.relevant_docs), self.relevant_doc_freqs[term]
+            weight = math.log((relevant_freq + 0.5) * (num_docs - doc_freq - relevant + relevant_freq + 0.5)
+                              / ((doc_freq - relevant_freq + 0.5) * (relevant - relevant_freq + 0.5)))
+            self.rsj_weights[term] = (self.feedback_version, weight)
+        return weight
+
+    def score_rsj(self, query_terms):
+        """Score the documents sharing a term with the query by the sum of the RSJ weights of the shared terms."""
+        scores = {}
+        for term in sorted(term for term in set(query_terms) if term in self.postings):
+            weight = self.rsj_weight(term)
+            for doc in self.postings[term]:
+                scores[doc] = scores.get(doc, 0) + weight
+        return scores
+
+    def add_relevance_feedback(self, doc, relevant=True):
+        """Record whether a document is relevant, updating the relevant document counts of its own terms only."""
+        if doc not in self.doc_sizes:
+            raise ValueError(f"Unknown document '{doc}'.")
+        if relevant == (doc in self.relevant_docs):
+            return
+        if relevant:
+            self.relevant_docs.add(doc)
+        else:
+            self.relevant_docs.remove(doc)
+        for term in set(self.preprocessed_docs[doc]):
+            self.relevant_doc_freqs[term] += 1 if relevant else -1
+        self.feedback_version += 1  # Every weight depends on the number of relevant documents
 
-    def rank_documents(self, scores):
-        """Rank documents based on scores in descending order."""
-        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    def rank_documents(self, scores, k=None):
+        """Rank documents based on scores in descending order (ties in document order), keeping the top k with a heap."""
+        order = self.doc_order
+        if k is None:
+            return sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+        return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], order[item[0]]))
 
-    def retrieve_top_k_documents(self, query, k=3):
-        """Retrieve the top-K documents for the query."""
-        query_vector = self.preprocess_query(query)
-        scores = self.score_documents(query_vector)
-        ranked_docs = self.rank_documents(scores)
-        return ranked_docs[:k]
+    def retrieve_top_k_documents(self, query, k=3, weighting="dice"):
+        """
+        Retrieve the top-K documents for the query, touching only the postings of its terms.
+        weighting is "dice" (Dice similarity) or "rsj" (Robertson-Spärck Jones weights, using the relevance feedback).
+        """
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting '{weighting}', expected one of {WEIGHTINGS}.")
+        self.preprocessed_query = self.preprocess(query)
+        scores = self.score_postings(self.preprocessed_query) if weighting == "dice" else self.score_rsj(self.preprocessed_query)
+        ranked_docs = self.rank_documents({doc: score for doc, score in scores.items() if score > 0}, k)
+        if k is None or len(ranked_docs) < k:
+            # Documents sharing no term with the query score 0 and follow in document order, then negative scores
+            zeros = ((doc, 0.0) for doc in self.doc_order if scores.get(doc, 0) == 0)
+            negatives = self.rank_documents({doc: score for doc, score in scores.items() if score < 0})
+            ranked_docs += islice(chain(zeros, negatives), None if k is None else k - len(ranked_docs))
+        return ranked_docs
 
 
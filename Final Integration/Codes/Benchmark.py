@@ -0,0 +1,749 @@
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import random
+import tracemalloc
+from collections import Counter
+from nltk.tokenize import word_tokenize
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer
+from Analyzer import Analyzer
+from BIM import BinaryIndependenceModel
+from Regions import RegionIndex
+from Corpus import Corpus
+from Dictionary import CustomDictionary
+from NOL import NonOverlappedListModel
+from RankingSystem import RankingSystem
+from SearchEngine import SearchEngine
+from ShardedRanking import ShardedRankingSystem
+from StreamingIndex import StreamingRankingSystem
+from concurrent.futures import ProcessPoolExecutor
+
+
+def timed(function, *args):
+    """Runs the function once and returns (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def measure_memory(function, *args):
+    """Runs the function and returns (result, bytes still allocated by it afterwards)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def synthetic_documents(count, vocabulary=50_000, length=200, seed=7):
+    """
+    Yields (filename, title, content) for a reproducible synthetic corpus.
+
+    Words are drawn from a Zipf-like distribution so a few terms are very common
+    and most are rare, like natural language.
+    """
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    for i in range(count):
+        tokens = rng.choices(words, weights, k=length)
+        yield f"doc{i}.txt", " ".join(tokens[:5]), " ".join(tokens)
+
+
+def write_synthetic_corpus(directory, count, **options):
+    """Writes a synthetic corpus as Title/Content .txt files, like the ones in Docs."""
+    for filename, title, content in synthetic_documents(count, **options):
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as file:
+            file.write(f"Title: {title}\nContent: {content}")
+
+
+def build_synthetic_engine(count, positional=False, **options):
+    """
+    Indexes a synthetic corpus straight from whitespace token counts, skipping lemmatization,
+    so query benchmarks can use large corpora.
+    """
+    engine = SearchEngine("Docs", positional=positional)
+
+    def positions(text):
+        located = {}
+        for position, word in enumerate(text.split()):
+            located.setdefault(word, []).append(position)
+        return located if positional else None
+
+    for filename, title, content in synthetic_documents(count, **options):
+        engine.add_analyzed_document(filename, title, content, Counter(title.split()), Counter(content.split()),
+                                     positions(title), positions(content))
+    return engine
+
+
+def time_queries(function, queries, repeat=3):
+    """Returns the best average seconds per query over a few runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        _, elapsed = timed(lambda: [function(query) for query in queries])
+        best = min(best, elapsed / len(queries))
+    return best
+
+
+def report(name, rows):
+    """Prints benchmark rows as an aligned table."""
+    print(f"\n--- {name} ---")
+    for row in rows:
+        print("  ".join(f"{cell:>18}" for cell in row))
+
+
+# --- CustomDictionary ---
+class ChainedDictionary:
+    """The original fixed 500-bucket CustomDictionary, kept here as the benchmark baseline."""
+
+    class Node:
+        def __init__(self, key, value):
+            self.key = key
+            self.value = value
+            self.next = None
+
+    def __init__(self, size=500):
+        self.size = size
+        self.table = [None] * self.size
+
+    def insert(self, key, value):
+        index = hash(key) % self.size
+        if not self.table[index]:
+            self.table[index] = self.Node(key, value)
+            return
+        current = self.table[index]
+        while current:
+            if current.key == key:
+                current.value = value
+                return
+            if not current.next:
+                break
+            current = current.next
+        current.next = self.Node(key, value)
+
+    def get(self, key):
+        current = self.table[hash(key) % self.size]
+        while current:
+            if current.key == key:
+                return current.value
+            current = current.next
+        raise KeyError(f"Key '{key}' not found.")
+
+
+def benchmark_dictionary(sizes=(10_000, 100_000, 1_000_000), chained_limit=100_000):
+    """
+    Compares insert and lookup time of CustomDictionary against the chained baseline.
+
+    The chained table is quadratic to fill, so sizes above chained_limit are skipped for it.
+    """
+    rows = [("keys", "structure", "insert (s)", "lookup (s)")]
+    for size in sizes:
+        keys = [f"term{i}" for i in range(size)]
+        structures = [CustomDictionary]
+        if size <= chained_limit:
+            structures.append(ChainedDictionary)
+        for structure in structures:
+            table = structure()
+            _, insert_time = timed(lambda: [table.insert(key, i) for i, key in enumerate(keys)])
+            _, lookup_time = timed(lambda: [table.get(key) for key in keys])
+            rows.append((size, structure.__name__, f"{insert_time:.3f}", f"{lookup_time:.3f}"))
+        if size > chained_limit:
+            rows.append((size, "ChainedDictionary", "skipped", "skipped"))
+    report("CustomDictionary vs 500-bucket chaining", rows)
+
+
+# --- SearchEngine index ---
+def benchmark_index_memory(count=10_000):
+    """Compares the memory of the array postings index with per-term 500-slot dictionaries."""
+    corpus = list(synthetic_documents(count))
+
+    def build_postings():
+        engine = SearchEngine("Docs")
+        for filename, _, content in corpus:
+            engine.index(filename, content, engine.content_index)
+        return engine
+
+    engine, postings_bytes = measure_memory(build_postings)
+
+    def build_chained():
+        # Same frequencies, laid out like the old index: word -> ChainedDictionary(filename -> count)
+        index = ChainedDictionary()
+        for word, postings in engine.content_index.items():
+            table = ChainedDictionary()
+            for doc_id, freq in postings.items():
+                table.insert(engine.filenames[doc_id], freq)
+            index.insert(word, table)
+        return index
+
+    _, chained_bytes = measure_memory(build_chained)
+    total = sum(len(postings) for _, postings in engine.content_index.items())
+    report(f"Content index memory, {count} documents, {total} postings", [
+        ("layout", "MB", "bytes/posting"),
+        ("array postings", f"{postings_bytes / 1e6:.1f}", f"{postings_bytes / total:.1f}"),
+        ("500-slot chained", f"{chained_bytes / 1e6:.1f}", f"{chained_bytes / total:.1f}"),
+    ])
+
+
+def benchmark_cold_start(count=5_000):
+    """Compares indexing the corpus from scratch with loading it from a snapshot."""
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count)
+        snapshot = os.path.join(directory, "index.snapshot")
+        _, build_time = timed(SearchEngine(directory).load_or_build, snapshot)
+        _, load_time = timed(SearchEngine(directory).load_or_build, snapshot)
+    report(f"SearchEngine cold start, {count} documents", [
+        ("start", "seconds"),
+        ("load_documents", f"{build_time:.3f}"),
+        ("snapshot", f"{load_time:.3f}"),
+    ])
+
+
+def worker_counts(max_workers=None):
+    """Returns 1, 2, 4, ... up to max_workers (default: the number of cores), always ending at the maximum."""
+    max_workers = max_workers or os.cpu_count()
+    counts = [1]
+    while counts[-1] * 2 < max_workers:
+        counts.append(counts[-1] * 2)
+    if max_workers > 1:
+        counts.append(max_workers)
+    return counts
+
+
+def benchmark_parallel_ingestion(count=5_000, max_workers=None):
+    """Measures load_documents throughput from one worker up to the number of cores."""
+    rows = [("workers", "seconds", "docs/s", "speedup")]
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count)
+        serial_time = None
+        for workers in worker_counts(max_workers):
+            _, elapsed = timed(SearchEngine(directory).load_documents, workers)
+            serial_time = serial_time or elapsed
+            rows.append((workers, f"{elapsed:.3f}", f"{count / elapsed:.0f}", f"{serial_time / elapsed:.2f}x"))
+    report(f"Parallel ingestion, {count} documents", rows)
+
+
+def benchmark_top_k(counts=(10_000, 100_000), k=10):
+    """Compares full ranking with MaxScore top-k on queries made of common terms."""
+    queries = ["term0 term5", "term1 term2 term3", "term0 term10 term100", "term4 term40 term400 term4000"]
+    rows = [("documents", "full (ms/query)", f"top {k} (ms/query)", "speedup")]
+    for count in counts:
+        engine = build_synthetic_engine(count, length=100)
+        full = time_queries(engine.search, queries)
+        pruned = time_queries(lambda query: engine.search(query, k=k), queries)
+        rows.append((count, f"{full * 1e3:.1f}", f"{pruned * 1e3:.1f}", f"{full / pruned:.1f}x"))
+    report("SearchEngine top-k with MaxScore", rows)
+
+
+def benchmark_phrase_queries(counts=(5_000, 10_000, 20_000)):
+    """
+    Times phrase and NEAR queries on positional indexes of growing size, next to the number
+    of postings of the words involved: the cost per posting should stay flat.
+    """
+    queries = ['"term1 term2"', '"term3 term4 term5"', 'term0 NEAR/3 term7', '"term50 term60"',
+               '"term200 term300 term400"', 'term20 NEAR/5 term900']
+    rows = [("documents", "ms/query", "postings/query", "us/posting")]
+    for count in counts:
+        engine = build_synthetic_engine(count, positional=True, vocabulary=5_000, length=100)
+        postings = 0
+        for query in queries:
+            _, clauses = engine.parse_query(query)
+            for clause in clauses:
+                words = [word for _, word in clause[1]] if clause[0] == "phrase" else clause[1:3]
+                postings += sum(len(engine.content_index.get(word)) for word in words)
+        per_query = time_queries(engine.search, queries)
+        per_posting = per_query * len(queries) / postings
+        rows.append((count, f"{per_query * 1e3:.1f}", postings // len(queries), f"{per_posting * 1e6:.2f}"))
+    report("Phrase and NEAR/k queries on the positional index", rows)
+
+
+def benchmark_snippets(lengths=(100, 1_000, 10_000, 100_000), hits=200):
+    """Compares re-splitting the content per hit with the snippet store, for growing document lengths."""
+    rows = [("words/document", "split (us/hit)", "store (us/hit)")]
+    for length in lengths:
+        engine = build_synthetic_engine(20, positional=True, vocabulary=2_000, length=length)
+        doc_ids = [doc_id for doc_id in range(20)] * (hits // 20)
+        words = engine.preprocess_query("term7 term8")
+        contents = [engine.documents.get(engine.filenames[doc_id])["content"] for doc_id in doc_ids]
+        _, split_time = timed(lambda: [' '.join(content.split()[:15]) for content in contents])
+        _, store_time = timed(lambda: [engine.snippet(doc_id, words) for doc_id in doc_ids])
+        rows.append((length, f"{split_time / len(doc_ids) * 1e6:.1f}", f"{store_time / len(doc_ids) * 1e6:.1f}"))
+    report("Snippet cost per hit", rows)
+
+
+def benchmark_search_many(count=20_000, queries=2_000, k=10, max_workers=None):
+    """Compares the throughput of a loop over search() with search_many, serial and process-parallel."""
+    engine = build_synthetic_engine(count, vocabulary=5_000, length=100)
+    batch = [content for _, _, content in synthetic_documents(queries, vocabulary=5_000, length=3, seed=11)]
+    _, loop_time = timed(lambda: [engine.search(query, k=k) for query in batch])
+    rows = [("method", "workers", "queries/s", "speedup"),
+            ("search() loop", 1, f"{queries / loop_time:.0f}", "1.00x")]
+    for workers in worker_counts(max_workers):
+        _, batch_time = timed(engine.search_many, batch, k, "content", workers)
+        rows.append(("search_many", workers, f"{queries / batch_time:.0f}", f"{loop_time / batch_time:.2f}x"))
+    report(f"Batched search, {queries} queries, top {k} of {count} documents", rows)
+
+
+# --- RankingSystem ---
+def rescan_tfidf(system, query):
+    """The original rank_by_tfidf, which rebuilt IDF and every document vector per query (baseline)."""
+    idf = {}
+    for word in set(word for content in system.documents.values() for word in system.tokenize(content)):
+        doc_count = sum(1 for content in system.documents.values() if word in system.tokenize(content))
+        idf[word] = math.log(len(system.documents) / (1 + doc_count))
+    query_vector = system.calculate_tfidf(query, idf)
+    doc_vectors = {doc_name: system.calculate_tfidf(content, idf) for doc_name, content in system.documents.items()}
+    rankings = [(doc_name, sum(query_vector.get(term, 0) for term in vector)) for doc_name, vector in doc_vectors.items()]
+    return sorted(rankings, key=lambda x: x[1], reverse=True)
+
+
+def benchmark_ranking_statistics(counts=(50, 100, 200, 2_000, 20_000), rescan_limit=200, k=10):
+    """
+    Compares TF-IDF ranking that rescans the corpus per query with the precomputed statistics,
+    next to the postings the query touches. Both full rankings grow with the corpus, since
+    they list every document; the precomputed top-k cost per posting stays flat.
+    Sizes above rescan_limit are skipped for the rescan.
+    """
+    queries = ["term5 term50 term500", "term1 term2", "term10 term100 term1000 term1500"]
+    rows = [("documents", "rescan (ms/query)", "full ranking (ms)", f"top {k} (ms)", "postings/query",
+             f"top {k} us/posting")]
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_corpus(directory, count, vocabulary=2_000, length=50)
+            system = RankingSystem(directory)
+        rescan = "skipped"
+        if count <= rescan_limit:
+            rescan = f"{time_queries(lambda query: rescan_tfidf(system, query), queries, repeat=1) * 1e3:.1f}"
+        full = time_queries(system.rank_by_tfidf, queries)
+        top_k = time_queries(lambda query: system.rank_by_tfidf(query, k), queries)
+        postings = sum(len(system.postings.get(term, ())) for query in queries for term in set(system.tokenize(query)))
+        per_posting = top_k * len(queries) / postings
+        rows.append((count, rescan, f"{full * 1e3:.2f}", f"{top_k * 1e3:.2f}", postings // len(queries),
+                     f"{per_posting * 1e6:.2f}"))
+    report("RankingSystem TF-IDF per query", rows)
+
+
+def rescan_keyword_matching(system, query):
+    """The original rank_by_keyword_matching, which re-tokenized every document per query (baseline)."""
+    query_tokens = system.tokenize(query)
+    rankings = [(doc_name, sum(1 for word in query_tokens if word in system.tokenize(content)))
+                for doc_name, content in system.documents.items()]
+    return sorted(rankings, key=lambda x: x[1], reverse=True)
+
+
+def benchmark_keyword_matching(counts=(1_000, 10_000, 50_000)):
+    """
+    Times keyword matching by rescanning every document and from the term -> documents index,
+    for a term with a fixed number of matches: the index latency should not grow with the corpus.
+    """
+    rows = [("documents", "rescan (ms/query)", "index (ms/query)", "matches/query")]
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_corpus(directory, count, vocabulary=20_000, length=100)
+            for i in range(10):  # Ten documents with a word found nowhere else
+                with open(os.path.join(directory, f"rare{i}.txt"), 'w', encoding='utf-8') as file:
+                    file.write("Title: rare\nContent: needle haystack")
+            system = RankingSystem(directory)
+        rescan = time_queries(lambda query: rescan_keyword_matching(system, query), ["needle"], repeat=1)
+        indexed = time_queries(system.rank_by_keyword_matching, ["needle"] * 100)
+        matches = len(system.rank_by_keyword_matching("needle"))
+        rows.append((count, f"{rescan * 1e3:.1f}", f"{indexed * 1e3:.3f}", matches))
+    report("Keyword matching of a rare term", rows)
+
+
+def benchmark_bm25_top_k(counts=(1_000, 10_000, 50_000), k=10):
+    """
+    Times top-k BM25 and BM25F for a term with a fixed number of matches as the corpus grows:
+    only the matching postings are scored and selected, so the latency should stay flat, while
+    the full ranking (which lists every document) grows with the corpus.
+    """
+    rows = [("documents", f"bm25 top {k} (ms)", f"bm25f top {k} (ms)", "bm25 full (ms)", "matches/query")]
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_corpus(directory, count, vocabulary=20_000, length=100)
+            for i in range(10):  # Ten documents with a word found nowhere else
+                with open(os.path.join(directory, f"rare{i}.txt"), 'w', encoding='utf-8') as file:
+                    file.write("Title: rare\nContent: needle haystack")
+            system = RankingSystem(directory)
+        bm25 = time_queries(lambda query: system.rank_by_bm25(query, k), ["needle"] * 100)
+        bm25f = time_queries(lambda query: system.rank_by_bm25f(query, k), ["needle"] * 100)
+        full = time_queries(system.rank_by_bm25, ["needle"] * 3)
+        matches = sum(score > 0 for _, score in system.rank_by_bm25("needle", k))
+        rows.append((count, f"{bm25 * 1e3:.3f}", f"{bm25f * 1e3:.3f}", f"{full * 1e3:.1f}", matches))
+    report("BM25 top-k of a rare term", rows)
+
+
+def benchmark_ranking_backends(count=50_000, k=10):
+    """Compares the queries/s of the python and numpy RankingSystem backends, full ranking and top k."""
+    queries = ["term5 term50 term500", "term1 term2", "term10 term100 term1000 term1500", "term3 term30"]
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count, vocabulary=20_000, length=100)
+        systems = {backend: RankingSystem(directory, backend) for backend in ("python", "numpy")}
+    rows = [("method", "python (q/s)", "numpy (q/s)", f"numpy top {k} (q/s)", "speedup (full)")]
+    for method in ("rank_by_keyword_matching", "rank_by_tfidf", "rank_by_cosine_similarity"):
+        python = time_queries(getattr(systems["python"], method), queries, repeat=1)
+        numpy = time_queries(getattr(systems["numpy"], method), queries)
+        top = time_queries(lambda query: getattr(systems["numpy"], method)(query, k), queries)
+        rows.append((method[len("rank_by_"):], f"{1 / python:.1f}", f"{1 / numpy:.1f}", f"{1 / top:.1f}",
+                     f"{python / numpy:.0f}x"))
+    report(f"RankingSystem backends, {count} documents", rows)
+
+
+def peak_rss_of_build(build, *args):
+    """Runs a build in a fresh process and returns (seconds, that process's peak RSS in MB); Unix only."""
+    import resource
+    _, elapsed = timed(build, *args)
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_ranking_system(directory):
+    RankingSystem(directory)
+
+
+def build_streaming_ranking_system(directory, memory_budget):
+    StreamingRankingSystem(directory, os.path.join(directory, "index"), memory_budget)
+
+
+def benchmark_streaming_index(counts=(5_000, 20_000, 40_000), memory_budget=8 * 1024 * 1024):
+    """Compares the peak RSS of the in-memory RankingSystem with the SPIMI streaming index as the corpus grows."""
+    rows = [("documents", "in-memory (MB)", "streaming (MB)", "in-memory (s)", "streaming (s)")]
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_corpus(directory, count, length=100)
+            measured = []
+            for build, args in ((build_ranking_system, (directory,)),
+                                (build_streaming_ranking_system, (directory, memory_budget))):
+                with ProcessPoolExecutor(1) as pool:
+                    measured.append(pool.submit(peak_rss_of_build, build, *args).result())
+        (memory_time, memory_rss), (streaming_time, streaming_rss) = measured
+        rows.append((count, f"{memory_rss:.0f}", f"{streaming_rss:.0f}", f"{memory_time:.1f}", f"{streaming_time:.1f}"))
+    report(f"Peak RSS of index construction, {memory_budget // (1024 * 1024)} MB streaming budget", rows)
+
+
+def benchmark_lsh(count=20_000, settings=((4, 4), (8, 4), (16, 4), (16, 6), (32, 6), (32, 8)), k=10, queries=50,
+                  query_lengths=(3, 30)):
+    """
+    Reports latency and recall@k of LSH approximate cosine ranking for several (tables, bits)
+    settings, for short keyword queries and for long (query-by-example) queries.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count, vocabulary=20_000, length=100)
+        system = RankingSystem(directory)
+    for query_length in query_lengths:
+        lsh_tradeoff(system, settings, k, queries, query_length)
+
+
+def lsh_tradeoff(system, settings, k, queries, query_length):
+    """Prints one latency vs recall table of benchmark_lsh."""
+    # Queries made of words of random documents, so each has plenty of matches
+    rng = random.Random(3)
+    contents = list(system.documents.values())
+    count = len(contents)
+    batch = [" ".join(rng.sample(system.tokenize(contents[rng.randrange(count)]), query_length)) for _ in range(queries)]
+    exact = {query: [name for name, score in system.rank_by_cosine_similarity(query, k) if score > 0] for query in batch}
+    exact_time = time_queries(lambda query: system.rank_by_cosine_similarity(query, k), batch)
+    rows = [("tables x bits", "ms/query", f"recall@{k}", "candidates/query"), ("exact", f"{exact_time * 1e3:.2f}", "1.000", "all")]
+    for tables, bits in settings:
+        system.build_lsh(tables, bits)
+        latency = time_queries(lambda query: system.rank_by_approximate_cosine(query, k), batch)
+        found = sum(len(set(exact[query]) & {name for name, _ in system.rank_by_approximate_cosine(query, k)}) for query in batch)
+        candidates = sum(len(system.lsh.candidates(system.calculate_tfidf(query, system.idf))) for query in batch)
+        recall = found / sum(len(names) for names in exact.values())
+        rows.append((f"{tables} x {bits}", f"{latency * 1e3:.2f}", f"{recall:.3f}", candidates // queries))
+    report(f"LSH approximate cosine, {count} documents, {query_length}-word queries", rows)
+
+
+# --- Shared corpus ---
+def build_models(directory, shared):
+    """Builds the four Docs models of app.py, each reading the folder itself or from one shared Corpus."""
+    corpus = Corpus(directory) if shared else None
+    engine = SearchEngine(directory, positional=True, corpus=corpus)
+    engine.load_documents()
+    ranking = RankingSystem(directory, corpus=corpus)
+    bim = BinaryIndependenceModel(directory, corpus=corpus)
+    bim.load_documents()
+    nol = NonOverlappedListModel(directory, corpus=corpus)
+    nol.build_term_document_map()
+    if corpus is not None:
+        corpus.release()
+    return engine, ranking, bim, nol
+
+
+def benchmark_shared_corpus(count=500):
+    """Compares app.py startup (four models over Docs) with and without the shared corpus."""
+    rows = [("models", "seconds", "peak MB", "retained MB")]
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count, vocabulary=5_000, length=100)
+        for shared in (False, True):
+            _, elapsed = timed(build_models, directory, shared)  # Timed without tracemalloc, which slows it down
+            tracemalloc.start()
+            models = build_models(directory, shared)
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del models
+            rows.append(("shared corpus" if shared else "separate", f"{elapsed:.2f}", f"{peak / 1e6:.0f}", f"{retained / 1e6:.0f}"))
+    report(f"Startup of SearchEngine, RankingSystem, BIM and NOL, {count} documents", rows)
+
+
+def benchmark_sharded_ranking(count=50_000, queries=200, k=10, max_workers=None):
+    """
+    Measures BM25 top-k latency (one query at a time) and throughput (a batch broadcast at once)
+    of the sharded RankingSystem from one shard up to the number of cores.
+    """
+    rng = random.Random(11)
+    batch = [" ".join(f"term{rng.randrange(2_000)}" for _ in range(3)) for _ in range(queries)]
+    rows = [("shards", "build (s)", "latency (ms)", "throughput (q/s)", "speedup")]
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count, vocabulary=20_000, length=100)
+        system, elapsed = timed(RankingSystem, directory)
+        latency = time_queries(lambda query: system.rank_by_bm25(query, k), batch[:50])
+        _, batch_time = timed(lambda: [system.rank_by_bm25(query, k) for query in batch])
+        rows.append(("unsharded", f"{elapsed:.1f}", f"{latency * 1e3:.2f}", f"{queries / batch_time:.0f}", "1.00x"))
+        del system
+        for shards in worker_counts(max_workers):
+            sharded, elapsed = timed(ShardedRankingSystem, directory, shards)
+            with sharded:
+                latency = time_queries(lambda query: sharded.rank_by_bm25(query, k), batch[:50])
+                _, sharded_time = timed(sharded.rank_many, "rank_by_bm25", batch, k)
+            rows.append((shards, f"{elapsed:.1f}", f"{latency * 1e3:.2f}", f"{queries / sharded_time:.0f}",
+                         f"{batch_time / sharded_time:.2f}x"))
+    report(f"Sharded BM25 top {k}, {count} documents", rows)
+
+
+def spearman(expected, actual):
+    """Spearman rank correlation between two rankings, over the documents of the expected one."""
+    names = [name for name, _ in expected]
+    if len(names) < 2:
+        return 1.0
+    positions = {name: position for position, (name, _) in enumerate(actual)}
+    ranks = {name: rank for rank, name in enumerate(sorted(names, key=positions.__getitem__))}
+    squared = sum((rank - ranks[name]) ** 2 for rank, name in enumerate(names))
+    return 1 - 6 * squared / (len(names) * (len(names) ** 2 - 1))
+
+
+def weights_memory(directory, weights):
+    """Bytes held by the TF-IDF weights of a RankingSystem (dict vectors and postings, or its WeightStore)."""
+    tracemalloc.start()
+    system = RankingSystem(directory, weights=weights)
+    before = tracemalloc.get_traced_memory()[0]
+    system.doc_vectors = system.doc_norms = system.postings = system.weight_store = None
+    freed = before - tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return freed
+
+
+def benchmark_compact_weights(count=20_000, queries=100, k=10):
+    """
+    Compares the float64 dict weights of RankingSystem with the float32 and 8-bit WeightStore:
+    memory per million postings, cosine query time, and rank correlation with float64.
+    """
+    rng = random.Random(13)
+    batch = [" ".join(f"term{rng.randrange(5_000)}" for _ in range(3)) for _ in range(queries)]
+    rows = [("weights", "MB / 1M postings", "cosine (ms)", "spearman (mean)", "spearman (min)", f"top {k} overlap")]
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, count, vocabulary=20_000, length=100)
+        baseline = RankingSystem(directory)
+        postings = sum(len(vector) for vector in baseline.doc_vectors.values())
+        expected = [baseline.rank_by_cosine_similarity(query) for query in batch]
+        expected = [[item for item in ranking if item[1] > 0] for ranking in expected]
+        for weights in ("float64", "float32", "int8"):
+            system = baseline if weights == "float64" else RankingSystem(directory, weights=weights)
+            latency = time_queries(lambda query: system.rank_by_cosine_similarity(query, k), batch, repeat=1)
+            rankings = [system.rank_by_cosine_similarity(query) for query in batch]
+            correlations = [spearman(wanted, ranking) for wanted, ranking in zip(expected, rankings)]
+            overlap = sum(len({name for name, _ in wanted[:k]} & {name for name, _ in ranking[:k]}) / max(len(wanted[:k]), 1)
+                          for wanted, ranking in zip(expected, rankings)) / queries
+            memory = weights_memory(directory, weights) / postings  # Bytes per posting = MB per million
+            rows.append((weights, f"{memory:.1f}", f"{latency * 1e3:.2f}", f"{sum(correlations) / queries:.6f}",
+                         f"{min(correlations):.6f}", f"{overlap:.3f}"))
+    report(f"TF-IDF weight storage, {count} documents, {postings / 1e6:.2f}M postings", rows)
+
+
+def synthetic_bim(count, vocabulary, length=200):
+    """A BinaryIndependenceModel over a synthetic corpus, with whitespace tokens instead of NLTK stemming."""
+    bim = BinaryIndependenceModel("Docs")
+    bim.preprocessed_docs = {filename: content.split()
+                             for filename, _, content in synthetic_documents(count, vocabulary, length)}
+    return bim
+
+
+def list_bim_matrix(bim):
+    """The original BIM matrix, one vocabulary-long list of 0/1 ints per document (with a set lookup per term)."""
+    term_list = sorted(set(term for terms in bim.preprocessed_docs.values() for term in terms))
+    return term_list, {doc: [1 if term in set_terms else 0 for term in term_list]
+                       for doc, set_terms in ((doc, set(terms)) for doc, terms in bim.preprocessed_docs.items())}
+
+
+def list_bim_scores(matrix, query_vector):
+    """The original Dice scoring loop over the list matrix."""
+    scores = {}
+    for doc, doc_vector in matrix.items():
+        intersection = sum(min(q, d) for q, d in zip(query_vector, doc_vector))
+        query_sum = sum(query_vector)
+        doc_sum = sum(doc_vector)
+        scores[doc] = (2 * intersection) / (query_sum + doc_sum) if (query_sum + doc_sum) != 0 else 0
+    return scores
+
+
+def benchmark_bim_bitsets(sizes=((1_000, 10_000), (10_000, 100_000)), list_limit=1_000 * 10_000):
+    """
+    Compares the original list-of-ints BIM matrix with packed int bitsets: matrix memory, build
+    time and Dice scoring time. The list matrix is only built up to list_limit cells.
+    """
+    queries = ["term5 term500 term5000", "term1 term2 term3 term4", "term10 term20000 term90000"]
+    rows = [("docs x terms", "list (MB)", "bitset (MB)", "list build (s)", "bitset build (s)",
+             "list (ms/query)", "bitset (ms/query)")]
+    for count, vocabulary in sizes:
+        bim = synthetic_bim(count, vocabulary)
+        (_, bitset_memory), bitset_build = timed(measure_memory, bim.build_term_document_matrix)
+        bitset = time_queries(bim.retrieve_top_k_documents, queries)
+        list_memory = list_build = list_time = None
+        if count * len(bim.term_list) <= list_limit:
+            ((term_list, matrix), list_memory), list_build = timed(measure_memory, list_bim_matrix, bim)
+            list_time = time_queries(lambda query: list_bim_scores(matrix, [1 if term in query.split() else 0
+                                                                          for term in term_list]), queries, repeat=1)
+            del matrix
+        rows.append((f"{count} x {len(bim.term_list)}",
+                     f"{list_memory / 1e6:.0f}" if list_memory else f"~{count * len(bim.term_list) * 8 / 1e6:.0f} (est.)",
+                     f"{bitset_memory / 1e6:.1f}", f"{list_build:.1f}" if list_build else "-", f"{bitset_build:.1f}",
+                     f"{list_time * 1e3:.0f}" if list_time else "-", f"{bitset * 1e3:.1f}"))
+    report("BIM term-document matrix, Dice scoring", rows)
+
+
+def benchmark_bim_postings(counts=(1_000, 10_000, 40_000), vocabulary=20_000, k=5):
+    """Compares BIM Dice scoring of every packed row with the postings of the query terms and a top-k heap."""
+    queries = ["term5000 term9000", "term15000 term19000 term12000", "term100 term7000"]
+    rows = [("documents", "bitset (ms/query)", f"postings top {k} (ms/query)", "postings touched")]
+    for count in counts:
+        bim = synthetic_bim(count, vocabulary, length=100)
+        bim.build_term_document_matrix()
+        full = time_queries(lambda query: bim.rank_documents(bim.score_documents(bim.preprocess_query(query)))[:k],
+                            queries)
+        sparse = time_queries(lambda query: bim.retrieve_top_k_documents(query, k), queries)
+        touched = sum(len(bim.postings.get(term, ())) for query in queries for term in set(bim.preprocess(query)))
+        rows.append((count, f"{full * 1e3:.2f}", f"{sparse * 1e3:.3f}", f"{touched / len(queries):.0f}"))
+    report(f"BIM top-{k} retrieval of rare terms, {vocabulary} term vocabulary", rows)
+
+
+def benchmark_bim_feedback(counts=(1_000, 10_000, 40_000), vocabulary=20_000, judgments=50, k=5):
+    """
+    Measures the cost of one BIM relevance judgment (incremental RSJ counts) against recomputing
+    every term weight, and RSJ top-k query latency once judgments have arrived.
+    """
+    queries = ["term5000 term9000", "term15000 term19000 term12000", "term100 term7000"]
+    rows = [("documents", "judgment (ms)", "all weights (ms)", f"rsj top {k} (ms/query)")]
+    for count in counts:
+        bim = synthetic_bim(count, vocabulary, length=100)
+        bim.build_term_document_matrix()
+        docs = list(bim.doc_order)[:judgments]
+        _, judged = timed(lambda: [bim.add_relevance_feedback(doc) for doc in docs])
+        _, recompute = timed(lambda: [bim.rsj_weight(term) for term in bim.postings])
+        bim.add_relevance_feedback(docs[0], relevant=False)  # Stale weights again, recomputed by the queries
+        latency = time_queries(lambda query: bim.retrieve_top_k_documents(query, k, weighting="rsj"), queries)
+        rows.append((count, f"{judged / judgments * 1e3:.3f}", f"{recompute * 1e3:.1f}", f"{latency * 1e3:.3f}"))
+    report(f"BIM relevance feedback, {vocabulary} term vocabulary", rows)
+
+
+def project_texts():
+    """The texts of Docs, NeuralDocs and the Structured_Docs sections, the inputs of the Porter-stemming models."""
+    texts = []
+    for folder in ("Docs", "NeuralDocs"):
+        for filename in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, filename), 'r', encoding='utf-8') as file:
+                texts.append(file.read())
+    for filename in sorted(os.listdir("Structured_Docs")):
+        with open(os.path.join("Structured_Docs", filename), 'r', encoding='utf-8') as file:
+            document = json.load(file)
+        texts += [document["title"]] + [section["content"] for section in document["sections"]]
+    return texts
+
+
+def nltk_analyze(text, stop_words, stemmer):
+    """The original BIM/NOL/PN preprocessing, NLTK word_tokenize then a Porter stem per token (baseline)."""
+    return [stemmer.stem(word) for word in word_tokenize(text.lower()) if word.isalnum() and word not in stop_words]
+
+
+def benchmark_tokenizer(repeats=(10, 100, 1_000)):
+    """Compares the tokens/s of the NLTK preprocessing with the Analyzer, on the project texts repeated."""
+    texts = project_texts()
+    stop_words, stemmer = set(stopwords.words('english')), PorterStemmer()
+    rows = [("tokens", "nltk (tokens/s)", "analyzer cold (tokens/s)", "analyzer warm (tokens/s)", "same output")]
+    for repeat in repeats:
+        text = "\n".join(texts * repeat)
+        baseline, nltk_time = timed(nltk_analyze, text, stop_words, stemmer)
+        analyzer = Analyzer()
+        terms, cold = timed(analyzer.analyze, text)
+        _, warm = timed(analyzer.analyze, text)
+        rows.append((len(baseline), f"{len(baseline) / nltk_time:,.0f}", f"{len(terms) / cold:,.0f}",
+                     f"{len(terms) / warm:,.0f}", "yes" if terms == baseline else "no"))
+    report("BIM/NOL/PN preprocessing throughput", rows)
+
+
+def synthetic_structured_documents(count, sections=5, vocabulary=20_000, length=40):
+    """Yields (filename, document) in the Structured_Docs JSON layout, with synthetic headings and contents."""
+    documents = synthetic_documents(count * sections, vocabulary, length)
+    for i in range(count):
+        parts = [next(documents) for _ in range(sections)]
+        yield f"doc{i}.json", {"title": parts[0][1], "sections": [{"heading": title[:20], "content": content}
+                                                                   for _, title, content in parts]}
+
+
+def benchmark_region_index(counts=(1_000, 10_000, 40_000), queries=50):
+    """
+    Compares "headings of the sections containing a query" through the region index with a scan
+    of every section's term set (built once, so the scan does not even re-tokenize).
+    """
+    rng = random.Random(3)
+    query_sets = {"rare": [f"term{rng.randrange(5_000, 20_000)}" for _ in range(queries)],
+                  "common": [f"term{rng.randrange(0, 20)} term{rng.randrange(20, 200)}" for _ in range(queries)]}
+    rows = [("documents", "queries", "section scan (ms/query)", "region index (ms/query)", "sections found")]
+    for count in counts:
+        regions = RegionIndex()
+        section_terms = []
+        for filename, document in synthetic_structured_documents(count):
+            regions.add_structured_document(filename, document)
+            section_terms += [(filename, section["heading"], set(section["heading"].split() + section["content"].split()))
+                              for section in document["sections"]]
+        for kind, texts in query_sets.items():
+            scan = time_queries(lambda query: [(filename, heading) for filename, heading, terms in section_terms
+                                               if terms.issuperset(query.split())], texts, repeat=1)
+            indexed = time_queries(lambda query: regions.describe(
+                regions.within("heading", regions.containing(regions.regions("section"), query))), texts)
+            found = sum(len(regions.containing(regions.regions("section"), query)) for query in texts) / len(texts)
+            rows.append((count, kind, f"{scan * 1e3:.2f}", f"{indexed * 1e3:.3f}", f"{found:.0f}"))
+    report("Region index: headings within sections containing a query", rows)
+
+
+BENCHMARKS = {
+    "dictionary": benchmark_dictionary,
+    "index_memory": benchmark_index_memory,
+    "cold_start": benchmark_cold_start,
+    "parallel_ingestion": benchmark_parallel_ingestion,
+    "top_k": benchmark_top_k,
+    "phrase_queries": benchmark_phrase_queries,
+    "snippets": benchmark_snippets,
+    "search_many": benchmark_search_many,
+    "ranking_statistics": benchmark_ranking_statistics,
+    "ranking_backends": benchmark_ranking_backends,
+    "keyword_matching": benchmark_keyword_matching,
+    "bm25_top_k": benchmark_bm25_top_k,
+    "streaming_index": benchmark_streaming_index,
+    "lsh": benchmark_lsh,
+    "shared_corpus": benchmark_shared_corpus,
+    "sharded_ranking": benchmark_sharded_ranking,
+    "compact_weights": benchmark_compact_weights,
+    "bim_bitsets": benchmark_bim_bitsets,
+    "bim_postings": benchmark_bim_postings,
+    "bim_feedback": benchmark_bim_feedback,
+    "tokenizer": benchmark_tokenizer,
+    "region_index": benchmark_region_index,
+}
+
+if __name__ == '__main__':
+    # Usage: python Benchmark.py [name ...]  (runs every benchmark when no name is given)
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,65 @@
+import os
+
+
+class Corpus:
+    """
+    The documents of a folder, read once and shared by every model built on them.
+
+    Each model analyzes text with its own pipeline (SearchEngine lemmatizes, BIM and NOL
+    Porter-stem, RankingSystem keeps alphanumeric words). analyze() memoizes the output of
+    each pipeline per document, so models with the same pipeline share one token stream.
+
+    Attributes:
+        folder_path (str): Folder of the .txt documents.
+        texts (dict): Filename -> full file text, in directory order.
+        titles (dict): Filename -> title line without its "Title: " prefix.
+        contents (dict): Filename -> content without its "Content: " prefix.
+        analyses (dict): (analyzer, field) -> {filename: analyzer output}.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.load()
+
+    def load(self):
+        """(Re)reads every document of the folder and forgets the memoized analyses."""
+        self.texts, self.titles, self.contents = {}, {}, {}
+        self.analyses = {}
+        for filename in os.listdir(self.folder_path):
+            if filename.endswith(".txt"):
+                with open(os.path.join(self.folder_path, filename), 'r', encoding='utf-8') as file:
+                    text = file.read()
+                doc = text.split("\n", 1)
+                self.texts[filename] = text
+                self.titles[filename] = doc[0].replace("Title: ", "")
+                self.contents[filename] = doc[1].replace("Content: ", "")
+
+    def field(self, field):
+        """Returns the filename -> text dict of a field: "text", "title" or "content"."""
+        return {"text": self.texts, "title": self.titles, "content": self.contents}[field]
+
+    def analyze(self, analyzer, field, function):
+        """
+        Returns filename -> function(text) for a field of every document, computed only the
+        first time an analyzer name is requested for that field.
+
+        Args:
+            analyzer (str): Name of the pipeline; models that share a name must use the same function.
+            field (str): "text", "title" or "content".
+            function (callable): Text -> analysis, e.g. a token list.
+        """
+        key = (analyzer, field)
+        if key not in self.analyses:
+            self.analyses[key] = {filename: function(text) for filename, text in self.field(field).items()}
+        return self.analyses[key]
+
+    def release(self):
+        """Drops the memoized analyses once every model is built (the models keep what they need)."""
+        self.analyses = {}
+
+    def __iter__(self):
+        """Iterates over the filenames in directory order."""
+        return iter(self.texts)
+
+    def __len__(self):
+        return len(self.texts)
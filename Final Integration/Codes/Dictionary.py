@@ -1,76 +1,141 @@
-class Node:
-    """Node class to store key-value pairs in a linked list for handling collisions."""
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-        self.next = None
+from array import array
+
+_EMPTY = -1      # Index slot that has never been used
+_DUMMY = -2      # Index slot whose entry was deleted
+_DELETED = object()  # Placeholder left in the entry lists after a delete
+
 
 class CustomDictionary:
-    """Custom dictionary data structure with basic hash table implementation."""
+    """
+    Custom dictionary data structure with a compact, self-resizing hash table.
+
+    Entries are kept in parallel lists (hashes, keys, values) in insertion order,
+    and an open-addressed index table maps each slot to an entry position. The
+    table doubles when its load factor passes 2/3, so lookups stay O(1) as the
+    number of keys grows instead of walking long collision chains.
+    """
 
-    def __init__(self, size=500):
-        self.size = size
-        self.table = [None] * self.size
+    def __init__(self, size=8):
+        """
+        Initializes an empty dictionary.
+
+        Args:
+            size (int): Initial number of slots, rounded up to a power of two.
+        """
+        self.size = 8
+        while self.size < size:
+            self.size <<= 1
+        self._clear_table()
+
+    def _clear_table(self):
+        """Resets the index table and the entry lists for the current size."""
+        self.table = array('l', [_EMPTY]) * self.size
+        self._hashes = []
+        self._keys = []
+        self._values = []
+        self._used = 0  # Live keys
 
     def _hash(self, key):
-        """Hashes the key to an index based on the size of the table."""
-        return hash(key) % self.size
+        """Hashes the key to a non-negative integer used for probing."""
+        return hash(key) & 0xFFFFFFFFFFFFFFFF
+
+    def _lookup(self, key, hashed):
+        """
+        Probes the index table for a key.
+
+        Returns:
+            tuple: (slot, entry) where entry is the position in the entry lists,
+            or -1 when the key is missing and slot is where it should be inserted.
+        """
+        mask = self.size - 1
+        table = self.table
+        slot = hashed & mask
+        perturb = hashed
+        free = -1
+        while True:
+            entry = table[slot]
+            if entry == _EMPTY:
+                return (slot if free < 0 else free), -1
+            if entry == _DUMMY:
+                if free < 0:
+                    free = slot
+            elif self._hashes[entry] == hashed:
+                stored = self._keys[entry]
+                if stored is key or stored == key:
+                    return slot, entry
+            # Same perturbed probe sequence as CPython's dict, so every slot is reachable
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+
+    def _resize(self):
+        """Grows the table and compacts the entry lists, dropping deleted entries."""
+        hashes, keys, values = self._hashes, self._keys, self._values
+        new_size = 8
+        while new_size <= self._used * 3:
+            new_size <<= 1
+        self.size = new_size
+        self._clear_table()
+        for hashed, key, value in zip(hashes, keys, values):
+            if key is not _DELETED:
+                self._append(key, value, hashed, self._lookup(key, hashed)[0])
+
+    def _append(self, key, value, hashed, slot):
+        """Stores a new entry and points the given slot at it."""
+        self.table[slot] = len(self._keys)
+        self._hashes.append(hashed)
+        self._keys.append(key)
+        self._values.append(value)
+        self._used += 1
 
     def insert(self, key, value):
         """Inserts a key-value pair into the dictionary."""
-        index = self._hash(key)
-        if not self.table[index]:
-            self.table[index] = Node(key, value)
-        else:
-            current = self.table[index]
-            while current:
-                if current.key == key:
-                    current.value = value  # Update existing key
-                    return
-                if not current.next:
-                    break
-                current = current.next
-            current.next = Node(key, value)  # Insert new node at the end
+        hashed = self._hash(key)
+        slot, entry = self._lookup(key, hashed)
+        if entry >= 0:
+            self._values[entry] = value  # Update existing key
+            return
+        self._append(key, value, hashed, slot)
+        # Deleted entries still occupy the entry lists, so they count towards the load
+        if len(self._keys) * 3 >= self.size * 2:
+            self._resize()
 
     def get(self, key):
         """Retrieves the value associated with the given key."""
-        index = self._hash(key)
-        current = self.table[index]
-        while current:
-            if current.key == key:
-                return current.value
-            current = current.next
-        raise KeyError(f"Key '{key}' not found.")
+        entry = self._lookup(key, self._hash(key))[1]
+        if entry < 0:
+            raise KeyError(f"Key '{key}' not found.")
+        return self._values[entry]
 
     def items(self):
-        """Yields key-value pairs stored in the dictionary."""
-        for node in self.table:
-            current = node
-            while current:
-                yield current.key, current.value
-                current = current.next
+        """Yields key-value pairs stored in the dictionary, in insertion order."""
+        for key, value in zip(self._keys, self._values):
+            if key is not _DELETED:
+                yield key, value
 
     def delete(self, key):
         """Deletes a key-value pair from the dictionary."""
-        index = self._hash(key)
-        current = self.table[index]
-        prev = None
-        while current:
-            if current.key == key:
-                if prev:
-                    prev.next = current.next
-                else:
-                    self.table[index] = current.next
-                return
-            prev = current
-            current = current.next
-        raise KeyError(f"Key '{key}' not found.")
+        slot, entry = self._lookup(key, self._hash(key))
+        if entry < 0:
+            raise KeyError(f"Key '{key}' not found.")
+        self.table[slot] = _DUMMY
+        self._keys[entry] = _DELETED
+        self._values[entry] = None
+        self._used -= 1
+
+    def __contains__(self, key):
+        """Checks whether the key is stored in the dictionary."""
+        return self._lookup(key, self._hash(key))[1] >= 0
+
+    def __len__(self):
+        """Returns the number of keys stored in the dictionary."""
+        return self._used
+
+    def __iter__(self):
+        """Iterates over the keys in insertion order."""
+        for key in self._keys:
+            if key is not _DELETED:
+                yield key
 
     def __repr__(self):
         """Returns a string representation of the dictionary."""
-        items = []
-        for i, node in enumerate(self.table):
-            while node:
-                items.append(f"{node.key}: {node.value}")
-                node = node.next
-        return "{" + ", ".join(items) + "}"
+        return "{" + ", ".join(f"{key}: {value}" for key, value in self.items()) + "}"
@@ -0,0 +1,124 @@
+import hashlib
+
+try:  # Imported as part of the Codes package (app.py)
+    from . import SparseMatrix
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    import SparseMatrix
+
+np = SparseMatrix.np  # Optional dependency, only needed when an LSH index is built
+
+GOLDEN = 0x9E3779B97F4A7C15  # 2^64 / golden ratio, the SplitMix64 increment
+
+
+def mix(values):
+    """SplitMix64 finalizer: scrambles an array of uint64 into well-distributed uint64 hashes."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def term_key(term, seed):
+    """Stable 64-bit key of a term under a seed (Python's str hash changes between processes)."""
+    digest = hashlib.blake2b(term.encode('utf-8'), digest_size=8, salt=seed.to_bytes(8, 'little', signed=True)).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class CosineLSH:
+    """
+    Locality-sensitive hash index for cosine similarity with signed random projections.
+
+    Each of the tables hashes a vector to `bits` signs of its dot products with random
+    Gaussian hyperplanes; two vectors at angle theta agree on a bit with probability
+    1 - theta / pi, so similar documents tend to share a bucket. More bits make buckets
+    smaller (faster, lower recall), more tables give more chances to collide (higher recall).
+
+    The hyperplanes are never stored: a term's coordinates in all of them are derived on
+    demand from a seeded hash of the term (SplitMix64 counters turned into Gaussians with
+    the Box-Muller transform), so only one 64-bit key per term is kept instead of a dense
+    terms x (tables * bits) matrix.
+
+    Attributes:
+        names (list): Document name of each row.
+        tables (int): Number of hash tables.
+        bits (int): Hyperplanes (key bits) per table.
+        terms (dict): Term -> column of term_keys.
+        term_keys (ndarray): uint64 key of each term, from which its hyperplane coordinates are derived.
+        buckets (list): One dict per table, key -> array of rows.
+    """
+
+    def __init__(self, names, doc_vectors, tables=8, bits=8, seed=0, chunk=256):
+        """
+        Hashes the document vectors into every table.
+
+        Args:
+            names (list): Document names, in row order.
+            doc_vectors (list): Term -> weight dict of each document, in the same order.
+            tables (int): Number of hash tables.
+            bits (int): Key bits per table (at most 62).
+            seed (int): Seed of the random hyperplanes.
+            chunk (int): Documents projected at once, bounding the temporary memory.
+        """
+        self.names = names
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        matrix = SparseMatrix.TermDocumentMatrix(doc_vectors)
+        self.terms = matrix.terms
+        self.term_keys = np.array([term_key(term, seed) for term in self.terms], dtype=np.uint64)
+        self.weights = np.left_shift(1, np.arange(bits, dtype=np.int64))
+
+        keys = np.empty((matrix.rows, tables), dtype=np.int64)
+        for start in range(0, matrix.rows, chunk):
+            end = min(start + chunk, matrix.rows)
+            first, last = matrix.indptr[start], matrix.indptr[end]
+            contributions = matrix.data[first:last, None] * self.planes(self.term_keys[matrix.indices[first:last]])
+            # Row sums as differences of the running sum at the row boundaries (empty rows give 0)
+            totals = np.vstack([np.zeros(tables * bits), np.cumsum(contributions, axis=0)])
+            bounds = matrix.indptr[start:end + 1] - first
+            keys[start:end] = self.keys(totals[bounds[1:]] - totals[bounds[:-1]])
+
+        self.buckets = []
+        for table in range(tables):
+            column = keys[:, table]
+            order = np.argsort(column, kind="stable")
+            values, starts = np.unique(column[order], return_index=True)
+            self.buckets.append(dict(zip(values.tolist(), np.split(order, starts[1:]))))
+
+    def planes(self, keys):
+        """
+        Returns the hyperplane coordinates of terms, given their keys: one float32 row of
+        tables x bits standard normal values per key, the same for a key every time.
+        """
+        counters = keys[:, None] + np.arange(1, self.tables * self.bits + 1, dtype=np.uint64) * np.uint64(GOLDEN)
+        hashes = mix(counters)
+        # Box-Muller: the high 32 bits give the radius (never log(0)), the low 32 bits the angle
+        radius = np.sqrt(-2 * np.log(((hashes >> np.uint64(32)).astype(np.float64) + 0.5) / 2 ** 32))
+        angle = (hashes & np.uint64(0xFFFFFFFF)).astype(np.float64) * (2 * np.pi / 2 ** 32)
+        return (radius * np.cos(angle)).astype(np.float32)
+
+    def keys(self, projections):
+        """Turns projections (one row of tables x bits values per vector) into one key per table."""
+        signs = (projections > 0).reshape(len(projections), self.tables, self.bits)
+        return signs @ self.weights
+
+    def candidates(self, query_weights):
+        """
+        Returns the names of the documents sharing a bucket with the query in any table, in row order.
+
+        Args:
+            query_weights (dict): Term -> query weight; unknown terms are ignored.
+        """
+        columns, weights = [], []
+        for term, weight in query_weights.items():
+            column = self.terms.get(term)
+            if column is not None:
+                columns.append(column)
+                weights.append(weight)
+        projection = np.zeros(self.tables * self.bits)
+        if columns:
+            projection = np.array(weights) @ self.planes(self.term_keys[columns])
+        rows = [self.buckets[table].get(key) for table, key in enumerate(self.keys(projection[None])[0].tolist())]
+        rows = [bucket for bucket in rows if bucket is not None]
+        if not rows:
+            return []
+        return [self.names[row] for row in np.unique(np.concatenate(rows)).tolist()]
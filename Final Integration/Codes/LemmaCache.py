@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from nltk.stem import WordNetLemmatizer
+
+
+class MemoCache:
+    """
+    Bounded least-recently-used memo of a one-argument function, e.g. token -> lemma or word -> stem.
+
+    Natural-language text repeats the same tokens constantly, so most lookups are
+    answered without calling the function.
+
+    Attributes:
+        function (callable): The memoized function.
+        maxsize (int): Maximum number of keys kept; the least recently used are evicted first.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to call the function.
+    """
+
+    def __init__(self, function, maxsize=100_000):
+        self.function = function
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """Returns function(key), calling the function only on a cache miss."""
+        cache = self.cache
+        try:
+            value = cache[key]
+        except KeyError:
+            self.misses += 1
+            value = cache[key] = self.function(key)
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+            return value
+        self.hits += 1
+        cache.move_to_end(key)
+        return value
+
+    def stats(self):
+        """Returns hit/miss counters and the current fill of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "size": len(self.cache),
+            "maxsize": self.maxsize,
+        }
+
+    def items(self):
+        """Returns the cached (key, value) pairs, least recently used first."""
+        return list(self.cache.items())
+
+    def warm(self, pairs):
+        """Preloads (key, value) pairs, e.g. from a snapshot, without touching the counters."""
+        for key, value in pairs:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+
+class LemmaCache(MemoCache):
+    """Bounded least-recently-used memo of token -> WordNet lemma."""
+
+    def __init__(self, maxsize=100_000):
+        self.lemmatizer = WordNetLemmatizer()
+        super().__init__(self.lemmatizer.lemmatize, maxsize)
+
+    # Returns the lemma of a lowercase token, lemmatizing it only on a cache miss
+    lemmatize = MemoCache.lookup
@@ -1,23 +1,27 @@
 import os
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
+import json
 from collections import defaultdict
 
+try:  # Imported as part of the Codes package (app.py)
+    from .Analyzer import Analyzer
+    from .Regions import RegionIndex, Regions
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from Analyzer import Analyzer
+    from Regions import RegionIndex, Regions
+
 class NonOverlappedListModel:
-    def __init__(self, docs_folder):
+    def __init__(self, docs_folder, corpus=None, analyzer=None):
         self.docs_folder = docs_folder
+        self.corpus = corpus  # Shared Corpus to take the documents and their stemmed tokens from
+        self.analyzer = analyzer or Analyzer()  # Tokenizer and stem cache, may be shared with BIM and PN
         self.documents = {}
         self.preprocessed_docs = {}
         self.term_doc_map = defaultdict(set)
-        self.stop_words = set(stopwords.words('english'))
-        self.stemmer = PorterStemmer()
+        self.regions = RegionIndex(self.analyzer)  # Titles, paragraphs and sections as non-overlapping region lists
 
     def preprocess_text(self, text):
         """Preprocess text by tokenizing, removing stop words, and stemming."""
-        tokens = word_tokenize(text.lower())
-        filtered_tokens = [self.stemmer.stem(word) for word in tokens if word.isalnum() and word not in self.stop_words]
-        return filtered_tokens
+        return self.analyzer.analyze(text)
 
     def load_document(self, filename):
         """Load and preprocess a single document."""
@@ -29,6 +33,16 @@ class NonOverlappedListModel:
 
     def build_term_document_map(self):
         """Create a mapping of terms to the documents they appear in."""
+        if self.corpus is not None:
+            # Same pipeline as BinaryIndependenceModel.preprocess, so the token streams are shared
+            preprocessed = self.corpus.analyze("porter", "text", self.preprocess_text)
+            for filename, content in self.corpus.texts.items():
+                self.documents[filename] = content
+                self.preprocessed_docs[filename] = preprocessed[filename]
+                for term in preprocessed[filename]:
+                    self.term_doc_map[term].add(filename)
+                self.regions.add_text_document(filename, self.corpus.titles[filename], self.corpus.contents[filename])
+            return
         for filename in os.listdir(self.docs_folder):
             if filename.endswith(".txt"):
                 content, preprocessed_terms = self.load_document(filename)
@@ -36,6 +50,16 @@ class NonOverlappedListModel:
                 self.preprocessed_docs[filename] = preprocessed_terms
                 for term in preprocessed_terms:
                     self.term_doc_map[term].add(filename)
+                doc = content.split("\n", 1)
+                self.regions.add_text_document(filename, doc[0].replace("Title: ", ""),
+                                               doc[1].replace("Content: ", "") if len(doc) > 1 else "")
+
+    def load_structured_documents(self, folder):
+        """Add the titles and sections (heading + content) of the JSON documents of a folder to the region index."""
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith(".json"):
+                with open(os.path.join(folder, filename), 'r', encoding='utf-8') as file:
+                    self.regions.add_structured_document(filename, json.load(file))
 
     def retrieve_documents_for_term(self, term):
         """Retrieve documents containing the specified term."""
@@ -59,3 +83,22 @@ class NonOverlappedListModel:
 
         return non_overlapping_docs
 
+    def sections_containing(self, query):
+        """Return (document, heading) of the sections containing every term of the query."""
+        return self.regions.describe(self.regions.containing(self.regions.regions("section"), query))
+
+    def headings_within_sections_containing(self, query):
+        """Return (document, heading) of the headings of the sections containing every term of the query."""
+        sections = self.regions.containing(self.regions.regions("section"), query)
+        return self.regions.describe(self.regions.within("heading", sections))
+
+    def paragraphs_containing(self, query):
+        """Return (document, paragraph) of the Docs paragraphs containing every term of the query."""
+        return self.regions.describe(self.regions.containing(self.regions.regions("paragraph"), query))
+
+    def retrieve_sections(self, terms):
+        """Return (document, heading) of the sections containing any of the terms, in text order."""
+        rows = set()
+        for term in terms:
+            rows.update(self.regions.containing(self.regions.regions("section"), term))
+        return self.regions.describe(Regions("section", sorted(rows)))
@@ -1,15 +1,17 @@
 import os
 import json
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
+from collections import deque
+
+try:  # Imported as part of the Codes package (app.py)
+    from .Analyzer import Analyzer
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from Analyzer import Analyzer
 
 class ProximalNodesModel:
-    def __init__(self):
+    def __init__(self, analyzer=None):
         # Initialize an empty graph structure
         self.graph = {}
-        self.stop_words = set(stopwords.words('english'))
-        self.stemmer = PorterStemmer()
+        self.analyzer = analyzer or Analyzer()  # Tokenizer and stem cache, may be shared with BIM and NOL
 
     def add_node(self, node):
         """Add a node to the graph if it doesn't exist."""
@@ -48,19 +50,18 @@ class ProximalNodesModel:
 
     def preprocess(self, text):
         """Preprocess text by tokenizing, removing stop words, and stemming."""
-        tokens = word_tokenize(text.lower())
-        filtered_tokens = [self.stemmer.stem(word) for word in tokens if word.isalnum() and word not in self.stop_words]
-        return filtered_tokens
+        return self.analyzer.analyze(text)
 
     def retrieve_connected_documents(self, proximal_nodes):
         """Retrieve documents directly or indirectly connected to the given proximal nodes."""
         visited = set()
         connected_documents = set()
 
-        # Breadth-first search to explore the graph
-        queue = list(proximal_nodes)
+        # Breadth-first search to explore the graph; only the given nodes need preprocessing,
+        # the neighbors are already stemmed terms of the graph
+        queue = deque(terms[0] for terms in map(self.preprocess, proximal_nodes) if terms)
         while queue:
-            current_node = self.preprocess(queue.pop(0))[0]
+            current_node = queue.popleft()
             if current_node not in visited:
                 visited.add(current_node)
                 for neighbor in self.graph.get(current_node, []):
@@ -0,0 +1,170 @@
+from array import array
+from bisect import bisect_left
+
+
+def encode_positions(positions):
+    """
+    Delta-encodes sorted word positions as variable-length integers (7 bits per byte).
+
+    Args:
+        positions (list): Increasing word positions within a document.
+
+    Returns:
+        bytes: The encoded gaps.
+    """
+    encoded = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            encoded.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        encoded.append(gap)
+    return bytes(encoded)
+
+
+def decode_positions(data, start=0, end=None, limit=None):
+    """Decodes positions written by encode_positions from data[start:end], stopping after limit positions."""
+    end = len(data) if end is None else end
+    positions = []
+    position = shift = gap = 0
+    for index in range(start, end):
+        byte = data[index]
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            position += gap
+            positions.append(position)
+            if len(positions) == limit:
+                break
+            gap = shift = 0
+    return positions
+
+
+class PostingsList:
+    """
+    Postings of a single term, stored as two parallel unsigned int arrays.
+
+    Attributes:
+        doc_ids (array): Sorted integer document IDs containing the term.
+        freqs (array): Frequency of the term in the matching document.
+        max_freq (int): Largest frequency in the list, the term's score upper bound for top-k pruning.
+        positions (bytearray): Delta-encoded word positions of every posting, back to back,
+            or None when the index is not positional.
+        offsets (array): Start of each posting's positions in `positions`, plus the end of the last one.
+
+    Postings loaded from a snapshot are read-only memoryviews over the mapped file;
+    they are copied into arrays the first time they are modified.
+    """
+    __slots__ = ("doc_ids", "freqs", "max_freq", "positions", "offsets")
+
+    def __init__(self, doc_ids=None, freqs=None, max_freq=None, positions=None, offsets=None, positional=False):
+        self.doc_ids = doc_ids if doc_ids is not None else array('I')
+        self.freqs = freqs if freqs is not None else array('I')
+        self.max_freq = max_freq if max_freq is not None else max(self.freqs, default=0)
+        if positions is None and positional:
+            positions, offsets = bytearray(), array('I', [0])
+        self.positions = positions
+        self.offsets = offsets
+
+    def add(self, doc_id, freq, positions=None):
+        """
+        Adds (or overwrites) the frequency of a document, keeping doc IDs sorted.
+
+        Documents are indexed in increasing ID order, so this is normally an append.
+
+        Args:
+            doc_id (int): The document ID.
+            freq (int): Frequency of the term in the document.
+            positions (list): Sorted word positions of the term, for positional postings.
+        """
+        self._materialize()
+        doc_ids = self.doc_ids
+        encoded = encode_positions(positions or ()) if self.positions is not None else None
+        if not doc_ids or doc_ids[-1] < doc_id:
+            doc_ids.append(doc_id)
+            self.freqs.append(freq)
+            if encoded is not None:
+                self.positions += encoded
+                self.offsets.append(len(self.positions))
+        else:
+            position = bisect_left(doc_ids, doc_id)
+            if position < len(doc_ids) and doc_ids[position] == doc_id:
+                replaced = self.freqs[position]
+                self.freqs[position] = freq
+                if encoded is not None:
+                    self._splice_positions(position, encoded, replace=True)
+                if replaced == self.max_freq and freq < replaced:
+                    self.max_freq = max(self.freqs)
+                    return
+            else:
+                doc_ids.insert(position, doc_id)
+                self.freqs.insert(position, freq)
+                if encoded is not None:
+                    self._splice_positions(position, encoded, replace=False)
+        if freq > self.max_freq:
+            self.max_freq = freq
+
+    def remove(self, doc_id):
+        """
+        Removes a document from the postings.
+
+        Returns:
+            bool: True if the document was present.
+        """
+        self._materialize()
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            del self.doc_ids[position]
+            removed = self.freqs.pop(position)
+            if self.positions is not None:
+                self._splice_positions(position, b"", replace=True)
+                del self.offsets[position + 1]
+            if removed == self.max_freq:
+                self.max_freq = max(self.freqs, default=0)
+            return True
+        return False
+
+    def _splice_positions(self, index, encoded, replace):
+        """Replaces (or inserts) the encoded positions of the posting at index, shifting later offsets."""
+        offsets = self.offsets
+        start = offsets[index]
+        end = offsets[index + 1] if replace else start
+        self.positions[start:end] = encoded
+        shift = len(encoded) - (end - start)
+        if not replace:
+            offsets.insert(index + 1, start)
+        for later in range(index + 1, len(offsets)):
+            offsets[later] += shift
+
+    def positions_at(self, index, limit=None):
+        """Returns the decoded word positions of the posting at the given index (the first limit ones)."""
+        return decode_positions(self.positions, self.offsets[index], self.offsets[index + 1], limit)
+
+    def detach(self):
+        """Copies snapshot-backed postings into memory, so the snapshot can be closed."""
+        self._materialize()
+
+    def _materialize(self):
+        """Copies memory-mapped postings into writable arrays."""
+        if not isinstance(self.doc_ids, array):
+            doc_ids, freqs = array('I'), array('I')
+            doc_ids.frombytes(self.doc_ids.cast('B'))
+            freqs.frombytes(self.freqs.cast('B'))
+            self.doc_ids, self.freqs = doc_ids, freqs
+            if self.positions is not None:
+                offsets = array('I')
+                offsets.frombytes(self.offsets.cast('B'))
+                self.positions, self.offsets = bytearray(self.positions), offsets
+
+    def items(self):
+        """Yields (doc_id, freq) pairs in doc ID order."""
+        return zip(self.doc_ids, self.freqs)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __repr__(self):
+        return "{" + ", ".join(f"{doc_id}: {freq}" for doc_id, freq in self.items()) + "}"
@@ -1,24 +1,178 @@
 import os
 import math
+import heapq
 from collections import Counter
+from itertools import islice
+
+try:  # Imported as part of the Codes package (app.py)
+    from . import SparseMatrix
+    from .LSH import CosineLSH
+    from .WeightStore import WeightStore
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    import SparseMatrix
+    from LSH import CosineLSH
+    from WeightStore import WeightStore
+
+np = SparseMatrix.np  # Optional dependency, only needed by the numpy backend
+
+BACKENDS = ("python", "numpy")
+WEIGHTS = ("float64", "float32", "int8")
+FIELDS = ("content", "title")
 
 class RankingSystem:
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, backend="python", corpus=None, weights="float64"):
+        """
+        Load the documents and build the ranking statistics.
+
+        backend is "python" (dicts) or "numpy" (a CSR term-document matrix scored with
+        vectorized products, requires NumPy); both return the same rankings. With a shared
+        Corpus, documents and their tokens come from it instead of the folder. weights
+        "float32" or "int8" (python backend only) keep the TF-IDF weights in a compact
+        WeightStore instead of dicts of floats, at a small cost in cosine precision.
+        """
+        self._init_state(folder_path, backend, corpus, weights)
+        self.refresh(reload=False)  # A shared corpus is already loaded, and may hold other models' analyses
+
+    def _init_state(self, folder_path, backend="python", corpus=None, weights="float64"):
+        """Check the options and set up the state every ranking system starts from, before any document is loaded."""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}.")
+        if weights not in WEIGHTS:
+            raise ValueError(f"Unknown weights '{weights}', expected one of {WEIGHTS}.")
+        if weights != "float64" and backend != "python":
+            raise ValueError("Compact weights are only supported by the python backend.")
         self.folder_path = folder_path
+        self.backend = backend
+        self.corpus = corpus
+        self.weights = weights
+        self.version = 0  # Corpus version, increased by every refresh
+        self.lsh = None   # Approximate cosine index, see build_lsh
+
+    def refresh(self, reload=True):
+        """Reload the documents and rebuild the corpus statistics used for ranking (reload: re-read a shared corpus)."""
+        self.version += 1
+        if self.corpus is not None and reload:
+            self.corpus.load()
         self.documents = self.load_documents()
         if not self.documents:
             raise ValueError("No valid documents found in the specified folder.")
-    
-    def load_documents(self):
-        """Load text documents from the specified folder."""
+        field_counts = self.count_terms()
+        self.build_statistics(field_counts, self.collection_statistics(field_counts))
+
+    def count_terms(self):
+        """Tokenize the content and title of every document once: field -> doc_name -> Counter of terms."""
+        field_texts = {"content": self.documents, "title": self.titles}
+        field_counts = {}
+        for field in FIELDS:
+            tokenized = self.corpus.analyze("alnum", field, self.tokenize) if self.corpus is not None else None
+            field_counts[field] = {
+                doc_name: Counter(tokenized[doc_name] if tokenized is not None
+                                  else self.tokenize(field_texts[field].get(doc_name, "")))
+                for doc_name in self.documents
+            }
+        return field_counts
+
+    def collection_statistics(self, field_counts):
+        """
+        Statistics of the whole collection that the weights depend on: the number of documents,
+        the total length of each field and the document frequencies of the terms in the content,
+        in the title and in either field. The shards of a ShardedRankingSystem add theirs up.
+        """
+        doc_freqs = {fields: Counter() for fields in (("content",), ("title",), FIELDS)}
+        for doc_name in self.documents:
+            content, title = field_counts["content"][doc_name], field_counts["title"][doc_name]
+            doc_freqs[("content",)].update(content.keys())
+            doc_freqs[("title",)].update(title.keys())
+            doc_freqs[FIELDS].update(content.keys() | title.keys())
+        lengths = {field: sum(sum(counts.values()) for counts in field_counts[field].values()) for field in FIELDS}
+        return {"documents": len(self.documents), "lengths": lengths, "doc_freqs": doc_freqs}
+
+    def build_statistics(self, field_counts, collection):
+        """
+        Precompute, from the term counts and the collection statistics, the IDF, the TF-IDF
+        vector and norm of each document, and an inverted index of the vectors, so a query
+        only costs its own tokenization and the postings of its terms. The BM25 statistics
+        (term counts and length ratios of the content and title fields) are built in the same pass.
+        """
+        self.doc_order = {doc_name: position for position, doc_name in enumerate(self.documents)}
+        self.collection_size = collection["documents"]
+        self.field_doc_freqs = collection["doc_freqs"]  # sorted field names -> term -> documents containing it
+        self.field_postings = {}  # field -> term -> [(doc_name, count)]
+        self.length_ratios = {}   # field -> doc_name -> field length / average field length
+        for field in FIELDS:
+            postings, ratios = {}, {}
+            average = collection["lengths"][field] / self.collection_size
+            for doc_name, counts in field_counts[field].items():
+                ratios[doc_name] = sum(counts.values()) / average if average else 0
+                for term, count in counts.items():
+                    postings.setdefault(term, []).append((doc_name, count))
+            self.field_postings[field] = postings
+            self.length_ratios[field] = ratios
+
+        doc_tfs = {}
+        for doc_name, counts in field_counts["content"].items():
+            total_terms = sum(counts.values())
+            doc_tfs[doc_name] = {term: freq / total_terms for term, freq in counts.items()}
+        self.doc_freqs = self.field_doc_freqs[("content",)]
+        self.idf = self.calculate_idf()
+
+        self.weight_store = None
+        if self.weights != "float64":
+            self.doc_vectors = self.doc_norms = self.postings = None
+            self.weight_store = WeightStore(list(doc_tfs), list(doc_tfs.values()), self.idf, self.weights)
+            if self.lsh is not None:
+                self.build_lsh(self.lsh.tables, self.lsh.bits, self.lsh.seed)
+            return
+        self.doc_vectors = {}
+        self.doc_norms = {}
+        self.postings = {}  # term -> [(doc_name, weight, rank of the term in the document vector)]
+        for doc_name, tf in doc_tfs.items():
+            vector = {term: tf[term] * self.idf[term] for term in tf}
+            self.doc_vectors[doc_name] = vector
+            self.doc_norms[doc_name] = math.sqrt(sum(val ** 2 for val in vector.values()))
+            for rank, (term, weight) in enumerate(vector.items()):
+                self.postings.setdefault(term, []).append((doc_name, weight, rank))
+        if self.backend == "numpy":
+            self.doc_names = list(self.documents)
+            # The python norms, so both backends divide by the same values
+            self.matrix = SparseMatrix.TermDocumentMatrix([self.doc_vectors[doc_name] for doc_name in self.doc_names],
+                                                          [self.doc_norms[doc_name] for doc_name in self.doc_names])
+        if self.lsh is not None:
+            self.build_lsh(self.lsh.tables, self.lsh.bits, self.lsh.seed)
+
+    def build_lsh(self, tables=8, bits=8, seed=0):
+        """Hash the TF-IDF document vectors into an LSH index for rank_by_approximate_cosine (requires NumPy)."""
+        if self.weight_store is not None:
+            self.lsh = CosineLSH(self.weight_store.names, self.weight_store.vectors(), tables, bits, seed)
+            return
+        names = list(self.documents)
+        self.lsh = CosineLSH(names, [self.doc_vectors[doc_name] for doc_name in names], tables, bits, seed)
+
+    def rank_rows(self, scores, k=None, integer=False):
+        """Rank the numpy backend's per-document scores, keeping the top k."""
+        rows = SparseMatrix.top_rows(scores, k)
+        ranked = scores[rows].astype(int) if integer else scores[rows]
+        doc_names = self.doc_names
+        return [(doc_names[row], score) for row, score in zip(rows.tolist(), ranked.tolist())]
+
+    def load_documents(self, file_names=None):
+        """
+        Load text documents from the specified folder (only file_names if given, in that order),
+        keeping their titles in self.titles.
+        """
+        if self.corpus is not None:
+            self.titles = dict(self.corpus.titles)
+            return dict(self.corpus.contents)
         documents = {}
-        for file_name in os.listdir(self.folder_path):
+        self.titles = {}
+        for file_name in os.listdir(self.folder_path) if file_names is None else file_names:
             if file_name.endswith('.txt'):
                 with open(os.path.join(self.folder_path, file_name), 'r', encoding='utf-8') as f:
                     doc = f.read().split("\n", 1)
                     title = doc[0].replace("Title: ", "")
                     content = doc[1].replace("Content: ", "")
                     documents[file_name] = content
+                    self.titles[file_name] = title
         return documents
 
     def tokenize(self, text):
@@ -30,15 +184,28 @@ class RankingSystem:
         return [word.lower() for word in text.split() if word.isalnum() and word.lower() not in stop_words]
 
     # --- Ranking Methods ---
-    def rank_by_keyword_matching(self, query):
-        """Rank documents based on keyword matching."""
-        query_tokens = self.tokenize(query)
-        rankings = []
-        for doc_name, content in self.documents.items():
-            doc_tokens = self.tokenize(content)
-            matches = sum(1 for word in query_tokens if word in doc_tokens)
-            rankings.append((doc_name, matches))
-        return sorted(rankings, key=lambda x: x[1], reverse=True)
+    def rank_by_keyword_matching(self, query, k=None, include_unmatched=False):
+        """
+        Rank documents by how many query words they contain, from the term -> documents index.
+        Documents matching no query word are left out unless include_unmatched is set.
+        """
+        query_counts = Counter(self.tokenize(query))
+        if self.backend == "numpy":
+            scores = self.matrix.match(query_counts)
+            if include_unmatched:
+                return self.rank_rows(scores, k, integer=True)
+            # Matched documents score at least 1 and rank first, so only they are selected
+            matched = int(np.count_nonzero(scores > 0))
+            return self.rank_rows(scores, matched if k is None else min(k, matched), integer=True)
+        scores = {}
+        postings = self.field_postings["content"]
+        for word, query_count in query_counts.items():
+            for doc_name, _ in postings.get(word, ()):
+                scores[doc_name] = scores.get(doc_name, 0) + query_count
+        if include_unmatched:
+            return self.rank_documents(scores, k)
+        order = self.doc_order
+        return sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))[:k]
 
     def calculate_tf(self, doc):
         """Calculate term frequency for a document."""
@@ -48,37 +215,54 @@ class RankingSystem:
         return {term: freq / total_terms for term, freq in tf.items()}
 
     def calculate_idf(self):
-        """Calculate inverse document frequency for all terms."""
-        num_docs = len(self.documents)
-        idf = {}
-        all_words = set()
-        
-        # Collect all unique words from all documents
-        for content in self.documents.values():
-            all_words.update(self.tokenize(content))
-        
-        # Calculate IDF for each word
-        for word in all_words:
-            doc_count = sum(1 for content in self.documents.values() if word in self.tokenize(content))
-            idf[word] = math.log(num_docs / (1 + doc_count))  # Avoid division by zero
-        return idf
+        """Calculate inverse document frequency for all terms from the precomputed document frequencies."""
+        num_docs = self.collection_size
+        return {word: math.log(num_docs / (1 + doc_count))  # Avoid division by zero
+                for word, doc_count in self.doc_freqs.items()}
 
     def calculate_tfidf(self, doc, idf):
         """Calculate TF-IDF scores for a document."""
         tf = self.calculate_tf(doc)
         return {term: tf[term] * idf[term] for term in tf if term in idf}
 
-    def rank_by_tfidf(self, query):
-        """Rank documents based on TF-IDF scores."""
-        idf = self.calculate_idf()
-        query_vector = self.calculate_tfidf(query, idf)
-        doc_vectors = {doc_name: self.calculate_tfidf(content, idf) for doc_name, content in self.documents.items()}
-        
-        rankings = []
-        for doc_name, vector in doc_vectors.items():
-            score = sum(query_vector.get(term, 0) for term in vector)
-            rankings.append((doc_name, score))
-        return sorted(rankings, key=lambda x: x[1], reverse=True)
+    def rank_documents(self, scores, k=None):
+        """
+        Rank every document by score (highest first, ties in document order); unscored documents score 0.
+        With k, the positive scores go through a bounded heap and zero-score documents are only
+        listed (in document order) when fewer than k documents score above 0, so the cost
+        follows the scored documents rather than the corpus size.
+        """
+        order = self.doc_order
+        if k is None:
+            scored = sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+            zeros = [(doc_name, 0) for doc_name in self.documents if scores.get(doc_name, 0) == 0]
+            return ([item for item in scored if item[1] > 0] + zeros
+                    + [item for item in scored if item[1] < 0])
+        positives = heapq.nsmallest(k, ((-score, order[doc_name], doc_name)
+                                        for doc_name, score in scores.items() if score > 0))
+        ranked = [(doc_name, -score) for score, _, doc_name in positives]
+        if len(ranked) < k:
+            zeros = (doc_name for doc_name in self.documents if scores.get(doc_name, 0) == 0)
+            ranked.extend((doc_name, 0) for doc_name in islice(zeros, k - len(ranked)))
+        if len(ranked) < k:
+            negatives = sorted((item for item in scores.items() if item[1] < 0), key=lambda item: (-item[1], order[item[0]]))
+            ranked.extend(negatives[:k - len(ranked)])
+        return ranked
+
+    def rank_by_tfidf(self, query, k=None):
+        """Rank documents based on TF-IDF scores: the sum of the query weights of the terms each document contains."""
+        query_vector = self.calculate_tfidf(query, self.idf)
+        if self.backend == "numpy":
+            return self.rank_rows(self.matrix.match(query_vector), k)
+        if self.weight_store is not None:
+            return self.rank_documents(self.weight_store.match(query_vector), k)
+        matches = {}
+        for term, weight in query_vector.items():
+            for doc_name, _, rank in self.postings.get(term, ()):
+                matches.setdefault(doc_name, []).append((rank, weight))
+        # Add the weights in document vector order, as a scan over the document's terms would
+        scores = {doc_name: sum(weight for _, weight in sorted(terms)) for doc_name, terms in matches.items()}
+        return self.rank_documents(scores, k)
 
     def cosine_similarity(self, vec1, vec2):
         """Calculate cosine similarity between two vectors."""
@@ -89,15 +273,81 @@ class RankingSystem:
             return 0
         return dot_product / (magnitude1 * magnitude2)
 
-    def rank_by_cosine_similarity(self, query):
-        """Rank documents based on cosine similarity to the query."""
-        idf = self.calculate_idf()
-        query_vector = self.calculate_tfidf(query, idf)
-        doc_vectors = {doc_name: self.calculate_tfidf(content, idf) for doc_name, content in self.documents.items()}
-        
-        rankings = []
-        for doc_name, vector in doc_vectors.items():
-            similarity = self.cosine_similarity(query_vector, vector)
-            rankings.append((doc_name, similarity))
-        return sorted(rankings, key=lambda x: x[1], reverse=True)
+    def rank_by_cosine_similarity(self, query, k=None):
+        """Rank documents based on cosine similarity to the query, using the precomputed document vectors and norms."""
+        query_vector = self.calculate_tfidf(query, self.idf)
+        query_norm = math.sqrt(sum(val ** 2 for val in query_vector.values()))
+        if self.backend == "numpy":
+            # Divided like the python backend, so equal cosines tie exactly in both
+            denominators = query_norm * self.matrix.norms
+            scores = np.divide(self.matrix.dot(query_vector), denominators,
+                               out=np.zeros(self.matrix.rows), where=denominators != 0)
+            return self.rank_rows(scores, k)
+        if self.weight_store is not None:
+            cosines = self.weight_store.dot(query_vector, normalized=True) if query_norm else {}
+            return self.rank_documents({doc_name: cosine / query_norm for doc_name, cosine in cosines.items()}, k)
+        dot_products = {}
+        for term, weight in query_vector.items():
+            for doc_name, doc_weight, _ in self.postings.get(term, ()):
+                dot_products[doc_name] = dot_products.get(doc_name, 0) + weight * doc_weight
+        scores = {}
+        for doc_name, dot_product in dot_products.items():
+            doc_norm = self.doc_norms[doc_name]
+            scores[doc_name] = dot_product / (query_norm * doc_norm) if query_norm and doc_norm else 0
+        return self.rank_documents(scores, k)
+
+    def bm25_idf(self, doc_count):
+        """BM25 inverse document frequency, kept positive for terms in most documents."""
+        return math.log(1 + (self.collection_size - doc_count + 0.5) / (doc_count + 0.5))
+
+    def bm25_scores(self, query, fields, k1):
+        """
+        Score documents with BM25F over the given (field, weight, b) fields, touching only the
+        postings of the query terms. Each field's term count is length-normalized with the
+        precomputed length ratio and weighted, and the weighted counts are saturated together.
+        """
+        scores = {}
+        doc_freqs = self.field_doc_freqs.get(tuple(sorted(field for field, _, _ in fields)))
+        for term, query_count in Counter(self.tokenize(query)).items():
+            weighted = {}
+            for field, weight, b in fields:
+                ratios = self.length_ratios[field]
+                for doc_name, count in self.field_postings[field].get(term, ()):
+                    weighted[doc_name] = weighted.get(doc_name, 0) + weight * count / (1 - b + b * ratios[doc_name])
+            if not weighted:
+                continue
+            idf = self.bm25_idf(doc_freqs[term] if doc_freqs is not None else len(weighted))
+            for doc_name, frequency in weighted.items():
+                scores[doc_name] = scores.get(doc_name, 0) + query_count * idf * frequency / (k1 + frequency)
+        return scores
+
+    def rank_by_bm25(self, query, k=None, k1=1.2, b=0.75):
+        """Rank documents with Okapi BM25 over their content."""
+        return self.rank_documents(self.bm25_scores(query, [("content", 1.0, b)], k1), k)
+
+    def rank_by_bm25f(self, query, k=None, k1=1.2, title_weight=3.0, content_weight=1.0, title_b=0.75, content_b=0.75):
+        """Rank documents with BM25F, weighting title matches separately from content matches."""
+        fields = [("content", content_weight, content_b), ("title", title_weight, title_b)]
+        return self.rank_documents(self.bm25_scores(query, fields, k1), k)
 
+    def rank_by_approximate_cosine(self, query, k=10):
+        """
+        Approximate top-k cosine ranking: only the documents that share an LSH bucket with the
+        query are scored, exactly, so some true top-k documents may be missed.
+        """
+        if self.lsh is None:
+            self.build_lsh()
+        query_vector = self.calculate_tfidf(query, self.idf)
+        query_norm = math.sqrt(sum(val ** 2 for val in query_vector.values()))
+        candidates = self.lsh.candidates(query_vector)
+        if self.weight_store is not None:
+            cosines = self.weight_store.dot(query_vector, normalized=True) if query_norm else {}
+            scores = {doc_name: cosines.get(doc_name, 0) / query_norm if query_norm else 0 for doc_name in candidates}
+        else:
+            scores = {}
+            for doc_name in candidates:
+                vector, doc_norm = self.doc_vectors[doc_name], self.doc_norms[doc_name]
+                dot_product = sum(weight * vector.get(term, 0) for term, weight in query_vector.items())
+                scores[doc_name] = dot_product / (query_norm * doc_norm) if query_norm and doc_norm else 0
+        order = self.doc_order
+        return sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))[:k]
@@ -0,0 +1,181 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+try:  # Imported as part of the Codes package (app.py)
+    from .Analyzer import Analyzer
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from Analyzer import Analyzer
+
+LEVELS = ("document", "title", "paragraph", "section", "heading", "content")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+class Regions:
+    """
+    A set of regions of one structural level, as sorted row numbers of that level.
+
+    Attributes:
+        level (str): Name of the level, one of LEVELS.
+        rows (range or list): Rows of the level in the set, in increasing (text) order.
+    """
+
+    def __init__(self, level, rows):
+        self.level = level
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __contains__(self, row):
+        index = bisect_left(self.rows, row)
+        return index < len(self.rows) and self.rows[index] == row
+
+
+class RegionIndex:
+    """
+    Region index of the Non-Overlapping Lists model.
+
+    Every document is laid out in one global stream of term positions (the stems of the
+    shared Analyzer). Each structural level (documents, titles, Docs paragraphs, and the
+    sections of Structured_Docs with their headings and contents) is a list of regions that
+    never overlap each other, kept as sorted start and end arrays ([start, end) positions),
+    and every term keeps the sorted array of its positions. Region queries never rescan the
+    documents: "regions containing a term" binary-searches the smaller of the two sorted lists
+    in the other, and "regions of one level within / around regions of another" finds the
+    first candidate with a binary search and walks forward, so each query costs about
+    O(log n) per input region plus the size of its output.
+
+    Attributes:
+        analyzer (Analyzer): Turns text into the terms that are indexed.
+        names (list): Name of each document, in document-level row order.
+        starts (dict): Level -> array of the first position of each region.
+        ends (dict): Level -> array of the position after the last of each region.
+        labels (dict): Level -> label of each region (title or heading text, paragraph number).
+        documents (dict): Level -> array of the document row of each region.
+        positions (dict): Term -> array of its positions, increasing.
+        length (int): Number of positions in the stream.
+    """
+
+    def __init__(self, analyzer=None):
+        self.analyzer = analyzer or Analyzer()
+        self.names = []
+        self.starts = {level: array('Q') for level in LEVELS}
+        self.ends = {level: array('Q') for level in LEVELS}
+        self.labels = {level: [] for level in LEVELS}
+        self.documents = {level: array('I') for level in LEVELS}
+        self.positions = {}
+        self.length = 0
+
+    def add_region(self, level, label, text):
+        """Appends the terms of a text to the stream as one region of a level, returning its (start, end)."""
+        start = self.length
+        for term in self.analyzer.terms(text):
+            self.positions.setdefault(term, array('Q')).append(self.length)
+            self.length += 1
+        self.mark(level, label, start, self.length)
+        return start, self.length
+
+    def mark(self, level, label, start, end):
+        """Records [start, end) as the next region of a level, in the current document."""
+        self.starts[level].append(start)
+        self.ends[level].append(end)
+        self.labels[level].append(label)
+        self.documents[level].append(len(self.names) - 1)
+
+    def add_text_document(self, name, title, content):
+        """Adds a Docs document: its title, then the paragraphs of its content (separated by blank lines)."""
+        self.names.append(name)
+        start = self.length
+        self.add_region("title", title, title)
+        for number, paragraph in enumerate(PARAGRAPH_BREAK.split(content.strip()), 1):
+            self.add_region("paragraph", f"Paragraph {number}", paragraph)
+        self.mark("document", name, start, self.length)
+
+    def add_structured_document(self, name, document):
+        """Adds a Structured_Docs document: its title, then each section made of a heading and a content."""
+        self.names.append(name)
+        start = self.length
+        self.add_region("title", document["title"], document["title"])
+        for section in document["sections"]:
+            section_start, _ = self.add_region("heading", section["heading"], section["heading"])
+            self.add_region("content", section["heading"], section["content"])
+            self.mark("section", section["heading"], section_start, self.length)
+        self.mark("document", name, start, self.length)
+
+    def regions(self, level):
+        """Returns every region of a level."""
+        return Regions(level, range(len(self.starts[level])))
+
+    def containing_term(self, regions, term):
+        """Returns the regions of a set that contain at least one position of a term."""
+        positions = self.positions.get(term, ())
+        starts, ends = self.starts[regions.level], self.ends[regions.level]
+        if len(positions) < len(regions):
+            # Locate each position in the regions, which are consecutive for increasing positions
+            rows = []
+            for position in positions:
+                row = bisect_right(starts, position) - 1
+                if row >= 0 and position < ends[row] and (not rows or rows[-1] != row) and row in regions:
+                    rows.append(row)
+        else:
+            # Look for the first position at or after the start of each region
+            rows = []
+            for row in regions:
+                index = bisect_left(positions, starts[row])
+                if index < len(positions) and positions[index] < ends[row]:
+                    rows.append(row)
+        return Regions(regions.level, rows)
+
+    def containing(self, regions, query):
+        """Returns the regions of a set that contain every term of a query (no terms: none)."""
+        terms = self.analyzer.analyze(query)
+        if not terms:
+            return Regions(regions.level, [])
+        # Rarest terms first, so the later steps start from the smallest set
+        for term in sorted(set(terms), key=lambda term: len(self.positions.get(term, ()))):
+            regions = self.containing_term(regions, term)
+            if not regions:
+                break
+        return regions
+
+    def within(self, level, regions):
+        """Returns the regions of a level that lie inside one of the given regions."""
+        starts, ends = self.starts[level], self.ends[level]
+        outer_starts, outer_ends = self.starts[regions.level], self.ends[regions.level]
+        rows = []
+        for outer in regions:
+            start, end = outer_starts[outer], outer_ends[outer]
+            row = bisect_left(starts, start)
+            if rows:
+                row = max(row, rows[-1] + 1)
+            # An empty region (no indexed terms) is only inside the regions that start where it is
+            while row < len(starts) and (starts[row] < end or starts[row] == start == end):
+                if ends[row] <= end:
+                    rows.append(row)
+                row += 1
+        return Regions(level, rows)
+
+    def enclosing(self, level, regions):
+        """Returns the regions of a level that contain one of the given regions."""
+        starts, ends = self.starts[level], self.ends[level]
+        inner_starts, inner_ends = self.starts[regions.level], self.ends[regions.level]
+        rows = []
+        for inner in regions:
+            start, end = inner_starts[inner], inner_ends[inner]
+            # Regions of a level do not overlap, so only the last one starting at or before the
+            # inner region can hold it (or an earlier one, when empty regions share its start)
+            row = bisect_right(starts, start) - 1
+            while row >= 0 and starts[row] == start and ends[row] < end:
+                row -= 1
+            if row >= 0 and end <= ends[row] and (start < ends[row] or start == starts[row]) and (not rows or rows[-1] != row):
+                rows.append(row)
+        return Regions(level, rows)
+
+    def describe(self, regions):
+        """Returns (document name, region label) for each region of a set."""
+        labels, documents = self.labels[regions.level], self.documents[regions.level]
+        return [(self.names[documents[row]], labels[row]) for row in regions]
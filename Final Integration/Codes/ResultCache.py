@@ -0,0 +1,108 @@
+import sys
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Approximate memory footprint in bytes of a value made of lists, tuples, dicts, strings and numbers."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    return size
+
+
+class ResultCache:
+    """
+    Bounded least-recently-used cache of query results.
+
+    Entries expire after a time to live, the cache is limited both in entries and in
+    (estimated) bytes, and everything is dropped as soon as it is used with a new corpus
+    version, so results ranked on an older corpus are never served.
+
+    Attributes:
+        maxsize (int): Maximum number of cached results.
+        max_bytes (int): Maximum estimated size of all cached results.
+        ttl (float): Seconds a result stays valid.
+        version: Corpus version the cached results belong to.
+        hits, misses, evictions, expirations, invalidations (int): Counters for sizing the cache.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=16 * 1024 * 1024, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.cache = OrderedDict()  # key -> (value, size, expiry time)
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def check_version(self, version):
+        """Drops every cached result if the corpus version changed."""
+        if version != self.version:
+            if self.cache:
+                self.invalidations += 1
+            self.clear()
+            self.version = version
+
+    def get(self, key, version=None):
+        """Returns the cached result for the key, or None on a miss."""
+        self.check_version(version)
+        entry = self.cache.get(key)
+        if entry is not None and entry[2] <= self.clock():
+            self.discard(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, version=None):
+        """Caches a result, evicting the least recently used ones to stay within both limits."""
+        self.check_version(version)
+        size = estimate_size(value)
+        self.discard(key)
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        self.cache[key] = (value, size, self.clock() + self.ttl)
+        self.bytes += size
+        while len(self.cache) > self.maxsize or self.bytes > self.max_bytes:
+            _, (_, evicted, _) = self.cache.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def discard(self, key):
+        """Removes a key if it is cached."""
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def clear(self):
+        """Removes every cached result."""
+        self.cache.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """Returns the counters and the current fill of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "size": len(self.cache),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
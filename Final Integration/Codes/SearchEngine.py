@@ -1,84 +1,29 @@
 import os
+import re
+import heapq
 import string
-from nltk.stem import WordNetLemmatizer
+import tempfile
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 
+try:  # Imported as part of the Codes package (app.py)
+    from . import Snapshot
+    from .Dictionary import CustomDictionary
+    from .LemmaCache import LemmaCache
+    from .Postings import PostingsList
+    from .Snippets import SnippetStore
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    import Snapshot
+    from Dictionary import CustomDictionary
+    from LemmaCache import LemmaCache
+    from Postings import PostingsList
+    from Snippets import SnippetStore
 
-class Node:
-    """Node class to store key-value pairs in a linked list for handling collisions."""
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-        self.next = None
-
-class CustomDictionary:
-    """Custom dictionary data structure with basic hash table implementation."""
-
-    def __init__(self, size=500):
-        self.size = size
-        self.table = [None] * self.size
-
-    def _hash(self, key):
-        """Hashes the key to an index based on the size of the table."""
-        return hash(key) % self.size
-
-    def insert(self, key, value):
-        """Inserts a key-value pair into the dictionary."""
-        index = self._hash(key)
-        if not self.table[index]:
-            self.table[index] = Node(key, value)
-        else:
-            current = self.table[index]
-            while current:
-                if current.key == key:
-                    current.value = value  # Update existing key
-                    return
-                if not current.next:
-                    break
-                current = current.next
-            current.next = Node(key, value)  # Insert new node at the end
-
-    def get(self, key):
-        """Retrieves the value associated with the given key."""
-        index = self._hash(key)
-        current = self.table[index]
-        while current:
-            if current.key == key:
-                return current.value
-            current = current.next
-        raise KeyError(f"Key '{key}' not found.")
-
-    def items(self):
-        """Yields key-value pairs stored in the dictionary."""
-        for node in self.table:
-            current = node
-            while current:
-                yield current.key, current.value
-                current = current.next
-
-    def delete(self, key):
-        """Deletes a key-value pair from the dictionary."""
-        index = self._hash(key)
-        current = self.table[index]
-        prev = None
-        while current:
-            if current.key == key:
-                if prev:
-                    prev.next = current.next
-                else:
-                    self.table[index] = current.next
-                return
-            prev = current
-            current = current.next
-        raise KeyError(f"Key '{key}' not found.")
-
-    def __repr__(self):
-        """Returns a string representation of the dictionary."""
-        items = []
-        for i, node in enumerate(self.table):
-            while node:
-                items.append(f"{node.key}: {node.value}")
-                node = node.next
-        return "{" + ", ".join(items) + "}"
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)  # Built once, used for every text and query
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')  # A quoted phrase or a single word
+NEAR_OPERATOR = re.compile(r'NEAR/(\d+)$')
+SNIPPET_WORDS = 15  # Words shown per result snippet
 
 
 class SearchEngine:
@@ -88,21 +33,33 @@ class SearchEngine:
     Attributes:
         directory (str): Directory containing the text documents.
         documents (dict): Stores document title and content.
-        content_index (dict): Index for content-based word search.
-        title_index (dict): Index for title-based word search.
+        doc_ids (dict): Maps each filename to its integer document ID.
+        filenames (list): Maps each document ID back to its filename.
+        content_index (dict): Index for content-based word search (word -> PostingsList).
+        title_index (dict): Index for title-based word search (word -> PostingsList).
+        snippets (SnippetStore): Word offsets of each document's content, for building snippets.
+        manifest (list): (filename, size, mtime_ns) of every indexed file, sorted by filename.
+        lemmas (LemmaCache): Token -> lemma memo shared by indexing and querying.
+        positional (bool): Whether postings also store word positions for phrase and NEAR queries.
         stop_words (set): Common stop words to exclude from indexing.
     """
-    def __init__(self, directory):
+    def __init__(self, directory, lemma_cache_size=100_000, positional=False, corpus=None):
         """
         Initializes the search engine with the directory to load documents from.
 
         Args:
             directory (str): Directory path containing text files to be indexed.
+            lemma_cache_size (int): Maximum number of tokens kept in the lemma cache.
+            positional (bool): Store delta-encoded word positions in the postings, enabling
+                quoted phrase and NEAR/k queries.
+            corpus (Corpus): Shared corpus that load_documents takes the documents from
+                instead of reading the directory again.
         """
         self.directory = directory
-        self.documents = CustomDictionary()  # Stores document title and content
-        self.content_index = CustomDictionary()    # Index for content words
-        self.title_index = CustomDictionary()      # Index for title words
+        self.corpus = corpus
+        self.clear()
+        self.lemmas = LemmaCache(lemma_cache_size)
+        self.positional = positional
         self.stop_words = set([
             "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", 
             "in", "into", "is", "it", "no", "not", "of", "on", "or", "such", 
@@ -110,22 +67,349 @@ class SearchEngine:
             "to", "was", "will", "with", "from"
         ]) # Stop words to reomve
 
-    def load_documents(self):
+    def clear(self):
+        """Drops every document and index entry."""
+        self.documents = CustomDictionary()  # Stores document title and content
+        self.doc_ids = CustomDictionary()    # Filename -> integer document ID
+        self.filenames = []                  # Document ID -> filename
+        self.content_index = CustomDictionary()    # Index for content words
+        self.title_index = CustomDictionary()      # Index for title words
+        self.snippets = SnippetStore()             # Word offsets for snippets
+        self.manifest = []                         # Files the indexes were built from
+        self.snapshot = None                       # Open SnapshotReader backing loaded postings
+
+    def load_documents(self, workers=1):
         """
         Loads documents from the directory, reading titles and contents, and indexes them by title and content.
+
+        Args:
+            workers (int): Number of processes that read and analyze documents. With more than one,
+                workers tokenize, lemmatize and count words while this process merges the postings
+                in file order, so the indexes are identical to a serial build. Ignored with a
+                shared corpus, whose documents are already in memory.
+        """
+        file_path = self.directory_path()
+        self.manifest = self.scan_manifest()
+        if self.corpus is not None:
+            analyzer = "lemmatized+positions" if self.positional else "lemmatized"
+            titles = self.corpus.analyze(analyzer, "title", self.analyze_text)
+            contents = self.corpus.analyze(analyzer, "content", self.analyze_text)
+            for filename in self.corpus:
+                (title_counts, title_positions), (content_counts, content_positions) = titles[filename], contents[filename]
+                self.add_analyzed_document(filename, self.corpus.titles[filename], self.corpus.contents[filename],
+                                           title_counts, content_counts, title_positions, content_positions)
+            return
+        filenames = [filename for filename in os.listdir(file_path) if filename.endswith(".txt")] # Reading .txt files
+        if workers > 1 and len(filenames) > 1:
+            chunksize = max(1, len(filenames) // (workers * 4))
+            initargs = (self.directory, self.stop_words, self.lemmas.maxsize, self.positional)
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+                for analyzed in pool.map(_analyze_file, filenames, chunksize=chunksize):
+                    self.add_analyzed_document(*analyzed)
+        else:
+            for filename in filenames:
+                self.add_analyzed_document(*self.analyze_file(filename))
+
+    def analyze_file(self, filename):
+        """
+        Reads a document file and counts the words of its title and content.
+
+        Returns:
+            tuple: (filename, title, content, title word counts, content word counts,
+            title word positions, content word positions); positions are None unless positional.
+        """
+        title, content = self.read_document(filename)
+        return self.analyze_file_contents(filename, title, content)
+
+    def read_document(self, filename):
+        """
+        Reads a document file from the directory and splits it into title and content.
+
+        Args:
+            filename (str): The document filename.
+
+        Returns:
+            tuple: (title, content)
+        """
+        with open(os.path.join(self.directory_path(), filename), 'r', encoding='utf-8') as file:
+            # Arranging the text in the file
+            doc = file.read().split("\n", 1)
+            title = doc[0].replace("Title: ", "")
+            content = doc[1].replace("Content: ", "")
+            return title, content
+
+    def add_document(self, filename, title, content):
+        """
+        Adds a document to the indexes, replacing it if the filename is already indexed.
+
+        Args:
+            filename (str): The document filename.
+            title (str): The document title.
+            content (str): The document content.
+        """
+        self.add_analyzed_document(*self.analyze_file_contents(filename, title, content))
+
+    def analyze_text(self, text):
+        """Returns the word counts and word positions (None unless positional) of a title or content."""
+        return self.count_words(text), self.word_positions(text)
+
+    def analyze_file_contents(self, filename, title, content):
+        """Counts (and locates) the words of a document that is already in memory, see analyze_file."""
+        return (filename, title, content, self.count_words(title), self.count_words(content),
+                self.word_positions(title), self.word_positions(content))
+
+    def add_analyzed_document(self, filename, title, content, title_counts, content_counts,
+                              title_positions=None, content_positions=None):
+        """
+        Adds a document whose title and content words were already counted.
+
+        Args:
+            filename (str): The document filename.
+            title (str): The document title.
+            content (str): The document content.
+            title_counts (dict): Word -> frequency in the title.
+            content_counts (dict): Word -> frequency in the content.
+            title_positions (dict): Word -> positions in the title, for positional indexes.
+            content_positions (dict): Word -> positions in the content, for positional indexes.
+        """
+        if filename in self.documents:
+            self.remove_document(filename)
+        self.documents.insert(filename, {"title": title, "content": content})
+        # Index both title and content
+        doc_id = self.intern(filename)
+        self.add_postings(doc_id, title_counts, self.title_index, title_positions)
+        self.add_postings(doc_id, content_counts, self.content_index, content_positions)
+        self.snippets.add(doc_id, content, PUNCTUATION_TABLE)
+
+    def update_document(self, filename, title, content):
+        """
+        Replaces an indexed document with a new title and content.
+
+        The document gets a fresh ID at the end of the ID range, so postings stay sorted by appending.
+
+        Args:
+            filename (str): The document filename.
+            title (str): The new title.
+            content (str): The new content.
+
+        Raises:
+            KeyError: If the document is not indexed.
+        """
+        self.remove_document(filename)
+        self.add_document(filename, title, content)
+
+    def remove_document(self, filename):
+        """
+        Removes a document and all of its postings from the indexes.
+
+        The stored title and content are re-analyzed to find the words to unindex,
+        so only the postings lists of those words are touched.
+
+        Args:
+            filename (str): The document filename.
+
+        Raises:
+            KeyError: If the document is not indexed.
+        """
+        doc = self.documents.get(filename)
+        doc_id = self.doc_ids.get(filename)
+        self.unindex(doc_id, doc["title"], self.title_index)
+        self.unindex(doc_id, doc["content"], self.content_index)
+        self.snippets.remove(doc_id)
+        self.documents.delete(filename)
+        self.doc_ids.delete(filename)
+        self.filenames[doc_id] = None  # IDs are never reused, so postings of other documents stay valid
+
+    def sync(self):
         """
-        file_path = os.path.join(os.path.dirname(__file__), self.directory)
-        for filename in os.listdir(file_path):
-            if filename.endswith(".txt"): # Reading .txt files
-                with open(os.path.join(file_path, filename), 'r', encoding='utf-8') as file:
-                    # Arranging the text in the file
-                    doc = file.read().split("\n", 1)
-                    title = doc[0].replace("Title: ", "")
-                    content = doc[1].replace("Content: ", "")
-                    self.documents.insert(filename, {"title": title, "content": content})
-                    # Index both title and content
-                    self.index(filename, title, self.title_index)
-                    self.index(filename, content, self.content_index)
+        Brings the indexes in line with the directory, reindexing only the files whose
+        size or modification time differ from the stored manifest.
+
+        Returns:
+            tuple: Lists of (added, updated, removed) filenames.
+        """
+        current = self.scan_manifest()
+        previous = {filename: (size, mtime) for filename, size, mtime in self.manifest}
+        added, updated, removed = [], [], []
+        for filename, size, mtime in current:
+            known = previous.pop(filename, None)
+            if known == (size, mtime) and filename in self.documents:
+                continue
+            title, content = self.read_document(filename)
+            if filename in self.documents:
+                self.update_document(filename, title, content)
+                updated.append(filename)
+            else:
+                self.add_document(filename, title, content)
+                added.append(filename)
+        for filename in previous:
+            if filename in self.documents:
+                self.remove_document(filename)
+                removed.append(filename)
+        self.manifest = current
+        return added, updated, removed
+
+    def directory_path(self):
+        """Returns the documents directory, resolved relative to this module."""
+        return os.path.join(os.path.dirname(__file__), self.directory)
+
+    def scan_manifest(self):
+        """
+        Lists the .txt files currently in the directory with their size and modification time.
+
+        Returns:
+            list: Sorted (filename, size, mtime_ns) tuples.
+        """
+        manifest = []
+        with os.scandir(self.directory_path()) as entries:
+            for entry in entries:
+                if entry.name.endswith(".txt") and entry.is_file():
+                    stat = entry.stat()
+                    manifest.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return sorted(manifest)
+
+    def save(self, path, lemmas=True):
+        """
+        Writes the documents, both indexes and the corpus manifest to a binary snapshot.
+
+        Args:
+            path (str): Snapshot file to create or replace.
+            lemmas (bool): Also store the lemma cache, so a loaded engine starts warm.
+        """
+        titles, contents = [], []
+        for filename in self.filenames:
+            doc = self.documents.get(filename) if filename is not None else {"title": "", "content": ""}
+            titles.append(doc["title"])
+            contents.append(doc["content"])
+        names, sizes, mtimes = zip(*self.manifest) if self.manifest else ((), (), ())
+        sections = {
+            "manifest": Snapshot.encode_strings(names) + Snapshot.encode_array(sizes, "Q") + Snapshot.encode_array(mtimes, "q"),
+            "filenames": Snapshot.encode_strings(filename or "" for filename in self.filenames),
+            "titles": Snapshot.encode_strings(titles),
+            "contents": Snapshot.encode_strings(contents),
+            "title_index": Snapshot.encode_index(self.title_index, self.positional),
+            "content_index": Snapshot.encode_index(self.content_index, self.positional),
+            "snippets": self.encode_snippets(),
+        }
+        if lemmas:
+            tokens, lemmatized = zip(*self.lemmas.items()) if self.lemmas.cache else ((), ())
+            sections["lemmas"] = Snapshot.encode_strings(tokens) + Snapshot.encode_strings(lemmatized)
+        Snapshot.write_snapshot(path, sections)
+
+    def encode_snippets(self):
+        """Encodes the snippet store as per-document offset counts and all offsets back to back."""
+        counts, offsets = [], array('I')
+        for doc_offsets in self.snippets.offsets:
+            counts.append(len(doc_offsets) if doc_offsets is not None else 0)
+            if doc_offsets is not None:
+                offsets.extend(doc_offsets)
+        return Snapshot.encode_array(counts, "I") + Snapshot.encode_array(offsets, "I")
+
+    def decode_snippets(self, view):
+        """Rebuilds the snippet store from a snapshot section written by encode_snippets."""
+        counts, position = Snapshot.decode_array(view, "I")
+        offsets, _ = Snapshot.decode_array(view, "I", position)
+        start = 0
+        for doc_id, count in enumerate(counts):
+            doc_offsets = array('I')
+            doc_offsets.frombytes(offsets[start:start + count].cast('B'))
+            self.snippets.offsets.append(doc_offsets if self.filenames[doc_id] is not None else None)
+            start += count
+
+    def read_manifest(self, reader):
+        """Decodes the manifest section of an open snapshot."""
+        view = reader.section("manifest")
+        names, position = Snapshot.decode_strings(view)
+        sizes, position = Snapshot.decode_array(view, "Q", position)
+        mtimes, _ = Snapshot.decode_array(view, "q", position)
+        return list(zip(names, sizes, mtimes))
+
+    def load(self, path):
+        """
+        Replaces the current indexes with the contents of a snapshot written by save().
+
+        The snapshot is memory-mapped and postings are read straight from the mapping.
+
+        Args:
+            path (str): Snapshot file to load.
+
+        Raises:
+            ValueError: If the file is not a snapshot or has an incompatible format.
+        """
+        reader = Snapshot.SnapshotReader(path)
+        filenames, _ = Snapshot.decode_strings(reader.section("filenames"))
+        titles, _ = Snapshot.decode_strings(reader.section("titles"))
+        contents, _ = Snapshot.decode_strings(reader.section("contents"))
+
+        self.documents = CustomDictionary(len(filenames) * 2)
+        self.doc_ids = CustomDictionary(len(filenames) * 2)
+        self.filenames = [filename or None for filename in filenames]  # "" marks a removed document
+        for doc_id, (filename, title, content) in enumerate(zip(filenames, titles, contents)):
+            if not filename:
+                continue
+            self.documents.insert(filename, {"title": title, "content": content})
+            self.doc_ids.insert(filename, doc_id)
+        self.snippets = SnippetStore()
+        if "snippets" in reader:
+            self.decode_snippets(reader.section("snippets"))
+        else:
+            for doc_id, content in enumerate(contents):
+                if filenames[doc_id]:
+                    self.snippets.add(doc_id, content, PUNCTUATION_TABLE)
+        self.title_index, _ = Snapshot.decode_index(reader.section("title_index"))
+        self.content_index, self.positional = Snapshot.decode_index(reader.section("content_index"))
+        self.manifest = self.read_manifest(reader)
+        if "lemmas" in reader:
+            view = reader.section("lemmas")
+            tokens, position = Snapshot.decode_strings(view)
+            lemmatized, _ = Snapshot.decode_strings(view, position)
+            self.lemmas.warm(zip(tokens, lemmatized))
+        self.snapshot = reader
+
+    def detach_snapshot(self):
+        """Copies the postings still read from the loaded snapshot into memory and unmaps it."""
+        if self.snapshot is None:
+            return
+        for index in (self.title_index, self.content_index):
+            for _, postings in index.items():
+                postings.detach()
+        self.snapshot.close()
+        self.snapshot = None
+
+    def load_or_build(self, path, workers=1):
+        """
+        Loads the snapshot and reindexes only the files that changed since it was written.
+        Without a usable snapshot (or with one that is not positional when this engine is, or
+        vice versa), indexes the whole directory. The snapshot is rewritten whenever the
+        indexes changed.
+
+        Args:
+            path (str): Snapshot file to use.
+            workers (int): Processes used for a full rebuild (see load_documents).
+
+        Returns:
+            bool: True if the snapshot was loaded, False if the indexes were rebuilt.
+        """
+        positional = self.positional
+        if os.path.exists(path):
+            try:
+                self.load(path)
+            except ValueError:
+                pass  # Unreadable or older format, rebuild below
+            else:
+                if self.positional == positional:
+                    if any(self.sync()):
+                        self.detach_snapshot()  # The snapshot is replaced below, it cannot stay mapped
+                        self.save(path)
+                    return True
+                self.positional = positional
+            snapshot = self.snapshot
+            self.clear()
+            if snapshot is not None:
+                snapshot.close()  # Nothing refers to the mapping once the indexes are dropped
+        self.load_documents(workers)
+        self.save(path)
+        return False
 
     def filter_nouns(self, words):
         """
@@ -168,11 +452,11 @@ class SearchEngine:
         Returns:
             list: List of processed words.
         """
-        lemmatizer = WordNetLemmatizer()
-        text = text.translate(str.maketrans('', '', string.punctuation))
+        lemmatize = self.lemmas.lemmatize
+        text = text.translate(PUNCTUATION_TABLE)
         all_words = text.split()
-        nouns = [lemmatizer.lemmatize(noun.lower()) for noun in self.filter_nouns(all_words)] # Selecting the nouns
-        words = [lemmatizer.lemmatize(word.lower()) for word in all_words if word.lower() not in self.stop_words] # Removing Stop words
+        nouns = [lemmatize(noun.lower()) for noun in self.filter_nouns(all_words)] # Selecting the nouns
+        words = [lemmatize(word.lower()) for word in all_words if word.lower() not in self.stop_words] # Removing Stop words
         return words + nouns
 
     def preprocess_query(self, text):
@@ -185,75 +469,575 @@ class SearchEngine:
         Returns:
             list: List of processed words.
         """
-        lemmatizer = WordNetLemmatizer()
-        text = text.lower().translate(str.maketrans('', '', string.punctuation))
-        words = [lemmatizer.lemmatize(word) for word in text.split() if word not in self.stop_words]
+        lemmatize = self.lemmas.lemmatize
+        text = text.lower().translate(PUNCTUATION_TABLE)
+        words = [lemmatize(word) for word in text.split() if word not in self.stop_words]
         return words
 
+    def intern(self, filename):
+        """
+        Returns the integer document ID of a filename, assigning the next free ID to new files.
+
+        Args:
+            filename (str): The document filename.
+
+        Returns:
+            int: The document ID.
+        """
+        try:
+            return self.doc_ids.get(filename)
+        except KeyError:
+            doc_id = len(self.filenames)
+            self.doc_ids.insert(filename, doc_id)
+            self.filenames.append(filename)
+            return doc_id
+
     def index(self, filename, content, index):
         """
-        Indexes words from the content, storing their frequencies.
+        Indexes words from the content, storing their frequencies in the word's postings list.
 
         Args:
             filename (str): The document filename.
             content (str): The document content.
             index (dict): The index to update (title or content index).
         """
-        words = self.preprocess_text(content)
+        self.add_postings(self.intern(filename), self.count_words(content), index, self.word_positions(content))
+
+    def count_words(self, content):
+        """
+        Preprocesses the content and counts how many times each word occurs.
+
+        Args:
+            content (str): The text to analyze.
+
+        Returns:
+            dict: Word -> frequency.
+        """
         word_counts = {}
-        
-        # Count how many times each word occur in one file
-        for word in words:
+        for word in self.preprocess_text(content):
             word_counts[word] = word_counts.get(word, 0) + 1
+        return word_counts
+
+    def word_positions(self, text):
+        """
+        Finds the positions of each word in the text, for positional indexes.
 
-        # Creating the index word by word with thier filename and count
+        Positions count every word after punctuation removal, stop words included, so
+        a phrase matches only where its words are really adjacent.
+
+        Args:
+            text (str): The text to analyze.
+
+        Returns:
+            dict: Word -> sorted positions, or None when the engine is not positional.
+        """
+        if not self.positional:
+            return None
+        positions = {}
+        for position, word in self.locate_words(text):
+            positions.setdefault(word, []).append(position)
+        return positions
+
+    def locate_words(self, text):
+        """
+        Lemmatizes the non-stop words of a text together with their word positions.
+
+        Returns:
+            list: (position, word) pairs in text order.
+        """
+        lemmatize = self.lemmas.lemmatize
+        located = []
+        for position, word in enumerate(text.translate(PUNCTUATION_TABLE).split()):
+            word = word.lower()
+            if word not in self.stop_words:
+                located.append((position, lemmatize(word)))
+        return located
+
+    def add_postings(self, doc_id, word_counts, index, word_positions=None):
+        """
+        Appends a document's word frequencies to the postings lists of the index.
+
+        Args:
+            doc_id (int): The document ID.
+            word_counts (dict): Word -> frequency in the document.
+            index (dict): The index to update (title or content index).
+            word_positions (dict): Word -> positions in the document, for positional indexes.
+        """
+        word_positions = word_positions or {}
+        # Creating the index word by word with thier document ID and count
         for word, count in word_counts.items():
             try:
-                existing = index.get(word)
+                postings = index.get(word)
+            except KeyError:
+                postings = PostingsList(positional=self.positional)
+                index.insert(word, postings)
+            postings.add(doc_id, count, word_positions.get(word))
+
+    def unindex(self, doc_id, content, index):
+        """
+        Removes a document's postings for the words of the content, dropping words left without postings.
+
+        Args:
+            doc_id (int): The document ID.
+            content (str): The content that was indexed for the document.
+            index (dict): The index to update (title or content index).
+        """
+        for word in set(self.preprocess_text(content)):
+            try:
+                postings = index.get(word)
             except KeyError:
-                existing = CustomDictionary()
-                index.insert(word, existing)
-            existing.insert(filename, count)
+                continue
+            postings.remove(doc_id)
+            if not postings:
+                index.delete(word)
 
-    def search(self, query, search_type="content"):
+    def search(self, query, search_type="content", k=None):
         """
         Searches for the query in the specified index and ranks results by relevance score.
 
         Args:
             query (str): The search query.
             search_type (str): Either 'content' or 'title', determining the search index.
+            k (int): Return only the k best documents. Documents that cannot reach the
+                top k are skipped with MaxScore pruning instead of being scored and sorted.
+
+        With a positional index the query may contain quoted phrases ("machine learning")
+        and proximity clauses (data NEAR/3 mining). Only documents matching every such
+        clause are returned, scored by the number of clause matches plus the frequencies
+        of the remaining query words.
 
         Returns:
             list: Sorted list of matching documents with filenames, titles, snippets, and scores.
         """
+        # Selecting the index base on search type
+        index = self.title_index if search_type == "title" else self.content_index
+        if self.positional:
+            free_text, clauses = self.parse_query(query)
+            if clauses:
+                words = self.preprocess_query(free_text)
+                scored = self.search_clauses(index, clauses, words, k)
+                for clause in clauses:
+                    words += [word for _, word in clause[1]] if clause[0] == "phrase" else list(clause[1:3])
+                return self.format_results(scored, words)
+
         words = self.preprocess_query(query)
-        matching_documents = CustomDictionary() # Dictionary to store document scores
+        if k is not None:
+            return self.format_results(self.top_k(index, words, k), words)
+
+        postings = []
+        for word in words:
+            try:
+                postings.append(index.get(word).items())
+            except KeyError:
+                continue
+
+        # Merge the sorted postings, summing the frequencies of each document as its relevance score
+        scored = []
+        for doc_id, freq in heapq.merge(*postings):
+            if scored and scored[-1][0] == doc_id:
+                scored[-1][1] += freq
+            else:
+                scored.append([doc_id, freq])
+
+        # Sort documents by the relevance score (higher score first, stable on document ID)
+        return self.format_results(sorted(scored, key=lambda item: item[1], reverse=True), words)
+
+    def search_many(self, queries, k=None, search_type="content", workers=1):
+        """
+        Runs a batch of queries, returning the same results as calling search() on each.
+
+        Repeated queries are answered once. Every distinct query word of the batch is
+        looked up once, and each postings list is walked a single time, adding its
+        frequencies to the score of every query that contains the word.
+
+        Args:
+            queries (list): The search queries.
+            k (int): Return only the k best documents of each query.
+            search_type (str): Either 'content' or 'title', determining the search index.
+            workers (int): Number of processes for very large batches. The indexes are written
+                to a temporary snapshot that every worker memory-maps, and each worker runs
+                its share of the distinct queries.
+
+        Returns:
+            list: One result list per query, in query order.
+        """
+        distinct = list(dict.fromkeys(queries))
+        if workers > 1 and len(distinct) > 1:
+            chunksize = -(-len(distinct) // (workers * 4))
+            chunks = [distinct[i:i + chunksize] for i in range(0, len(distinct), chunksize)]
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "search.snapshot")
+                self.save(path)
+                initargs = (self.directory, path, self.lemmas.maxsize)
+                with ProcessPoolExecutor(workers, initializer=_init_search_worker, initargs=initargs) as pool:
+                    answers = [results for chunk_results in pool.map(_search_chunk, chunks, [k] * len(chunks),
+                                                                       [search_type] * len(chunks))
+                               for results in chunk_results]
+            answered = dict(zip(distinct, answers))
+            return [answered[query] for query in queries]
 
-        # Selecting the index base on search type
         index = self.title_index if search_type == "title" else self.content_index
+        answered = {}
+        weights = {}  # word -> [(query, weight), ...] for every query containing the word
+        query_words = {}
+        for query in distinct:
+            if self.positional and self.parse_query(query)[1]:
+                answered[query] = self.search(query, search_type, k)  # Phrase and NEAR queries
+                continue
+            words = self.preprocess_query(query)
+            query_words[query] = words
+            counts = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            for word, weight in counts.items():
+                weights.setdefault(word, []).append((query, weight))
+
+        scores = {query: {} for query in query_words}
+        for word, users in weights.items():
+            try:
+                postings = index.get(word)
+            except KeyError:
+                continue
+            if len(users) == 1:
+                query, weight = users[0]
+                accumulator = scores[query]
+                for doc_id, freq in postings.items():
+                    accumulator[doc_id] = accumulator.get(doc_id, 0) + freq * weight
+                continue
+            accumulators = [(scores[query], weight) for query, weight in users]
+            for doc_id, freq in postings.items():
+                for accumulator, weight in accumulators:
+                    accumulator[doc_id] = accumulator.get(doc_id, 0) + freq * weight
+
+        for query, accumulator in scores.items():
+            # Higher score first, ties by document ID, as in search()
+            if k is None:
+                ranked = sorted(accumulator.items(), key=lambda item: (-item[1], item[0]))
+            else:
+                ranked = heapq.nsmallest(k, accumulator.items(), key=lambda item: (-item[1], item[0]))
+            answered[query] = self.format_results(ranked, query_words[query])
+        return [answered[query] for query in queries]
+
+    def top_k(self, index, words, k):
+        """
+        Finds the k highest scoring documents with the MaxScore algorithm.
+
+        Terms are ordered by their score upper bound (max frequency x query weight). Once the
+        heap holds k documents, the low-bound terms whose combined bounds cannot beat the
+        k-th score become non-essential: candidates come only from the essential terms, and
+        non-essential postings are probed by binary search only while the candidate can still
+        enter the heap.
+
+        Args:
+            index (dict): The index to search (title or content index).
+            words (list): Preprocessed query words; repeated words count multiple times.
+            k (int): Number of documents to return.
+
+        Returns:
+            list: [doc_id, score] pairs, highest score first and ties by document ID, exactly
+            as the first k results of a full search.
+        """
+        weights = {}
         for word in words:
+            weights[word] = weights.get(word, 0) + 1
+        terms = []
+        for word, weight in weights.items():
             try:
-                docs_with_word = index.get(word)
-                for filename, freq in docs_with_word.items():  # Use items() to get key-value pairs
-                    try:
-                        score = matching_documents.get(filename) + freq
-                        matching_documents.insert(filename, score)
-                    except KeyError:
-                        matching_documents.insert(filename, freq)
+                terms.append((index.get(word), weight))
             except KeyError:
                 continue
+        if not terms or k <= 0:
+            return []
 
-        # Sort documents by the relevance score (higher score first)
-        sorted_results = sorted(
-            [(filename, score) for filename, score in matching_documents.items() if filename],
-            key=lambda item: item[1], reverse=True
-        )
-        
+        terms.sort(key=lambda term: term[0].max_freq * term[1])
+        doc_ids = [postings.doc_ids for postings, _ in terms]
+        freqs = [postings.freqs for postings, _ in terms]
+        term_weights = [weight for _, weight in terms]
+        lengths = [len(ids) for ids in doc_ids]
+        bounds = []  # bounds[i]: upper bound of the combined score of terms 0..i
+        total = 0
+        for postings, weight in terms:
+            total += postings.max_freq * weight
+            bounds.append(total)
+
+        cursors = [0] * len(terms)
+        heap = []            # (score, -doc_id) min-heap of the current top k
+        threshold = -1       # Score a document must beat to enter the heap
+        first_essential = 0  # Terms before this one cannot lift a document into the top k alone
+        while True:
+            # Next candidate: the smallest unprocessed document among the essential terms
+            doc_id = None
+            for i in range(first_essential, len(terms)):
+                if cursors[i] < lengths[i] and (doc_id is None or doc_ids[i][cursors[i]] < doc_id):
+                    doc_id = doc_ids[i][cursors[i]]
+            if doc_id is None:
+                break
+
+            score = 0
+            for i in range(first_essential, len(terms)):
+                cursor = cursors[i]
+                if cursor < lengths[i] and doc_ids[i][cursor] == doc_id:
+                    score += freqs[i][cursor] * term_weights[i]
+                    cursors[i] = cursor + 1
+
+            # Add non-essential terms, highest bound first, while the document can still qualify
+            for i in range(first_essential - 1, -1, -1):
+                if score + bounds[i] <= threshold:
+                    break
+                cursor = bisect_left(doc_ids[i], doc_id, cursors[i], lengths[i])
+                cursors[i] = cursor
+                if cursor < lengths[i] and doc_ids[i][cursor] == doc_id:
+                    score += freqs[i][cursor] * term_weights[i]
+
+            if score <= threshold:
+                continue
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -doc_id))
+            else:
+                heapq.heapreplace(heap, (score, -doc_id))
+            if len(heap) == k:
+                threshold = heap[0][0]
+                while first_essential < len(terms) and bounds[first_essential] <= threshold:
+                    first_essential += 1
+
+        return [[-negative_id, score] for score, negative_id in sorted(heap, reverse=True)]
+
+    def parse_query(self, query):
+        """
+        Splits a query into its quoted phrase and NEAR/k clauses and the remaining free text.
+
+        Returns:
+            tuple: (free text, clauses) where a clause is ("phrase", [(offset, word), ...])
+            or ("near", word, word, k).
+        """
+        tokens = QUERY_TOKEN.findall(query)  # (phrase, word) pairs, word is empty for a quoted phrase
+        free_text, clauses = [], []
+        i = 0
+        while i < len(tokens):
+            phrase, word = tokens[i]
+            near = NEAR_OPERATOR.match(tokens[i + 1][1]) if word and i + 2 < len(tokens) and tokens[i + 2][1] else None
+            if near:
+                left, right = self.preprocess_query(word), self.preprocess_query(tokens[i + 2][1])
+                if left and right:
+                    clauses.append(("near", left[0], right[0], int(near.group(1))))
+                i += 3
+                continue
+            if word:
+                free_text.append(word)
+            else:
+                located = self.locate_words(phrase)
+                if located:
+                    first = located[0][0]
+                    clauses.append(("phrase", [(position - first, word) for position, word in located]))
+            i += 1
+        return " ".join(free_text), clauses
+
+    def search_clauses(self, index, clauses, words, k=None):
+        """
+        Scores documents that match every phrase and NEAR clause, using only the positional
+        postings of the clause words.
+
+        Documents are found by intersecting the clause words' doc ID arrays (binary search from
+        the shortest list), and each clause is checked by merging the decoded position lists.
+
+        Args:
+            index (dict): The positional index to search.
+            clauses (list): Clauses from parse_query.
+            words (list): Preprocessed free query words, added to the score of matching documents.
+            k (int): Return only the k best documents.
+
+        Returns:
+            list: [doc_id, score] pairs, highest score first and ties by document ID.
+        """
+        postings = {}
+        for clause in clauses:
+            clause_words = [word for _, word in clause[1]] if clause[0] == "phrase" else clause[1:3]
+            for word in clause_words:
+                try:
+                    postings[word] = index.get(word)
+                except KeyError:
+                    return []  # A clause word that never occurs cannot match
+
+        # Intersect the doc IDs of all clause words, driven by the shortest postings list
+        ordered = sorted(postings.values(), key=len)
+        cursors = [0] * len(ordered)
+        scored = []
+        for doc_id in ordered[0].doc_ids:
+            for i in range(1, len(ordered)):
+                doc_ids = ordered[i].doc_ids
+                cursors[i] = bisect_left(doc_ids, doc_id, cursors[i])
+                if cursors[i] == len(doc_ids) or doc_ids[cursors[i]] != doc_id:
+                    break
+            else:
+                score = self.match_clauses(postings, clauses, doc_id)
+                if score:
+                    for word in words:
+                        try:
+                            word_postings = index.get(word)
+                        except KeyError:
+                            continue
+                        position = bisect_left(word_postings.doc_ids, doc_id)
+                        if position < len(word_postings) and word_postings.doc_ids[position] == doc_id:
+                            score += word_postings.freqs[position]
+                    scored.append([doc_id, score])
+
+        # Sort documents by the relevance score (higher score first, stable on document ID)
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored if k is None else scored[:k]
+
+    def match_clauses(self, postings, clauses, doc_id):
+        """
+        Counts how often each clause occurs in a document that contains all clause words.
+
+        Returns:
+            int: Total number of clause matches, or 0 if any clause does not match.
+        """
+        positions = {}
+        for word, word_postings in postings.items():
+            positions[word] = word_postings.positions_at(bisect_left(word_postings.doc_ids, doc_id))
+
+        total = 0
+        for clause in clauses:
+            if clause[0] == "phrase":
+                # Align every word's positions to the phrase start and intersect them
+                matches = positions[clause[1][0][1]]
+                for offset, word in clause[1][1:]:
+                    matches = intersect_sorted(matches, [position - offset for position in positions[word]])
+                count = len(matches)
+            else:
+                _, left, right, distance = clause
+                count = count_near(positions[left], positions[right], distance)
+            if not count:
+                return 0
+            total += count
+        return total
+
+    def format_results(self, scored, words=()):
+        """
+        Builds the result tuples, with query-biased snippets, for ranked documents.
+
+        Args:
+            scored (list): [doc_id, score] pairs in rank order.
+            words (list): Preprocessed query words the snippets should show.
+
+        Returns:
+            list: (filename, title, snippet, score) tuples.
+        """
         results = []
-        for filename, score in sorted_results:
-            doc = self.documents.get(filename)
-            title = doc["title"]
-            snippet = ' '.join(doc["content"].split()[:15]) + "........."  # First 15 words as snippet
-            results.append((filename, title, snippet, score))
+        for doc_id, score in scored:
+            filename = self.filenames[doc_id]
+            title = self.documents.get(filename)["title"]
+            results.append((filename, title, self.snippet(doc_id, words), score))
         return results
 
+    def snippet_segments(self, doc_id, words, window=SNIPPET_WORDS):
+        """
+        Picks the snippet window of a document and marks the words that match the query.
+
+        The window is the passage with the densest query matches. With a positional index the
+        match positions come from the postings, decoding at most a few windows' worth of
+        positions per word, so the cost does not grow with the document length. Without
+        positions the document's words are read through the snippet store and matched like
+        the marked words below, which costs one pass over the document.
+
+        Args:
+            doc_id (int): The document ID.
+            words (list): Preprocessed query words.
+            window (int): Number of words in the snippet.
+
+        Returns:
+            tuple: (position of the first word, [(word, matched), ...])
+        """
+        words = set(words)
+        content = self.documents.get(self.filenames[doc_id])["content"]
+        lemmatize = self.lemmas.lemmatize
+
+        def matches(text):
+            return lemmatize(text.translate(PUNCTUATION_TABLE).lower()) in words
+
+        start = 0
+        if words:
+            positions = []
+            if self.positional:
+                for word in words:
+                    try:
+                        postings = self.content_index.get(word)
+                    except KeyError:
+                        continue
+                    position = bisect_left(postings.doc_ids, doc_id)
+                    if position < len(postings) and postings.doc_ids[position] == doc_id:
+                        positions.extend(postings.positions_at(position, limit=window * 4))
+                positions.sort()
+            else:
+                document_words = self.snippets.words(doc_id, content, 0, self.snippets.word_count(doc_id))
+                positions = [position for position, text in enumerate(document_words) if matches(text)]
+            start = self.snippets.best_window(doc_id, positions, window)
+
+        return start, [(text, matches(text)) for text in self.snippets.words(doc_id, content, start, start + window)]
+
+    def snippet(self, doc_id, words=(), window=SNIPPET_WORDS):
+        """Returns a plain-text, query-biased snippet of a document (see snippet_segments)."""
+        start, segments = self.snippet_segments(doc_id, words, window)
+        return ("........." if start else "") + ' '.join(text for text, _ in segments) + "........."
+
+
+
+def intersect_sorted(first, second):
+    """Merges two sorted position lists, keeping the positions present in both."""
+    common = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if first[i] < second[j]:
+            i += 1
+        elif first[i] > second[j]:
+            j += 1
+        else:
+            common.append(first[i])
+            i += 1
+            j += 1
+    return common
+
+
+def count_near(left, right, distance):
+    """
+    Counts the positions in left that have a position of right at most distance words away,
+    in a single merge pass over both sorted lists.
+    """
+    count = j = 0
+    for position in left:
+        while j < len(right) and right[j] < position - distance:
+            j += 1
+        nearest = j
+        if nearest < len(right) and right[nearest] == position:
+            nearest += 1  # The same occurrence (e.g. "data NEAR/2 data") is not near itself
+        if nearest < len(right) and right[nearest] <= position + distance:
+            count += 1
+    return count
+
+
+# Process-pool workers for parallel ingestion; each worker process holds its own analyzer
+_worker_engine = None
+
+
+def _init_worker(directory, stop_words, lemma_cache_size, positional):
+    """Creates the worker's analyzer once, when the worker process starts."""
+    global _worker_engine
+    _worker_engine = SearchEngine(directory, lemma_cache_size, positional)
+    _worker_engine.stop_words = stop_words
+
+
+def _analyze_file(filename):
+    """Reads and analyzes one document in a worker process."""
+    return _worker_engine.analyze_file(filename)
+
+
+def _init_search_worker(directory, snapshot_path, lemma_cache_size):
+    """Loads the engine's snapshot once, when a search_many worker process starts."""
+    global _worker_engine
+    _worker_engine = SearchEngine(directory, lemma_cache_size)
+    _worker_engine.load(snapshot_path)
+
+
+def _search_chunk(queries, k, search_type):
+    """Runs a chunk of a search_many batch in a worker process."""
+    return _worker_engine.search_many(queries, k, search_type)
@@ -0,0 +1,175 @@
+import os
+import heapq
+import multiprocessing
+from collections import Counter
+from itertools import islice
+
+try:  # Imported as part of the Codes package (app.py)
+    from .RankingSystem import RankingSystem
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from RankingSystem import RankingSystem
+
+
+class RankingShard(RankingSystem):
+    """The documents of one shard, weighted with the statistics of the whole collection."""
+
+    def __init__(self, folder_path, file_names, weights="float64"):
+        self._init_state(folder_path, weights=weights)
+        self.version = 1  # Built once, from its own files
+        self.documents = self.load_documents(file_names)
+
+
+def merge_statistics(statistics):
+    """Adds up the collection_statistics of disjoint shards into those of their union."""
+    merged = {"documents": 0, "lengths": Counter(), "doc_freqs": {}}
+    for shard in statistics:
+        merged["documents"] += shard["documents"]
+        merged["lengths"].update(shard["lengths"])
+        for fields, doc_freqs in shard["doc_freqs"].items():
+            merged["doc_freqs"].setdefault(fields, Counter()).update(doc_freqs)
+    return merged
+
+
+def _serve_shard(connection, folder_path, file_names, weights):
+    """
+    Worker process of one shard: reports its local statistics, builds its index with the
+    collection-wide ones it gets back, then answers (method, queries, k, options) requests
+    with one ranking per query until it receives None.
+    """
+    shard = RankingShard(folder_path, file_names, weights)
+    field_counts = shard.count_terms()
+    connection.send(shard.collection_statistics(field_counts))
+    shard.build_statistics(field_counts, connection.recv())
+    del field_counts
+    connection.send(True)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, queries, k, options = request
+        try:
+            rank = getattr(shard, method)
+            connection.send((True, [rank(query, k, **options) for query in queries]))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+class ShardedRankingSystem:
+    """
+    RankingSystem split into shards, each indexed and queried by its own long-lived process.
+
+    The documents are cut into contiguous ranges of the directory order. At build time every
+    shard counts its terms and reports its document frequencies and field lengths; the sums
+    are sent back to all shards, so each one weighs its documents with the IDF and average
+    lengths of the whole collection. A query is broadcast to every shard, each returns its
+    local top k, and the sorted lists are merged with a heap. Rankings (scores and tie order)
+    are identical to the unsharded RankingSystem.
+
+    Attributes:
+        folder_path (str): Folder of the .txt documents.
+        shards (int): Number of shard processes.
+        version (int): Corpus version, increased by every refresh.
+    """
+
+    def __init__(self, folder_path, shards=None, weights="float64"):
+        """
+        Starts the shard processes and builds their indexes.
+
+        Args:
+            folder_path (str): Folder of the .txt documents.
+            shards (int): Number of shards, by default the number of cores (never more than documents).
+            weights (str): Storage of the TF-IDF weights of every shard, see RankingSystem.
+        """
+        self.folder_path = folder_path
+        self.shards = shards or os.cpu_count()
+        self.weights = weights
+        self.version = 0
+        self.connections = []
+        self.processes = []
+        self.refresh()
+
+    def refresh(self):
+        """Restarts the shards on the current content of the folder."""
+        self.close()
+        self.version += 1
+        file_names = [file_name for file_name in os.listdir(self.folder_path) if file_name.endswith('.txt')]
+        if not file_names:
+            raise ValueError("No valid documents found in the specified folder.")
+        shards = min(self.shards, len(file_names))
+        bounds = [len(file_names) * shard // shards for shard in range(shards + 1)]
+        for start, end in zip(bounds, bounds[1:]):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, daemon=True,
+                                              args=(worker_connection, self.folder_path, file_names[start:end], self.weights))
+            process.start()
+            worker_connection.close()  # So a crashed worker shows up as EOFError instead of a hang
+            self.connections.append(connection)
+            self.processes.append(process)
+        collection = merge_statistics([connection.recv() for connection in self.connections])
+        for connection in self.connections:
+            connection.send(collection)
+        for connection in self.connections:
+            connection.recv()
+
+    def close(self):
+        """Stops the shard processes."""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def rank_many(self, method, queries, k=None, **options):
+        """
+        Ranks a batch of queries with a RankingSystem method on every shard in parallel.
+
+        Args:
+            method (str): Name of a RankingSystem ranking method, e.g. "rank_by_bm25".
+            queries (list): Query strings.
+            k (int): Number of results per query, None for the full ranking.
+            **options: Extra keyword arguments of the method (e.g. include_unmatched, k1).
+
+        Returns:
+            list: One [(document name, score), ...] ranking per query.
+        """
+        for connection in self.connections:
+            connection.send((method, queries, k, options))
+        answers = [connection.recv() for connection in self.connections]
+        for succeeded, result in answers:
+            if not succeeded:
+                raise result
+        # Shards hold consecutive document ranges and merge() keeps equal scores in input
+        # order, so ties stay in document order as in RankingSystem.rank_documents
+        return [list(islice(heapq.merge(*rankings, key=lambda item: -item[1]), k))
+                for rankings in zip(*(result for _, result in answers))]
+
+    def rank(self, method, query, k=None, **options):
+        """Ranks one query with a RankingSystem method, see rank_many."""
+        return self.rank_many(method, [query], k, **options)[0]
+
+    def rank_by_keyword_matching(self, query, k=None, include_unmatched=False):
+        return self.rank("rank_by_keyword_matching", query, k, include_unmatched=include_unmatched)
+
+    def rank_by_tfidf(self, query, k=None):
+        return self.rank("rank_by_tfidf", query, k)
+
+    def rank_by_cosine_similarity(self, query, k=None):
+        return self.rank("rank_by_cosine_similarity", query, k)
+
+    def rank_by_bm25(self, query, k=None, k1=1.2, b=0.75):
+        return self.rank("rank_by_bm25", query, k, k1=k1, b=b)
+
+    def rank_by_bm25f(self, query, k=None, k1=1.2, title_weight=3.0, content_weight=1.0, title_b=0.75, content_b=0.75):
+        return self.rank("rank_by_bm25f", query, k, k1=k1, title_weight=title_weight, content_weight=content_weight,
+                         title_b=title_b, content_b=content_b)
@@ -0,0 +1,203 @@
+import os
+import mmap
+import struct
+import sys
+from array import array
+
+try:  # Imported as part of the Codes package (app.py)
+    from .Dictionary import CustomDictionary
+    from .Postings import PostingsList
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from Dictionary import CustomDictionary
+    from Postings import PostingsList
+
+MAGIC = b"IRSNAP"
+VERSION = 3
+BYTE_ORDER = b"L" if sys.byteorder == "little" else b"B"  # Arrays are stored in native order
+
+_HEADER = struct.Struct("=6scHI")      # magic, byte order, version, section count
+_SECTION = struct.Struct("=HQQ")       # name length, offset, length
+
+
+def write_snapshot(path, sections):
+    """
+    Writes named binary sections to a versioned snapshot file.
+
+    The file is written next to the target and renamed over it, so readers never
+    see a half-written snapshot.
+
+    Args:
+        path (str): Destination file.
+        sections (dict): Section name -> bytes-like payload.
+    """
+    names = [name.encode("utf-8") for name in sections]
+    payloads = list(sections.values())
+    table_size = _HEADER.size + sum(_SECTION.size + len(name) for name in names)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, BYTE_ORDER, VERSION, len(names)))
+        offset = table_size
+        for name, payload in zip(names, payloads):
+            file.write(_SECTION.pack(len(name), offset, len(payload)) + name)
+            offset += len(payload)
+        for payload in payloads:
+            file.write(payload)
+    os.replace(temp_path, path)
+
+
+class SnapshotReader:
+    """
+    Memory-maps a snapshot file and gives zero-copy access to its sections.
+
+    The mapping stays open as long as the reader (or any view taken from it) is alive.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        self.sections = {}
+
+        if len(self.view) < _HEADER.size:
+            raise ValueError(f"'{path}' is not a snapshot file.")
+        magic, byte_order, version, count = _HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a snapshot file.")
+        if version != VERSION or byte_order != BYTE_ORDER:
+            raise ValueError(f"Snapshot '{path}' has an incompatible format (version {version}).")
+
+        position = _HEADER.size
+        for _ in range(count):
+            name_length, offset, length = _SECTION.unpack_from(self.view, position)
+            position += _SECTION.size
+            name = bytes(self.view[position:position + name_length]).decode("utf-8")
+            position += name_length
+            self.sections[name] = (offset, length)
+
+    def section(self, name):
+        """Returns a memoryview over the named section."""
+        try:
+            offset, length = self.sections[name]
+        except KeyError:
+            raise ValueError(f"Snapshot '{self.path}' has no '{name}' section.") from None
+        return self.view[offset:offset + length]
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def close(self):
+        """
+        Unmaps the file, so it can be replaced (Windows refuses to replace a mapped file).
+
+        Raises:
+            BufferError: If a view taken from a section is still alive.
+        """
+        self.view.release()
+        self.buffer.close()
+
+
+# --- Section encoders ---
+def encode_array(values, typecode):
+    """Encodes a sequence of numbers as a length-prefixed native array."""
+    values = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+    return struct.pack("=Q", len(values)) + values.tobytes()
+
+
+def decode_array(view, typecode, position=0):
+    """
+    Decodes an array written by encode_array without copying it.
+
+    Returns:
+        tuple: (memoryview cast to the typecode, position after the array)
+    """
+    count = struct.unpack_from("=Q", view, position)[0]
+    start = position + 8
+    end = start + count * array(typecode).itemsize
+    return view[start:end].cast(typecode), end
+
+
+def encode_strings(strings):
+    """Encodes a list of strings as byte lengths followed by their UTF-8 data."""
+    encoded = [string.encode("utf-8") for string in strings]
+    return encode_array([len(data) for data in encoded], "I") + b"".join(encoded)
+
+
+def decode_strings(view, position=0):
+    """
+    Decodes a list of strings written by encode_strings.
+
+    Returns:
+        tuple: (list of strings, position after the data)
+    """
+    lengths, position = decode_array(view, "I", position)
+    strings = []
+    for length in lengths:
+        strings.append(str(view[position:position + length], "utf-8"))
+        position += length
+    return strings, position
+
+
+def encode_index(index, positional=False):
+    """
+    Encodes a word -> PostingsList index.
+
+    Layout: positional flag, words, postings length and maximum frequency per word, then
+    all doc IDs and all frequencies concatenated in word order. Positional indexes add
+    every word's position offsets and the delta-encoded position bytes, in the same order.
+    """
+    words, lengths, maxima, doc_ids, freqs = [], array("I"), array("I"), array("I"), array("I")
+    offsets, positions = array("I"), bytearray()
+    for word, postings in index.items():
+        words.append(word)
+        lengths.append(len(postings))
+        maxima.append(postings.max_freq)
+        doc_ids.extend(postings.doc_ids)
+        freqs.extend(postings.freqs)
+        if positional:
+            offsets.extend(postings.offsets)
+            positions += postings.positions
+    encoded = (encode_array([positional], "B") + encode_strings(words) + encode_array(lengths, "I")
+               + encode_array(maxima, "I") + encode_array(doc_ids, "I") + encode_array(freqs, "I"))
+    if positional:
+        encoded += encode_array(offsets, "I") + encode_array(positions, "B")
+    return encoded
+
+
+def decode_index(view):
+    """
+    Decodes an index written by encode_index.
+
+    The postings arrays are memoryview slices of the snapshot, so nothing is copied
+    until a postings list is modified.
+
+    Returns:
+        tuple: (index, whether the index is positional)
+    """
+    flag, position = decode_array(view, "B")
+    positional = bool(flag[0])
+    words, position = decode_strings(view, position)
+    lengths, position = decode_array(view, "I", position)
+    maxima, position = decode_array(view, "I", position)
+    doc_ids, position = decode_array(view, "I", position)
+    freqs, position = decode_array(view, "I", position)
+    if positional:
+        offsets, position = decode_array(view, "I", position)
+        positions, position = decode_array(view, "B", position)
+
+    index = CustomDictionary(len(words) * 2)
+    start = offset_start = position_start = 0
+    for word, length, max_freq in zip(words, lengths, maxima):
+        end = start + length
+        if positional:
+            term_offsets = offsets[offset_start:offset_start + length + 1]
+            term_positions = positions[position_start:position_start + term_offsets[length]]
+            offset_start += length + 1
+            position_start += term_offsets[length]
+            postings = PostingsList(doc_ids[start:end], freqs[start:end], max_freq, term_positions, term_offsets)
+        else:
+            postings = PostingsList(doc_ids[start:end], freqs[start:end], max_freq)
+        index.insert(word, postings)
+        start = end
+    return index, positional
@@ -0,0 +1,70 @@
+import re
+from array import array
+
+TOKEN = re.compile(r'\S+')
+
+
+class SnippetStore:
+    """
+    Character offsets of the words of every document, built once at index time.
+
+    A snippet is cut straight out of the stored content with these offsets, so its cost
+    depends on the snippet window, not on the length of the document. Word i of a
+    document is the i-th word that survives punctuation removal, the same numbering as
+    the positional index, so query-match positions map directly onto the text.
+
+    Attributes:
+        offsets (list): Document ID -> flattened (start, end) character offsets of each word,
+            or None for removed documents.
+    """
+
+    def __init__(self):
+        self.offsets = []
+
+    def add(self, doc_id, content, punctuation_table):
+        """Records the word offsets of a document's content."""
+        offsets = array('I')
+        for match in TOKEN.finditer(content):
+            if match.group().translate(punctuation_table):  # Punctuation-only tokens are not words
+                offsets.append(match.start())
+                offsets.append(match.end())
+        while len(self.offsets) <= doc_id:
+            self.offsets.append(None)
+        self.offsets[doc_id] = offsets
+
+    def remove(self, doc_id):
+        """Forgets the offsets of a removed document."""
+        if doc_id < len(self.offsets):
+            self.offsets[doc_id] = None
+
+    def word_count(self, doc_id):
+        """Returns the number of words in the document's content."""
+        return len(self.offsets[doc_id]) // 2
+
+    def best_window(self, doc_id, positions, window):
+        """
+        Finds the window of words holding the most query matches.
+
+        Args:
+            doc_id (int): The document ID.
+            positions (list): Sorted word positions of query matches in the document.
+            window (int): Number of words in the snippet.
+
+        Returns:
+            int: Position of the first word of the window.
+        """
+        best_start, best_count = 0, 0
+        first = 0
+        for last, position in enumerate(positions):
+            while position - positions[first] >= window:
+                first += 1
+            if last - first + 1 > best_count:
+                best_start, best_count = positions[first], last - first + 1
+        # Keep the window full when the densest passage is near the end of the document
+        return max(0, min(best_start, self.word_count(doc_id) - window))
+
+    def words(self, doc_id, content, start, end):
+        """Returns the words start..end-1 of the document content, with their original punctuation."""
+        offsets = self.offsets[doc_id]
+        end = min(end, len(offsets) // 2)
+        return [content[offsets[2 * i]:offsets[2 * i + 1]] for i in range(start, end)]
@@ -0,0 +1,130 @@
+try:  # Optional: only the numpy ranking backend needs it
+    import numpy as np
+except ImportError:
+    np = None
+
+class TermDocumentMatrix:
+    """
+    Compressed sparse row (CSR) term-document matrix built with plain NumPy arrays.
+
+    Rows are documents and hold their TF-IDF weights, with each row's L2 norm alongside. The
+    same nonzeros are also kept term-major (the transpose in CSR form), so a query only reads
+    the columns of its own terms. Per-document sums are added up in the same order as the
+    python backend (dot products in query term order, matched weights in document vector
+    order), so both backends compute bit-identical scores and rank ties the same way.
+
+    Attributes:
+        terms (dict): Term -> column number.
+        indptr (ndarray): Start of each document's nonzeros in indices/data, plus the end.
+        indices (ndarray): Column (term) of each nonzero, row by row.
+        data (ndarray): Weight of each nonzero.
+        norms (ndarray): L2 norm of each row.
+        term_indptr (ndarray): Start of each term's nonzeros in term_rows/term_data, plus the end.
+        term_rows (ndarray): Document row of each nonzero, term by term, in row order.
+        term_data (ndarray): Weight of each nonzero, term by term.
+        term_ranks (ndarray): Position of each nonzero within its row, term by term.
+    """
+
+    def __init__(self, doc_vectors, norms=None):
+        """
+        Builds the matrix from per-document term -> weight vectors.
+
+        Args:
+            doc_vectors (list): One dict per document row, in document order.
+            norms (list): L2 norm of each row, e.g. RankingSystem.doc_norms; computed when None.
+        """
+        if np is None:
+            raise ImportError("The numpy ranking backend requires NumPy.")
+        self.terms = {}
+        lengths, indices, weights = [], [], []
+        for vector in doc_vectors:
+            lengths.append(len(vector))
+            for term, weight in vector.items():
+                indices.append(self.terms.setdefault(term, len(self.terms)))
+                weights.append(weight)
+        self.rows = len(doc_vectors)
+        self.indptr = np.zeros(self.rows + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        self.indices = np.array(indices, dtype=np.int64)
+        self.data = np.array(weights, dtype=np.float64)
+        row_of = np.repeat(np.arange(self.rows), lengths)
+        if norms is None:
+            norms = np.sqrt(np.bincount(row_of, self.data ** 2, minlength=self.rows))
+        self.norms = np.asarray(norms, dtype=np.float64)
+
+        # Transpose: stable sort by column keeps each term's rows in document order
+        order = np.argsort(self.indices, kind="stable")
+        self.term_rows = row_of[order]
+        self.term_data = self.data[order]
+        self.term_ranks = (order - self.indptr[row_of[order]]).astype(np.int32)
+        self.term_indptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.terms)), out=self.term_indptr[1:])
+
+    def columns(self, query_weights):
+        """Yields (column slice, query weight) for the query terms in the matrix, in query order."""
+        for term, weight in query_weights.items():
+            column = self.terms.get(term)
+            if column is not None:
+                yield slice(self.term_indptr[column], self.term_indptr[column + 1]), weight
+
+    def dot(self, query_weights):
+        """
+        Multiplies the sparse query vector with the matrix: one dot product per document row,
+        each added up in query term order.
+
+        Args:
+            query_weights (dict): Term -> query weight; unknown terms are ignored.
+
+        Returns:
+            ndarray: Scores of all documents.
+        """
+        rows, weights = [], []
+        for span, weight in self.columns(query_weights):
+            rows.append(self.term_rows[span])
+            weights.append(self.term_data[span] * weight)
+        if not rows:
+            return np.zeros(self.rows)
+        # bincount adds the weights of a row in array order
+        return np.bincount(np.concatenate(rows), np.concatenate(weights), minlength=self.rows)
+
+    def match(self, query_weights):
+        """
+        Sums the query weights of the terms each document row contains, adding them up in the
+        row's own term order.
+
+        Args:
+            query_weights (dict): Term -> query weight; unknown terms are ignored.
+
+        Returns:
+            ndarray: Scores of all documents.
+        """
+        rows, ranks, weights = [], [], []
+        for span, weight in self.columns(query_weights):
+            rows.append(self.term_rows[span])
+            ranks.append(self.term_ranks[span])
+            weights.append(np.full(span.stop - span.start, weight, dtype=np.float64))
+        if not rows:
+            return np.zeros(self.rows)
+        rows = np.concatenate(rows)
+        order = np.lexsort((np.concatenate(ranks), rows))
+        return np.bincount(rows[order], np.concatenate(weights)[order], minlength=self.rows)
+
+
+def top_rows(scores, k=None):
+    """
+    Ranks rows by score, highest first and ties (equal scores) in row order, like a stable sort.
+
+    With k, argpartition finds the k-th best score first and only the rows that can
+    reach the top k are sorted.
+
+    Returns:
+        ndarray: Row numbers in rank order.
+    """
+    keys = -scores
+    if k is not None and k < len(keys):
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        kth = keys[np.argpartition(keys, k - 1)[k - 1]]
+        rows = np.flatnonzero(keys <= kth)  # Every row tied with the k-th one stays a candidate
+        return rows[np.lexsort((rows, keys[rows]))][:k]
+    return np.lexsort((np.arange(len(keys)), keys))
@@ -0,0 +1,411 @@
+import os
+import heapq
+import json
+import math
+import mmap
+import struct
+import shutil
+import tempfile
+from array import array
+from itertools import chain, islice
+
+try:  # Imported as part of the Codes package (app.py)
+    from .RankingSystem import RankingSystem
+except ImportError:  # Run from inside the Codes folder (UnitTest.py, CLI)
+    from RankingSystem import RankingSystem
+
+_RECORD = struct.Struct("=II")  # term byte length, number of postings
+TERM_OVERHEAD = 250             # Estimated bytes of a block term besides its postings (dict slot, str, arrays)
+POSTING_BYTES = 8               # A doc ID and a count, 4 bytes each
+MERGE_FAN_IN = 64               # Most runs merged (and open) at once
+
+
+def iter_documents(folder_path):
+    """
+    Yields (file_name, title, content) for every .txt document of a folder, one file at a time,
+    so no more than one document is in memory.
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith('.txt'):
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    doc = f.read().split("\n", 1)
+                title = doc[0].replace("Title: ", "")
+                content = doc[1].replace("Content: ", "")
+                yield entry.name, title, content
+
+
+def write_record(file, term, doc_ids, counts):
+    """Writes one run record: a term and its doc IDs and counts (4-byte arrays or their bytes)."""
+    encoded = term.encode('utf-8')
+    file.write(_RECORD.pack(len(encoded), memoryview(doc_ids).nbytes // 4))
+    file.write(encoded)
+    file.write(doc_ids)
+    file.write(counts)
+
+
+def write_run(path, block):
+    """Writes an in-memory block (term -> (doc IDs, counts)) to disk as records sorted by term."""
+    with open(path, 'wb') as file:
+        for term in sorted(block):
+            doc_ids, counts = block[term]
+            write_record(file, term, doc_ids, counts)
+
+
+def read_run(path):
+    """Yields the (term, doc IDs bytes, counts bytes) records of a run, one at a time."""
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(_RECORD.size)
+            if not header:
+                return
+            term_length, count = _RECORD.unpack(header)
+            term = file.read(term_length).decode('utf-8')
+            yield term, file.read(count * 4), file.read(count * 4)
+
+
+def build_streaming_index(documents, path, tokenize, memory_budget=64 * 1024 * 1024):
+    """
+    Builds an on-disk inverted index with single-pass in-memory indexing (SPIMI).
+
+    Documents are inverted into an in-memory block until its estimated size reaches the
+    memory budget; the block is then written to disk as a run sorted by term and dropped.
+    Finally the runs are k-way merged into the index (in several passes when there are more
+    than MERGE_FAN_IN), copying one run's postings of one term at a time, and the TF-IDF
+    norm of every document is accumulated in a memory-mapped file. Memory use is bounded by the budget plus the interpreter, whatever the corpus size.
+
+    Args:
+        documents (iterable): (file_name, title, content) tuples, e.g. from iter_documents.
+        path (str): Directory for the index files; replaced if it exists.
+        tokenize (callable): Text -> list of terms.
+        memory_budget (int): Estimated bytes the in-memory block may use before it is spilled.
+
+    Returns:
+        DiskIndex: The finished index.
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    runs = []
+    with tempfile.TemporaryDirectory(dir=path) as run_directory, \
+            open(os.path.join(path, "names.bin"), 'wb') as names, \
+            open(os.path.join(path, "name_offsets.bin"), 'wb') as name_offsets, \
+            open(os.path.join(path, "lengths.bin"), 'wb') as lengths:
+        block, block_bytes = {}, 0
+        doc_id = name_end = total_length = 0
+        array('Q', [0]).tofile(name_offsets)
+        for file_name, _, content in documents:
+            encoded = file_name.encode('utf-8')
+            names.write(encoded)
+            name_end += len(encoded)
+            array('Q', [name_end]).tofile(name_offsets)
+
+            counts = {}
+            tokens = tokenize(content)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            array('I', [len(tokens)]).tofile(lengths)
+            total_length += len(tokens)
+            for term, count in counts.items():
+                postings = block.get(term)
+                if postings is None:
+                    postings = block[term] = (array('I'), array('I'))
+                    block_bytes += TERM_OVERHEAD + len(term)
+                postings[0].append(doc_id)
+                postings[1].append(count)
+                block_bytes += POSTING_BYTES
+            doc_id += 1
+
+            if block_bytes >= memory_budget:
+                runs.append(os.path.join(run_directory, f"run{len(runs)}.bin"))
+                write_run(runs[-1], block)
+                block, block_bytes = {}, 0
+        if block:
+            runs.append(os.path.join(run_directory, f"run{len(runs)}.bin"))
+            write_run(runs[-1], block)
+        del block
+        term_count = merge_runs(runs, path)
+
+    with open(os.path.join(path, "meta.json"), 'w', encoding='utf-8') as file:
+        json.dump({"documents": doc_id, "terms": term_count, "total_length": total_length}, file)
+    index = DiskIndex(path)
+    index.write_norms()
+    return index
+
+
+def merge_records(runs):
+    """
+    Merges the records of consecutive runs by term. A term's records come out in run order
+    (heapq.merge is stable), so its doc IDs stay sorted.
+    """
+    return heapq.merge(*(read_run(run) for run in runs), key=lambda record: record[0])
+
+
+def merge_pass(runs, path):
+    """Merges consecutive runs into one run file at path and deletes them."""
+    with open(path, 'wb') as file:
+        for term, ids, freqs in merge_records(runs):
+            write_record(file, term, ids, freqs)
+    for run in runs:
+        os.remove(run)
+
+
+def merge_runs(runs, path, fan_in=None):
+    """
+    Merges sorted runs into the index's term, offset and postings files.
+
+    At most fan_in runs (MERGE_FAN_IN by default) are opened at once: while there are more,
+    each group of fan_in consecutive runs is merged into one bigger run, and the last pass
+    k-way merges the remaining runs into the index. Runs hold consecutive ranges of documents
+    and equal terms come out of each merge in run order, so appending the postings keeps
+    every term's doc IDs sorted.
+
+    Returns:
+        int: Number of distinct terms.
+    """
+    fan_in = max(2, fan_in or MERGE_FAN_IN)
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            merged.append(os.path.join(os.path.dirname(group[0]), f"merge{level}_{len(merged)}.bin"))
+            merge_pass(group, merged[-1])
+        runs = merged
+        level += 1
+
+    with open(os.path.join(path, "terms.bin"), 'wb') as terms, \
+            open(os.path.join(path, "term_offsets.bin"), 'wb') as term_offsets, \
+            open(os.path.join(path, "postings_offsets.bin"), 'wb') as postings_offsets, \
+            open(os.path.join(path, "doc_ids.bin"), 'wb') as doc_ids, \
+            open(os.path.join(path, "counts.bin"), 'wb') as counts:
+        array('Q', [0]).tofile(term_offsets)
+        array('Q', [0]).tofile(postings_offsets)
+        current, term_count, term_end, entries = None, 0, 0, 0
+        for term, ids, freqs in merge_records(runs):
+            if term != current:
+                if current is not None:
+                    array('Q', [entries]).tofile(postings_offsets)
+                encoded = term.encode('utf-8')
+                terms.write(encoded)
+                term_end += len(encoded)
+                array('Q', [term_end]).tofile(term_offsets)
+                current = term
+                term_count += 1
+            doc_ids.write(ids)
+            counts.write(freqs)
+            entries += len(ids) // 4
+        if current is not None:
+            array('Q', [entries]).tofile(postings_offsets)
+    return term_count
+
+
+class DiskIndex:
+    """
+    Read-only inverted index written by build_streaming_index, memory-mapped from its files.
+
+    Only the pages that a lookup touches are read, so opening and querying the index does not
+    load the corpus into memory.
+
+    Attributes:
+        documents (int): Number of documents.
+        terms (int): Number of distinct terms.
+        average_length (float): Average number of tokens per document.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        self.documents = meta["documents"]
+        self.terms = meta["terms"]
+        self.average_length = meta["total_length"] / self.documents if self.documents else 0
+        self.buffers = []
+        self.names = self.map("names.bin", 'B')
+        self.name_offsets = self.map("name_offsets.bin", 'Q')
+        self.lengths = self.map("lengths.bin", 'I')
+        self.term_bytes = self.map("terms.bin", 'B')
+        self.term_offsets = self.map("term_offsets.bin", 'Q')
+        self.postings_offsets = self.map("postings_offsets.bin", 'Q')
+        self.doc_ids = self.map("doc_ids.bin", 'I')
+        self.counts = self.map("counts.bin", 'I')
+        self.norms = self.map("norms.bin", 'd') if os.path.exists(os.path.join(path, "norms.bin")) else None
+
+    def map(self, name, typecode, writable=False):
+        """Memory-maps one of the index files as a typed memoryview."""
+        with open(os.path.join(self.path, name), 'r+b' if writable else 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return memoryview(array(typecode))
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.buffers.append(buffer)
+        return memoryview(buffer).cast(typecode)
+
+    def doc_name(self, doc_id):
+        """Returns the file name of a document."""
+        return str(self.names[self.name_offsets[doc_id]:self.name_offsets[doc_id + 1]], 'utf-8')
+
+    def term(self, number):
+        """Returns the term with the given rank in sorted order."""
+        return str(self.term_bytes[self.term_offsets[number]:self.term_offsets[number + 1]], 'utf-8')
+
+    def find(self, term):
+        """Returns the rank of a term in sorted order (binary search), or None if it is not indexed."""
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.terms and self.term(low) == term else None
+
+    def postings(self, term):
+        """Returns the (doc IDs, counts) memoryviews of a term; both are empty if it is not indexed."""
+        number = self.find(term)
+        if number is None:
+            return self.doc_ids[0:0], self.counts[0:0]
+        start, end = self.postings_offsets[number], self.postings_offsets[number + 1]
+        return self.doc_ids[start:end], self.counts[start:end]
+
+    def idf(self, doc_count):
+        """TF-IDF inverse document frequency, the same formula as RankingSystem.calculate_idf."""
+        return math.log(self.documents / (1 + doc_count))
+
+    def write_norms(self, chunk=65536):
+        """
+        Accumulates every document's TF-IDF vector norm into norms.bin, one term at a time.
+
+        The postings are read from the files in chunks rather than through the mappings, so
+        the pass does not page the whole postings into memory.
+        """
+        with open(os.path.join(self.path, "norms.bin"), 'wb') as file:
+            file.truncate(self.documents * 8)
+        norms = self.map("norms.bin", 'd', writable=True)
+        lengths = self.lengths
+        with open(os.path.join(self.path, "doc_ids.bin"), 'rb') as doc_ids, \
+                open(os.path.join(self.path, "counts.bin"), 'rb') as counts:
+            for number in range(self.terms):
+                remaining = self.postings_offsets[number + 1] - self.postings_offsets[number]
+                idf = self.idf(remaining)
+                while remaining:
+                    ids, freqs = array('I'), array('I')
+                    ids.fromfile(doc_ids, min(remaining, chunk))
+                    freqs.fromfile(counts, min(remaining, chunk))
+                    remaining -= len(ids)
+                    for doc_id, count in zip(ids, freqs):
+                        norms[doc_id] += (count / lengths[doc_id] * idf) ** 2
+        for doc_id in range(self.documents):
+            norms[doc_id] = math.sqrt(norms[doc_id])
+        self.norms = norms
+
+
+class StreamingRankingSystem:
+    """
+    RankingSystem for corpora larger than memory: the documents are streamed from the folder
+    into a SPIMI-built on-disk index, and the keyword, TF-IDF, cosine and BM25 methods score
+    the memory-mapped postings of the query terms.
+
+    Keyword and BM25 rankings match RankingSystem exactly. TF-IDF and cosine scores match it
+    up to floating-point rounding: they are added up in another order (query terms instead of
+    document vector order, and norms term by term), so documents with equal scores can differ
+    in the last bit and rank in another order than in RankingSystem.
+    """
+    # Same text processing as the in-memory ranking system
+    tokenize = RankingSystem.tokenize
+    calculate_tf = RankingSystem.calculate_tf
+
+    def __init__(self, folder_path, index_path, memory_budget=64 * 1024 * 1024):
+        self.folder_path = folder_path
+        self.index_path = index_path
+        self.memory_budget = memory_budget
+        self.version = 0  # Corpus version, increased by every refresh
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the on-disk index from the folder."""
+        self.version += 1
+        self.index = None  # Unmap the previous index before its files are replaced
+        self.index = build_streaming_index(iter_documents(self.folder_path), self.index_path,
+                                           self.tokenize, self.memory_budget)
+        if not self.index.documents:
+            raise ValueError("No valid documents found in the specified folder.")
+
+    def rank_ids(self, scores, k=None, include_unmatched=True):
+        """
+        Rank scored doc IDs (highest first, ties in document order) and return (file name, score) pairs.
+        With k, only the best k scored documents are selected (with a bounded heap), and the
+        unmatched ones are only listed as far as they are needed.
+        """
+        if k is None:
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        else:
+            ranked = [(doc_id, -score) for score, doc_id in heapq.nsmallest(k, ((-score, doc_id) for doc_id, score in scores.items()))]
+        if include_unmatched:
+            zeros = ((doc_id, 0) for doc_id in range(self.index.documents) if scores.get(doc_id, 0) == 0)
+            ranked = chain((item for item in ranked if item[1] > 0), zeros, (item for item in ranked if item[1] < 0))
+        return [(self.index.doc_name(doc_id), score) for doc_id, score in islice(ranked, k)]
+
+    def query_weights(self, query):
+        """TF-IDF weights of the query terms found in the index, as RankingSystem.calculate_tfidf."""
+        tf = self.calculate_tf(query)
+        weights = {}
+        for term in tf:
+            doc_ids, counts = self.index.postings(term)
+            if len(doc_ids):
+                weights[term] = (tf[term] * self.index.idf(len(doc_ids)), doc_ids, counts)
+        return weights
+
+    # --- Ranking Methods ---
+    def rank_by_keyword_matching(self, query, k=None, include_unmatched=False):
+        """Rank documents by how many query words they contain."""
+        scores = {}
+        query_tokens = self.tokenize(query)
+        for word in set(query_tokens):
+            query_count = query_tokens.count(word)
+            for doc_id in self.index.postings(word)[0]:
+                scores[doc_id] = scores.get(doc_id, 0) + query_count
+        return self.rank_ids(scores, k, include_unmatched)
+
+    def rank_by_tfidf(self, query, k=None):
+        """
+        Rank documents by the sum of the query TF-IDF weights of the terms they contain, added
+        up in query term order (equal scores may rank differently from RankingSystem).
+        """
+        scores = {}
+        for weight, doc_ids, _ in self.query_weights(query).values():
+            for doc_id in doc_ids:
+                scores[doc_id] = scores.get(doc_id, 0) + weight
+        return self.rank_ids(scores, k)
+
+    def rank_by_cosine_similarity(self, query, k=None):
+        """Rank documents by cosine similarity to the query, using the precomputed document norms."""
+        weights = self.query_weights(query)
+        query_norm = math.sqrt(sum(weight ** 2 for weight, _, _ in weights.values()))
+        lengths, norms = self.index.lengths, self.index.norms
+        dot_products = {}
+        for term, (weight, doc_ids, counts) in weights.items():
+            idf = self.index.idf(len(doc_ids))
+            for doc_id, count in zip(doc_ids, counts):
+                dot_products[doc_id] = dot_products.get(doc_id, 0) + weight * (count / lengths[doc_id] * idf)
+        scores = {doc_id: dot_product / (query_norm * norms[doc_id]) if query_norm and norms[doc_id] else 0
+                  for doc_id, dot_product in dot_products.items()}
+        return self.rank_ids(scores, k)
+
+    def rank_by_bm25(self, query, k=None, k1=1.2, b=0.75):
+        """Rank documents with Okapi BM25 over their content."""
+        scores = {}
+        lengths, average = self.index.lengths, self.index.average_length
+        query_tokens = self.tokenize(query)
+        for term in dict.fromkeys(query_tokens):
+            doc_ids, counts = self.index.postings(term)
+            if not len(doc_ids):
+                continue
+            idf = math.log(1 + (self.index.documents - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            query_count = query_tokens.count(term)
+            for doc_id, count in zip(doc_ids, counts):
+                frequency = count / (1 - b + b * (lengths[doc_id] / average if average else 0))
+                scores[doc_id] = scores.get(doc_id, 0) + query_count * idf * frequency / (k1 + frequency)
+        return self.rank_ids(scores, k)
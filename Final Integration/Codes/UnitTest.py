@@ -1,5 +1,38 @@
+import os
+import json
+import math
+import random
+import tempfile
 import unittest
+from unittest import mock
+from nltk.tokenize import word_tokenize
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer
+from Analyzer import Analyzer
+from BIM import BinaryIndependenceModel
+from Corpus import Corpus
+from Dictionary import CustomDictionary
+from LemmaCache import LemmaCache
+from NOL import NonOverlappedListModel
+from RankingSystem import RankingSystem
+from ResultCache import ResultCache
 from SearchEngine import SearchEngine
+from ShardedRanking import ShardedRankingSystem
+import StreamingIndex
+from StreamingIndex import StreamingRankingSystem
+
+def write_generated_corpus(directory, count, vocabulary, length, seed=0):
+    """Writes count Title/Content documents of words drawn from a small vocabulary, so many scores tie."""
+    rng = random.Random(seed)
+    for i in range(count):
+        words = [f"word{rng.randrange(vocabulary)}" for _ in range(rng.randrange(1, length))]
+        with open(os.path.join(directory, f"doc{i}.txt"), "w", encoding="utf-8") as file:
+            file.write(f"Title: {' '.join(words[:3])}\nContent: {' '.join(words)}")
+
+def generated_queries(count, vocabulary, seed=0):
+    """Returns count queries of zero to four words of the generated corpus vocabulary (and an unknown word)."""
+    rng = random.Random(seed)
+    return [" ".join(f"word{rng.randrange(vocabulary + 1)}" for _ in range(rng.randrange(5))) for _ in range(count)]
 
 class TestSearchEngine(unittest.TestCase):
 
@@ -35,5 +68,529 @@ class TestSearchEngine(unittest.TestCase):
         results = self.search_engine.search("AI machine learning", search_type="content")
         self.assertTrue(results[0][3] >= results[1][3] if len(results) > 1 else True)
 
+    def test_top_k_matches_full_search(self):
+        for query in ("AI machine learning", "information retrieval systems", "learning learning data"):
+            full = self.search_engine.search(query)
+            for k in (1, 2, 3):
+                self.assertEqual(self.search_engine.search(query, k=k), full[:k])
+
+    def test_search_many_matches_search(self):
+        queries = ["AI machine learning", "information retrieval systems", "", "AI machine learning",
+                   "learning learning data", "nonexistentword"]
+        for k in (None, 2):
+            expected = [self.search_engine.search(query, k=k) for query in queries]
+            self.assertEqual(self.search_engine.search_many(queries, k=k), expected)
+            self.assertEqual(self.search_engine.search_many(queries, k=k, workers=2), expected)
+        titles = [self.search_engine.search(query, search_type="title") for query in queries]
+        self.assertEqual(self.search_engine.search_many(queries, search_type="title"), titles)
+
+    def test_phrase_and_near_queries(self):
+        engine = SearchEngine(directory="Docs", positional=True)
+        engine.load_documents()
+        self.assertEqual([doc[0] for doc in engine.search('"machine learning"')], ["Document2.txt"])
+        self.assertEqual(engine.search('"learning machine"'), [])
+        self.assertEqual([doc[0] for doc in engine.search('"branch of artificial intelligence"')], ["Document2.txt"])
+        near = engine.search("information NEAR/2 retrieval")
+        self.assertTrue(near)
+        self.assertEqual(engine.search("information NEAR/2 retrieval", k=1), near[:1])
+        # Plain queries rank exactly like a non-positional index
+        self.assertEqual(
+            [(doc[0], doc[3]) for doc in engine.search("AI machine learning")],
+            [(doc[0], doc[3]) for doc in self.search_engine.search("AI machine learning")]
+        )
+
+    def test_query_biased_snippet(self):
+        engine = SearchEngine(directory="Docs", positional=True)
+        engine.add_document("long.txt", "Long", " ".join(["filler"] * 500) + " the quantum computer works")
+        snippet = engine.search("quantum computer")[0][2]
+        self.assertIn("quantum computer works", snippet)
+        start, segments = engine.snippet_segments(engine.doc_ids.get("long.txt"), ["quantum"])
+        self.assertEqual(len(segments), 15)
+        self.assertIn(("quantum", True), segments)
+        self.assertIn(("filler", False), segments)
+
+    def test_query_biased_snippet_without_positions(self):
+        engine = SearchEngine(directory="Docs")
+        engine.add_document("long.txt", "Long", " ".join(["filler"] * 500) + " the quantum computer works")
+        self.assertIn("quantum computer works", engine.search("quantum computer")[0][2])
+        # The matches are found by reading the document's words, at the same positions as with an index
+        positional = SearchEngine(directory="Docs", positional=True)
+        positional.add_document("long.txt", "Long", " ".join(["filler"] * 500) + " the quantum computer works")
+        for words in (["quantum"], ["quantum", "filler"], ["nothing"], []):
+            self.assertEqual(engine.snippet_segments(engine.doc_ids.get("long.txt"), words),
+                             positional.snippet_segments(positional.doc_ids.get("long.txt"), words))
+
+    def test_add_update_remove_document(self):
+        self.search_engine.add_document("new.txt", "Quantum Computing", "Qubits hold quantum information.")
+        self.assertIn("new.txt", [doc[0] for doc in self.search_engine.search("qubits")])
+
+        self.search_engine.update_document("new.txt", "Quantum Computing", "Superposition of states.")
+        self.assertEqual(self.search_engine.search("qubits"), [])
+        self.assertIn("new.txt", [doc[0] for doc in self.search_engine.search("superposition")])
+
+        self.search_engine.remove_document("new.txt")
+        self.assertEqual(self.search_engine.search("superposition"), [])
+        self.assertNotIn("superposition", self.search_engine.content_index)
+        self.assertNotIn("new.txt", self.search_engine.documents)
+
+    def test_parallel_load_matches_serial(self):
+        parallel = SearchEngine(directory="Docs")
+        parallel.load_documents(workers=2)
+        self.assertEqual(parallel.filenames, self.search_engine.filenames)
+        self.assertEqual(list(parallel.documents.items()), list(self.search_engine.documents.items()))
+        for name in ("title_index", "content_index"):
+            expected = [(word, list(p.doc_ids), list(p.freqs)) for word, p in getattr(self.search_engine, name).items()]
+            actual = [(word, list(p.doc_ids), list(p.freqs)) for word, p in getattr(parallel, name).items()]
+            self.assertEqual(actual, expected)
+
+    def test_snapshot_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.snapshot")
+            self.search_engine.save(path)
+            loaded = SearchEngine(directory="Docs")
+            self.assertTrue(loaded.load_or_build(path))
+            self.assertEqual(loaded.lemmas.items(), self.search_engine.lemmas.items())
+            for search_type in ("content", "title"):
+                self.assertEqual(
+                    loaded.search("AI machine learning", search_type=search_type),
+                    self.search_engine.search("AI machine learning", search_type=search_type)
+                )
+
+    def test_snapshot_is_unmapped_before_it_is_rewritten(self):
+        with tempfile.TemporaryDirectory() as directory:
+            docs = os.path.join(directory, "Docs")
+            os.mkdir(docs)
+            for filename in os.listdir("Docs"):
+                with open(os.path.join("Docs", filename), encoding="utf-8") as source, \
+                        open(os.path.join(docs, filename), "w", encoding="utf-8") as target:
+                    target.write(source.read())
+            path = os.path.join(directory, "index.snapshot")
+            SearchEngine(directory=docs).load_or_build(path)
+            with open(os.path.join(docs, "new.txt"), "w", encoding="utf-8") as file:
+                file.write("Title: Quantum Computing\nContent: Qubits hold quantum information.")
+            engine = SearchEngine(directory=docs)
+            readers = []
+            original_load = engine.load
+            def load(snapshot_path):
+                original_load(snapshot_path)
+                readers.append(engine.snapshot)
+            with mock.patch.object(engine, "load", load), \
+                    mock.patch("Snapshot.write_snapshot", wraps=lambda *args: self.assertTrue(readers[0].buffer.closed)) as write:
+                self.assertTrue(engine.load_or_build(path))
+            self.assertEqual(write.call_count, 1)
+            self.assertIsNone(engine.snapshot)
+            self.assertIn("new.txt", [doc[0] for doc in engine.search("qubits")])
+
+class TestCustomDictionary(unittest.TestCase):
+
+    def test_grows_past_initial_size(self):
+        table = CustomDictionary()
+        for i in range(10000):
+            table.insert(f"term{i}", i)
+        self.assertEqual(len(table), 10000)
+        self.assertGreater(table.size, 10000)
+        self.assertEqual(table.get("term9999"), 9999)
+        self.assertIn("term42", table)
+
+    def test_delete_and_reinsert(self):
+        table = CustomDictionary()
+        table.insert("a", 1)
+        table.insert("b", 2)
+        table.delete("a")
+        self.assertNotIn("a", table)
+        self.assertRaises(KeyError, table.get, "a")
+        table.insert("a", 3)
+        self.assertEqual(list(table.items()), [("b", 2), ("a", 3)])
+        self.assertEqual(list(table), ["b", "a"])
+
+class TestLemmaCache(unittest.TestCase):
+
+    def test_hits_misses_and_eviction(self):
+        cache = LemmaCache(maxsize=2)
+        self.assertEqual(cache.lemmatize("cars"), "car")
+        self.assertEqual(cache.lemmatize("cars"), "car")
+        cache.lemmatize("dogs")
+        cache.lemmatize("cats")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 3, 2))
+        self.assertEqual([token for token, _ in cache.items()], ["dogs", "cats"])
+
+class TestAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = Analyzer()
+        stop_words = set(stopwords.words('english'))
+        stemmer = PorterStemmer()
+        # The NLTK pipeline the analyzer replaces in BIM, NOL and PN
+        self.nltk_analyze = lambda text: [stemmer.stem(word) for word in word_tokenize(text.lower())
+                                          if word.isalnum() and word not in stop_words]
+
+    def test_matches_nltk_pipeline(self):
+        texts = []
+        for folder in ("Docs", "NeuralDocs"):
+            for filename in sorted(os.listdir(folder)):
+                with open(os.path.join(folder, filename), 'r', encoding='utf-8') as file:
+                    texts.append(file.read())
+        for filename in sorted(os.listdir("Structured_Docs")):
+            with open(os.path.join("Structured_Docs", filename), 'r', encoding='utf-8') as file:
+                document = json.load(file)
+            texts += [document["title"]] + [section["content"] for section in document["sections"]]
+        texts += [
+            "I can't believe it's NASA's \"best\" mission... They'll launch (again) in 2024.",
+            "Costs rose 5.5% to $1,000,000: a record; prices fell.Then 'quoted' words ended. Cannot stop, gonna go!",
+            "Is it over?Yes! It is over.) Next sentence.\" And 'tis the end--really. Ends here.'",
+            "Robots don't sleep. They won't.\nThey \u201cwork\u201d all day \u2014 and night \u00abfor us\u00bb.",
+        ]
+        for text in texts:
+            self.assertEqual(self.analyzer.analyze(text), self.nltk_analyze(text), text[:60])
+
+    def test_streams_lines_and_caches_stems(self):
+        text = "Machine learning models learn.\nLearning machines are learning!\n"
+        self.assertEqual(self.analyzer.analyze(text.splitlines(keepends=True)), self.analyzer.analyze(text))
+        analyzer = Analyzer(maxsize=2)
+        self.assertEqual(analyzer.analyze("learning learning models"), ["learn", "learn", "model"])
+        stats = analyzer.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 2, 2))
+
+class TestRankingSystem(unittest.TestCase):
+
+    def setUp(self):
+        self.ranking_system = RankingSystem("Docs")
+
+    def test_precomputed_rankings_match_per_document_scoring(self):
+        system = self.ranking_system
+        for query in ("AI machine learning", "information retrieval systems", "learning learning data"):
+            query_vector = system.calculate_tfidf(query, system.idf)
+            vectors = {name: system.calculate_tfidf(content, system.idf) for name, content in system.documents.items()}
+            cosine = sorted(((name, system.cosine_similarity(query_vector, vector)) for name, vector in vectors.items()),
+                            key=lambda x: x[1], reverse=True)
+            tfidf = sorted(((name, sum(query_vector.get(term, 0) for term in vector)) for name, vector in vectors.items()),
+                           key=lambda x: x[1], reverse=True)
+            self.assertEqual(system.rank_by_cosine_similarity(query), cosine)
+            self.assertEqual(system.rank_by_tfidf(query), tfidf)
+
+    def test_numpy_backend_matches_python_backend(self):
+        vectorized = RankingSystem("Docs", backend="numpy")
+        for query in ("AI machine learning", "information retrieval systems", "learning learning data", "zzz"):
+            for method in ("rank_by_keyword_matching", "rank_by_tfidf", "rank_by_cosine_similarity"):
+                for k in (None, 2):
+                    expected = getattr(self.ranking_system, method)(query, k)
+                    actual = getattr(vectorized, method)(query, k)
+                    self.assertEqual([name for name, _ in actual], [name for name, _ in expected])
+                    for (_, score), (_, expected_score) in zip(actual, expected):
+                        self.assertAlmostEqual(score, expected_score)
+
+    def test_numpy_backend_ties_like_python_backend_on_generated_corpus(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_generated_corpus(directory, 150, vocabulary=40, length=12)
+            python = RankingSystem(directory)
+            vectorized = RankingSystem(directory, backend="numpy")
+        for query in generated_queries(200, vocabulary=40):
+            for method in ("rank_by_keyword_matching", "rank_by_tfidf", "rank_by_cosine_similarity"):
+                for k in (None, 1, 10):
+                    # Same scores bit for bit, and ties in document order in both backends
+                    self.assertEqual(getattr(vectorized, method)(query, k), getattr(python, method)(query, k))
+            self.assertEqual(vectorized.rank_by_keyword_matching(query, 10, include_unmatched=True),
+                             python.rank_by_keyword_matching(query, 10, include_unmatched=True))
+
+    def test_compact_weights_match_float64_weights(self):
+        for weights, places in (("float32", 6), ("int8", 3)):
+            compact = RankingSystem("Docs", weights=weights)
+            self.assertIsNone(compact.doc_vectors)
+            for query in ("AI machine learning", "information retrieval systems", "learning learning data", "zzz"):
+                # TF-IDF scores only depend on which terms a document contains, so they stay exact
+                self.assertEqual(compact.rank_by_tfidf(query), self.ranking_system.rank_by_tfidf(query))
+                expected = self.ranking_system.rank_by_cosine_similarity(query)
+                actual = compact.rank_by_cosine_similarity(query)
+                self.assertEqual([name for name, _ in actual], [name for name, _ in expected])
+                for (_, score), (_, expected_score) in zip(actual, expected):
+                    self.assertAlmostEqual(score, expected_score, places=places)
+        with self.assertRaises(ValueError):
+            RankingSystem("Docs", backend="numpy", weights="int8")
+
+    def test_compact_tfidf_rankings_match_float64_on_generated_corpus(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_generated_corpus(directory, 150, vocabulary=40, length=12, seed=1)
+            exact = RankingSystem(directory)
+            compact = RankingSystem(directory, weights="float32")
+        for query in generated_queries(200, vocabulary=40, seed=1):
+            # The query weights are added up in the same order, so even the ties come out the same
+            self.assertEqual(compact.rank_by_tfidf(query), exact.rank_by_tfidf(query))
+            self.assertEqual(compact.rank_by_tfidf(query, 10), exact.rank_by_tfidf(query, 10))
+
+    def test_bm25_and_title_weighted_bm25f(self):
+        system = self.ranking_system
+        bm25 = dict(system.rank_by_bm25("retrieval"))
+        self.assertEqual({name for name, score in bm25.items() if score > 0},
+                         {name for name, content in system.documents.items() if "retrieval" in system.tokenize(content)})
+        self.assertEqual(system.rank_by_bm25("retrieval", k=1), system.rank_by_bm25("retrieval")[:1])
+        # "basics" only appears in titles, so only BM25F can find it
+        self.assertTrue(all(score == 0 for _, score in system.rank_by_bm25("basics")))
+        bm25f = dict(system.rank_by_bm25f("basics"))
+        self.assertEqual({name for name, score in bm25f.items() if score > 0},
+                         {name for name, title in system.titles.items() if "basics" in system.tokenize(title)})
+
+    def test_keyword_matching_leaves_out_unmatched_documents(self):
+        system = self.ranking_system
+        matched = system.rank_by_keyword_matching("retrieval retrieval models")
+        self.assertTrue(matched and all(score > 0 for _, score in matched))
+        everything = system.rank_by_keyword_matching("retrieval retrieval models", include_unmatched=True)
+        self.assertEqual(len(everything), len(system.documents))
+        self.assertEqual(everything[:len(matched)], matched)
+        self.assertEqual(system.rank_by_keyword_matching("nonexistentword"), [])
+
+    def test_approximate_cosine_reranks_candidates_exactly(self):
+        system = self.ranking_system
+        system.build_lsh(tables=32, bits=1)  # Enough tables that every document becomes a candidate
+        for query in ("AI machine learning", "information retrieval systems"):
+            exact = dict(system.rank_by_cosine_similarity(query))
+            approximate = system.rank_by_approximate_cosine(query, k=2)
+            self.assertEqual(approximate, system.rank_by_cosine_similarity(query, k=2))
+            self.assertTrue(all(score == exact[name] for name, score in approximate))
+
+    def test_top_k_matches_full_ranking(self):
+        system = self.ranking_system
+        for query in ("AI machine learning", "retrieval", "learning learning data", "zzz", ""):
+            for method in ("rank_by_tfidf", "rank_by_cosine_similarity", "rank_by_bm25", "rank_by_bm25f"):
+                full = getattr(system, method)(query)
+                for k in (0, 1, 3, len(system.documents) + 1):
+                    self.assertEqual(getattr(system, method)(query, k), full[:k])
+
+    def test_approximate_cosine_recall_on_generated_corpus(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_generated_corpus(directory, 300, vocabulary=200, length=30, seed=3)
+            system = RankingSystem(directory)
+        system.build_lsh(tables=32, bits=4)
+        found = total = 0
+        for query in generated_queries(100, vocabulary=200, seed=3):
+            exact = {name for name, score in system.rank_by_cosine_similarity(query, 10) if score > 0}
+            found += len(exact & {name for name, _ in system.rank_by_approximate_cosine(query, 10)})
+            total += len(exact)
+        self.assertGreaterEqual(found / total, 0.9)  # recall@10 against exact cosine ranking
+
+    def test_refresh_picks_up_new_documents(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, content in (("a.txt", "retrieval models"), ("c.txt", "boolean queries")):
+                with open(os.path.join(directory, name), "w", encoding="utf-8") as file:
+                    file.write(f"Title: {name}\nContent: {content}")
+            system = RankingSystem(directory)
+            with open(os.path.join(directory, "b.txt"), "w", encoding="utf-8") as file:
+                file.write("Title: B\nContent: neural retrieval")
+            self.assertNotIn("neural", system.idf)
+            system.refresh()
+            self.assertEqual(system.rank_by_tfidf("neural")[0][0], "b.txt")
+
+class TestShardedRankingSystem(unittest.TestCase):
+
+    def test_shards_rank_like_ranking_system(self):
+        expected = RankingSystem("Docs")
+        with ShardedRankingSystem("Docs", shards=3) as sharded:
+            self.assertEqual(len(sharded.processes), 3)
+            for query in ("AI machine learning", "information retrieval systems", "learning learning data", "zzz"):
+                for method in ("rank_by_keyword_matching", "rank_by_tfidf", "rank_by_cosine_similarity",
+                               "rank_by_bm25", "rank_by_bm25f"):
+                    for k in (None, 3):
+                        self.assertEqual(getattr(sharded, method)(query, k), getattr(expected, method)(query, k))
+                self.assertEqual(sharded.rank_by_keyword_matching(query, include_unmatched=True),
+                                 expected.rank_by_keyword_matching(query, include_unmatched=True))
+            with self.assertRaises(AttributeError):
+                sharded.rank("rank_by_nothing", "data")
+
+class TestBinaryIndependenceModel(unittest.TestCase):
+
+    def setUp(self):
+        self.bim = BinaryIndependenceModel("Docs")
+        self.bim.load_documents()
+
+    def test_packed_rows_score_dice_of_term_sets(self):
+        bim = self.bim
+        for doc, terms in bim.preprocessed_docs.items():
+            row = bim.term_document_matrix[doc]
+            self.assertEqual({term for index, term in enumerate(bim.term_list) if row >> index & 1}, set(terms))
+            self.assertEqual(bim.doc_sizes[doc], len(set(terms)))
+        for query in ("AI machine learning", "information retrieval systems", "zzz"):
+            query_terms = set(bim.preprocess(query)) & set(bim.term_list)
+            expected = {}
+            for doc, terms in bim.preprocessed_docs.items():
+                total = len(query_terms) + len(set(terms))
+                expected[doc] = 2 * len(query_terms & set(terms)) / total if total else 0
+            self.assertEqual(bim.score_documents(bim.preprocess_query(query)), expected)
+
+    def test_postings_top_k_matches_full_scoring(self):
+        bim = self.bim
+        for query in ("AI machine learning", "information retrieval systems", "zzz"):
+            full = bim.rank_documents(bim.score_documents(bim.preprocess_query(query)))
+            for k in (1, 2, len(bim.documents) + 1):
+                self.assertEqual(bim.retrieve_top_k_documents(query, k), full[:k])
+            # Only documents sharing a query term are scored
+            self.assertTrue(all(score > 0 for score in bim.score_postings(bim.preprocess(query)).values()))
+
+    def test_rsj_weights_follow_relevance_feedback(self):
+        bim = self.bim
+        docs = {doc: set(terms) for doc, terms in bim.preprocessed_docs.items()}
+
+        def expected_weight(term, relevant_docs):
+            n, N = sum(term in terms for terms in docs.values()), len(docs)
+            r, R = sum(term in docs[doc] for doc in relevant_docs), len(relevant_docs)
+            return math.log((r + 0.5) * (N - n - R + r + 0.5) / ((n - r + 0.5) * (R - r + 0.5)))
+
+        judged = sorted(docs)[:2]
+        for relevant_docs in ([], judged[:1], judged, judged[1:]):
+            for doc in docs:
+                bim.add_relevance_feedback(doc, doc in relevant_docs)
+            for term in bim.term_list:
+                self.assertAlmostEqual(bim.rsj_weight(term), expected_weight(term, relevant_docs))
+            ranked = bim.retrieve_top_k_documents("AI machine learning", k=None, weighting="rsj")
+            self.assertEqual([score for _, score in ranked], sorted((score for _, score in ranked), reverse=True))
+            query_terms = set(bim.preprocess("AI machine learning"))
+            for doc, score in ranked:
+                self.assertAlmostEqual(score, sum(expected_weight(term, relevant_docs) for term in query_terms & docs[doc]))
+        with self.assertRaises(ValueError):
+            bim.add_relevance_feedback("missing.txt")
+
+class TestNonOverlappedListModel(unittest.TestCase):
+
+    def setUp(self):
+        self.nol = NonOverlappedListModel("Docs")
+        self.nol.build_term_document_map()
+        self.nol.load_structured_documents("Structured_Docs")
+        # A heading made only of stop words is an empty region
+        self.nol.regions.add_structured_document("Extra.json", {"title": "Moon", "sections": [
+            {"heading": "Why?", "content": "The Moon has no air."}, {"heading": "Mars", "content": "Red planet."}]})
+
+    def test_region_queries_match_scanning_the_regions(self):
+        regions = self.nol.regions
+        def spans(level):
+            return list(zip(regions.starts[level], regions.ends[level]))
+        def scan(level, terms):
+            return [row for row, (start, end) in enumerate(spans(level))
+                    if all(any(start <= position < end for position in regions.positions.get(term, ())) for term in terms)]
+        for query in ("NASA", "space missions", "Mars", "information retrieval", "air", "the", "unknownterm"):
+            terms = regions.analyzer.analyze(query)
+            for level in ("section", "paragraph", "heading", "content", "document"):
+                expected = scan(level, terms) if terms else []
+                self.assertEqual(list(regions.containing(regions.regions(level), query)), expected, (query, level))
+            sections = regions.containing(regions.regions("section"), query)
+            for level in ("heading", "content"):
+                inside = [row for row, (start, end) in enumerate(spans(level)) if any(
+                    outer_start <= start and end <= outer_end and (start < outer_end or start == outer_start)
+                    for outer_start, outer_end in (spans("section")[outer] for outer in sections))]
+                self.assertEqual(list(regions.within(level, sections)), inside, (query, level))
+            self.assertEqual(list(regions.enclosing("section", regions.within("heading", sections))), list(sections))
+
+    def test_sections_and_headings(self):
+        self.assertEqual(self.nol.sections_containing("Mars missions"),
+                         [("Document2.json", "Exploration Goals"), ("Document4.json", "NASA's Mars Missions")])
+        self.assertEqual(self.nol.headings_within_sections_containing("air"), [("Extra.json", "Why?")])
+        self.assertEqual(self.nol.paragraphs_containing("information retrieval"),
+                         [("Document1.txt", "Paragraph 1"), ("Document2.txt", "Paragraph 1")])
+        self.assertEqual(self.nol.retrieve_sections(["air", "red planet"]), [("Extra.json", "Why?"), ("Extra.json", "Mars")])
+
+class TestStreamingIndex(unittest.TestCase):
+
+    def test_spilled_runs_rank_like_ranking_system(self):
+        expected = RankingSystem("Docs")
+        with tempfile.TemporaryDirectory() as directory:
+            # A tiny budget spills a run after every document, so the k-way merge is exercised
+            streaming = StreamingRankingSystem("Docs", os.path.join(directory, "index"), memory_budget=1)
+            for query in ("AI machine learning", "information retrieval systems", "learning learning data", "zzz"):
+                self.assertEqual(streaming.rank_by_keyword_matching(query), expected.rank_by_keyword_matching(query))
+                self.assertEqual(streaming.rank_by_bm25(query, k=3), expected.rank_by_bm25(query, k=3))
+                for method in ("rank_by_tfidf", "rank_by_cosine_similarity"):
+                    actual = getattr(streaming, method)(query)
+                    self.assertEqual([name for name, _ in actual], [name for name, _ in getattr(expected, method)(query)])
+            streaming.index = None  # Unmap the index files before the directory is removed
+
+    def test_multi_pass_merge_ranks_like_ranking_system(self):
+        with tempfile.TemporaryDirectory() as directory:
+            corpus = os.path.join(directory, "corpus")
+            os.mkdir(corpus)
+            write_generated_corpus(corpus, 60, vocabulary=40, length=12, seed=2)
+            expected = RankingSystem(corpus)
+            # One run per document, merged at most 4 at a time: 60 runs -> 15 -> 4 -> the index
+            with mock.patch.object(StreamingIndex, "MERGE_FAN_IN", 4), \
+                    mock.patch.object(StreamingIndex, "merge_pass", wraps=StreamingIndex.merge_pass) as merge_pass:
+                streaming = StreamingRankingSystem(corpus, os.path.join(directory, "index"), memory_budget=1)
+            self.assertEqual(merge_pass.call_count, 15 + 4)
+            self.assertTrue(all(len(call.args[0]) <= 4 for call in merge_pass.call_args_list))
+            for query in generated_queries(50, vocabulary=40, seed=2):
+                self.assertEqual(streaming.rank_by_keyword_matching(query), expected.rank_by_keyword_matching(query))
+                self.assertEqual(streaming.rank_by_bm25(query), expected.rank_by_bm25(query))
+                for method in ("rank_by_tfidf", "rank_by_cosine_similarity"):
+                    # Same scores up to rounding, so only near-equal scores may swap places
+                    actual, ranking = getattr(streaming, method)(query), getattr(expected, method)(query)
+                    scores = dict(ranking)
+                    self.assertEqual(len(actual), len(ranking))
+                    for (name, score), (_, expected_score) in zip(actual, ranking):
+                        self.assertAlmostEqual(score, expected_score)
+                        self.assertAlmostEqual(score, scores[name])
+            streaming.index = None  # Unmap the index files before the directory is removed
+
+class TestCorpus(unittest.TestCase):
+
+    def test_ranking_system_does_not_reload_a_loaded_corpus(self):
+        corpus = Corpus("Docs")
+        bim = BinaryIndependenceModel("Docs", corpus=corpus)
+        bim.load_documents()
+        analyses = dict(corpus.analyses)
+        with mock.patch("os.listdir", wraps=os.listdir) as listdir:
+            system = RankingSystem("Docs", corpus=corpus)
+            self.assertEqual(listdir.call_count, 0)
+            for key, analysis in analyses.items():
+                self.assertIs(corpus.analyses[key], analysis)
+            system.refresh()  # An explicit refresh re-reads the folder
+            self.assertEqual(listdir.call_count, 1)
+
+    def test_models_built_from_shared_corpus_are_identical(self):
+        corpus = Corpus("Docs")
+        engine, shared_engine = SearchEngine("Docs", positional=True), SearchEngine("Docs", positional=True, corpus=corpus)
+        engine.load_documents()
+        shared_engine.load_documents()
+        self.assertEqual(shared_engine.filenames, engine.filenames)
+        for name in ("title_index", "content_index"):
+            expected = [(word, list(p.doc_ids), list(p.freqs), bytes(p.positions)) for word, p in getattr(engine, name).items()]
+            actual = [(word, list(p.doc_ids), list(p.freqs), bytes(p.positions)) for word, p in getattr(shared_engine, name).items()]
+            self.assertEqual(actual, expected)
+
+        ranking, shared_ranking = RankingSystem("Docs"), RankingSystem("Docs", corpus=corpus)
+        self.assertEqual((shared_ranking.doc_vectors, shared_ranking.field_postings), (ranking.doc_vectors, ranking.field_postings))
+
+        bim, shared_bim = BinaryIndependenceModel("Docs"), BinaryIndependenceModel("Docs", corpus=corpus)
+        bim.load_documents()
+        shared_bim.load_documents()
+        self.assertEqual(shared_bim.term_document_matrix, bim.term_document_matrix)
+
+        nol, shared_nol = NonOverlappedListModel("Docs"), NonOverlappedListModel("Docs", corpus=corpus)
+        nol.build_term_document_map()
+        shared_nol.build_term_document_map()
+        self.assertEqual(shared_nol.term_doc_map, nol.term_doc_map)
+        self.assertEqual(shared_nol.regions.positions, nol.regions.positions)
+        # BIM and NOL use the same pipeline, so they share one token stream per document
+        self.assertIs(shared_nol.preprocessed_docs["Document1.txt"], shared_bim.preprocessed_docs["Document1.txt"])
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_bytes_ttl_and_version(self):
+        now = [0.0]
+        cache = ResultCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.put("a", [("Document1.txt", 1.0)], version=1)
+        cache.put("b", [], version=1)
+        self.assertEqual(cache.get("a", version=1), [("Document1.txt", 1.0)])
+        cache.put("c", [], version=1)  # Evicts "b", the least recently used
+        self.assertIsNone(cache.get("b", version=1))
+        now[0] = 11.0
+        self.assertIsNone(cache.get("a", version=1))  # Expired
+        cache.put("a", [], version=1)
+        self.assertIsNone(cache.get("a", version=2))  # New corpus version drops everything
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 3, 1))
+        self.assertEqual((stats["expirations"], stats["invalidations"], stats["size"]), (1, 1, 0))
+
+        small = ResultCache(max_bytes=1000)
+        small.put("big", ["x" * 2000])
+        small.put("one", ["x" * 400])
+        small.put("two", ["x" * 400])  # Over the byte limit, so "one" is evicted
+        self.assertEqual((list(small.cache), small.evictions), (["two"], 1))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,146 @@
+import math
+from array import array
+
+PRECISIONS = ("float32", "int8")
+
+
+class WeightStore:
+    """
+    Compact term-major store of the TF-IDF document weights.
+
+    The postings of all terms are laid out back to back in typed arrays: the document row
+    (4 bytes), the position of the term in the document's vector (2 bytes, 4 for documents
+    of more than 65,536 terms) and either a float32 weight (4 bytes) or an 8-bit code (1 byte)
+    that is multiplied by a per-term scale. The codes of a term run from 0 to 255 times its largest
+    weight / 255 (every weight of a term has the sign of its IDF), so the rounding error of
+    a weight is at most half a step of its own term.
+
+    Attributes:
+        names (list): Document name of each row.
+        precision (str): "float32" or "int8".
+        terms (dict): Term -> term index.
+        offsets (array): The postings of term i are at offsets[i]:offsets[i + 1].
+        rows (array): Document row of every posting, in document order within a term.
+        ranks (array): Position of the term in the document vector, for every posting.
+        weights (array): float32 weight or 8-bit code of every posting.
+        scales (array): Weight of one step of each term's codes (int8 only, else None).
+        norms (array): Euclidean norm of each document's stored weights.
+    """
+
+    def __init__(self, names, doc_tfs, idf, precision="float32"):
+        """
+        Lays out the weights tf x idf of every document.
+
+        Args:
+            names (list): Document names, in row order.
+            doc_tfs (list): Term -> term frequency dict of each document, in the same order.
+            idf (dict): Term -> inverse document frequency.
+            precision (str): "float32" or "int8".
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}.")
+        self.names = names
+        self.precision = precision
+        counts = {}
+        for tf in doc_tfs:
+            for term in tf:
+                counts[term] = counts.get(term, 0) + 1
+        self.terms = {}
+        self.offsets = array('Q', [0])
+        for term, count in counts.items():
+            self.terms[term] = len(self.terms)
+            self.offsets.append(self.offsets[-1] + count)
+        total = self.offsets[-1]
+
+        self.rows = array('I', bytes(4 * total))
+        self.ranks = array('H' if max(map(len, doc_tfs), default=0) <= 1 << 16 else 'I', [0]) * total
+        values = array('d', bytes(8 * total))  # Full-precision weights, only while building
+        cursors = self.offsets[:-1]
+        for row, tf in enumerate(doc_tfs):
+            for rank, (term, frequency) in enumerate(tf.items()):
+                index = self.terms[term]
+                position = cursors[index]
+                self.rows[position] = row
+                self.ranks[position] = rank
+                values[position] = frequency * idf[term]
+                cursors[index] = position + 1
+
+        if precision == "float32":
+            self.weights = array('f', values)
+            self.scales = None
+        else:
+            self.weights = array('B', bytes(total))
+            self.scales = array('d', bytes(8 * len(self.terms)))
+            for index in range(len(self.terms)):
+                start, end = self.offsets[index], self.offsets[index + 1]
+                scale = max(values[start:end], key=abs) / 255
+                if scale:
+                    self.scales[index] = scale
+                    self.weights[start:end] = array('B', [round(value / scale) for value in values[start:end]])
+
+        norms = array('d', bytes(8 * len(names)))
+        for index in range(len(self.terms)):
+            start, end = self.offsets[index], self.offsets[index + 1]
+            scale = self.scales[index] if self.scales is not None else 1.0
+            for row, weight in zip(self.rows[start:end], self.weights[start:end]):
+                norms[row] += (weight * scale) ** 2
+        self.norms = array('d', [math.sqrt(norm) for norm in norms])
+
+    def postings(self, term):
+        """Returns the (row, weight) pairs of a term, empty if it is unknown."""
+        index = self.terms.get(term)
+        if index is None:
+            return []
+        start, end = self.offsets[index], self.offsets[index + 1]
+        scale = self.scales[index] if self.scales is not None else 1.0
+        return [(row, weight * scale) for row, weight in zip(self.rows[start:end], self.weights[start:end])]
+
+    def dot(self, query_weights, normalized=False):
+        """
+        Returns document name -> dot product with the query weights, for the documents that
+        contain a query term. With normalized, the products are divided by the document norms
+        (documents with a zero norm are left out), i.e. cosines up to the query norm.
+        """
+        scores = {}
+        for term, query_weight in query_weights.items():
+            index = self.terms.get(term)
+            if index is None:
+                continue
+            start, end = self.offsets[index], self.offsets[index + 1]
+            if self.scales is not None:
+                query_weight *= self.scales[index]
+            for row, weight in zip(self.rows[start:end], self.weights[start:end]):
+                scores[row] = scores.get(row, 0) + query_weight * weight
+        names, norms = self.names, self.norms
+        if normalized:
+            return {names[row]: score / norms[row] for row, score in scores.items() if norms[row]}
+        return {names[row]: score for row, score in scores.items()}
+
+    def match(self, query_weights):
+        """
+        Returns document name -> sum of the query weights of the query terms the document contains,
+        added up in the document's vector order like RankingSystem.rank_by_tfidf, so the scores
+        (and their ties) are the same as with float64 weights.
+        """
+        matches = {}
+        for term, query_weight in query_weights.items():
+            index = self.terms.get(term)
+            if index is not None:
+                start, end = self.offsets[index], self.offsets[index + 1]
+                for row, rank in zip(self.rows[start:end], self.ranks[start:end]):
+                    matches.setdefault(row, []).append((rank, query_weight))
+        names = self.names
+        return {names[row]: sum(weight for _, weight in sorted(terms)) for row, terms in matches.items()}
+
+    def vectors(self):
+        """Rebuilds the term -> stored weight dict of every document, in row order."""
+        vectors = [{} for _ in self.names]
+        for term in self.terms:
+            for row, weight in self.postings(term):
+                vectors[row][term] = weight
+        return vectors
+
+    def nbytes(self):
+        """Bytes of the typed arrays (the term dict is not counted)."""
+        arrays = (self.offsets, self.rows, self.ranks, self.weights, self.norms) + ((self.scales,) if self.scales is not None else ())
+        return sum(len(values) * values.itemsize for values in arrays)
@@ -1,6 +1,10 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for
+from markupsafe import Markup
+from Codes.Corpus import Corpus
+from Codes.Analyzer import Analyzer
 from Codes.SearchEngine import SearchEngine
 from Codes.RankingSystem import RankingSystem
+from Codes.ResultCache import ResultCache
 from Codes.BIM import BinaryIndependenceModel
 from Codes.NOL import NonOverlappedListModel
 from Codes.PN import ProximalNodesModel
@@ -15,6 +19,7 @@ DOCUMENT_FOLDER = "D:\\IR\\Information-Retrieval-Fall-2024\\Final Integration\\C
 DOCUMENT_FOLDERS = "D:\\IR\\Information-Retrieval-Fall-2024\\Final Integration\\Codes\\Structured_Docs"
 Product_Folder = "D:\\IR\\Information-Retrieval-Fall-2024\\Final Integration\\Codes\\Product\\products.txt"
 Neural_Folder = "D:\\IR\\Information-Retrieval-Fall-2024\\Final Integration\\Codes\\NeuralDocs"
+SEARCH_SNAPSHOT = "Codes/Data/search_engine.snapshot"  # Rebuilt automatically when Docs changes
 
 # Load document data from JSON
 with open("Codes/Data/data.json", "r") as file:
@@ -26,19 +31,65 @@ def load_students():
         return json.load(f)
 
 # Initialize system components
-search_engine = SearchEngine(DOCUMENT_FOLDER)
-ranking_system = RankingSystem(DOCUMENT_FOLDER)
-binary_independence_model = BinaryIndependenceModel(DOCUMENT_FOLDER)
-non_overlapped = NonOverlappedListModel(DOCUMENT_FOLDER)
-model = ProximalNodesModel()
+corpus = Corpus(DOCUMENT_FOLDER)  # Docs is read once, and each analysis pipeline runs once, for all models
+search_engine = SearchEngine(DOCUMENT_FOLDER, positional=True, corpus=corpus)  # Positions enable phrase queries and query-biased snippets
+ranking_system = RankingSystem(DOCUMENT_FOLDER, corpus=corpus)
+analyzer = Analyzer()  # One tokenizer and stem cache for the Porter-stemming models
+binary_independence_model = BinaryIndependenceModel(DOCUMENT_FOLDER, corpus=corpus, analyzer=analyzer)
+non_overlapped = NonOverlappedListModel(DOCUMENT_FOLDER, corpus=corpus, analyzer=analyzer)
+model = ProximalNodesModel(analyzer=analyzer)
 fuzzy = FuzzyModel(Product_Folder)
 neural = NeuralNetwork(Neural_Folder)
+rank_cache = ResultCache(maxsize=1024, max_bytes=16 * 1024 * 1024, ttl=300)  # /rank results
 
 # Prepare models and data
 model.build_network(DOCUMENT_FOLDERS)
 non_overlapped.build_term_document_map()
-search_engine.load_documents()
+non_overlapped.load_structured_documents(DOCUMENT_FOLDERS)  # Sections for region queries
+search_engine.load_or_build(SEARCH_SNAPSHOT)
 binary_independence_model.load_documents()
+corpus.release()  # The models keep what they need from the memoized token streams
+
+def corpus_version():
+    """Version of the Docs corpus behind the rankings; cached /rank results of another version are stale."""
+    return ranking_system.version
+
+def ranked_results(query, ranking_method, k=None):
+    """Ranks the query with the selected method, reusing cached results for the same normalized query."""
+    if ranking_method in ("bim", "bim_rsj"):
+        # Relevance judgments change the BIM weights without changing the corpus
+        key = (tuple(binary_independence_model.preprocess(query)), ranking_method, k, binary_independence_model.feedback_version)
+    else:
+        key = (tuple(ranking_system.tokenize(query)), ranking_method, k)
+    results = rank_cache.get(key, corpus_version())
+    if results is not None:
+        return results
+
+    # Perform search and ranking based on the selected method
+    if ranking_method == "keyword":
+        results = ranking_system.rank_by_keyword_matching(query, k)
+    elif ranking_method == "tfidf":
+        results = ranking_system.rank_by_tfidf(query, k)
+    elif ranking_method == "cosine":
+        results = ranking_system.rank_by_cosine_similarity(query, k)
+    elif ranking_method == "bm25":
+        results = ranking_system.rank_by_bm25(query, k)
+    elif ranking_method == "bm25f":
+        results = ranking_system.rank_by_bm25f(query, k)
+    elif ranking_method == "bim":
+        results = binary_independence_model.retrieve_top_k_documents(query, k=k)
+    elif ranking_method == "bim_rsj":
+        results = binary_independence_model.retrieve_top_k_documents(query, k=k, weighting="rsj")
+    else:
+        return []
+    rank_cache.put(key, results, corpus_version())
+    return results
+
+def highlighted_snippet(filename, words):
+    """Query-biased snippet of an indexed document with the matching words wrapped in <mark>."""
+    start, segments = search_engine.snippet_segments(search_engine.doc_ids.get(filename), words)
+    text = Markup(" ").join(Markup("<mark>{}</mark>").format(word) if matched else word for word, matched in segments)
+    return (Markup("...") if start else Markup("")) + text + Markup("...")
 
 @app.route("/neural", methods=["GET", "POST"])
 def neural_route():
@@ -146,7 +197,9 @@ def search_non_overlapping():
     terms_input = request.form.get("terms")
     terms_of_interest = [term.strip() for term in terms_input.split(",")]
     results = non_overlapped.retrieve_non_overlapping_documents(terms_of_interest)
-    return jsonify({"documents": list(results)})
+    sections = non_overlapped.retrieve_sections(terms_of_interest)
+    return jsonify({"documents": list(results),
+                    "sections": [{"document": document, "heading": heading} for document, heading in sections]})
 
 @app.route("/rank", methods=["GET", "POST"])
 def search():
@@ -161,25 +214,16 @@ def search():
         if not query:
             return render_template("search.html", error="Please enter a query.")
 
-        # Perform search and ranking based on the selected method
-        if ranking_method == "keyword":
-            results = ranking_system.rank_by_keyword_matching(query)
-        elif ranking_method == "tfidf":
-            results = ranking_system.rank_by_tfidf(query)
-        elif ranking_method == "cosine":
-            results = ranking_system.rank_by_cosine_similarity(query)
-        elif ranking_method == "bim":
-            results = binary_independence_model.retrieve_top_k_documents(query, k=5)
-        else:
-            results = []
+        results = ranked_results(query, ranking_method, k=5 if ranking_method in ("bim", "bim_rsj") else None)
 
         # Format results for better UI
+        query_words = search_engine.preprocess_query(query)
         formatted_results = []
         for filename, score in results:
-            doc = search_engine.documents.get(filename)
-            if doc:
+            if filename in search_engine.documents:
+                doc = search_engine.documents.get(filename)
                 title = doc.get("title", filename)
-                snippet = " ".join(doc["content"].split()[:15]) + "..."
+                snippet = highlighted_snippet(filename, query_words)
                 formatted_results.append((title, snippet, f"{score:.5f}"))
 
 
@@ -190,6 +234,11 @@ def search():
     return render_template("search.html")
 
 
+@app.route("/rank/cache")
+def rank_cache_stats():
+    """Hit ratio, evictions and fill of the /rank result cache, for sizing it."""
+    return jsonify(rank_cache.stats())
+
 @app.route("/", methods=["GET", "POST"])
 def home():
     if request.method == "POST":